@@ -4,15 +4,23 @@
 
 
 import os
-import re
 import scipy
 import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+
 from pc_smac.pc_smac.utils.constants import MULTILABEL_CLASSIFICATION, \
     STRING_TO_TASK_TYPES, MULTICLASS_CLASSIFICATION, STRING_TO_METRIC
 from pc_smac.pc_smac.utils.data_utils import convert_to_num
 
 
+# Number of lines of a data file that are used to detect its format
+FORMAT_SAMPLE_LINES = 1000
+# Lookup table of the bytes that separate the fields of a dense data file
+IS_WHITESPACE = np.zeros(256, dtype=bool)
+IS_WHITESPACE[np.frombuffer(b' \t\n\r\x0b\x0c', dtype=np.uint8)] = True
+
+
 class DataLoader:
 
     def __init__(self, name):
@@ -165,7 +173,8 @@ class DataLoader:
                 else:
                     info['format'] = 'sparse_binary'
         else:
-            data = file_to_array(filename)
+            # A bounded sample, the data files can be too large to read completely only to detect the format
+            data = read_first_lines(filename, FORMAT_SAMPLE_LINES)
             if ':' in data[0][0]:
                 info['is_sparse'] = 1
                 info['format'] = 'sparse'
@@ -210,44 +219,75 @@ class DataLoader:
 
 
 
-def data_dense(filename, feat_type=None):
+def data_dense(filename, feat_type=None, block_size_in_mb=64, num_threads=None):
     # The 2nd parameter makes possible a using of the 3 functions of data
     # reading (data, data_sparse, data_binary_sparse) without changing
     # parameters
 
-    # This code is based on scipy.io.arff.arff_load
-    r_comment = re.compile(r'^%')
-    # Match an empty line
-    r_empty = re.compile(r'^\s+$')
-    descr = [(str(i), np.float32) for i in range(len(feat_type))]
-
-    def generator(row_iter, delim=','):
-        # Copied from scipy.io.arff.arffread
-        raw = next(row_iter)
-        while r_empty.match(raw) or r_comment.match(raw):
-            raw = next(row_iter)
-
-        # 'compiling' the range since it does not change
-        # Note, I have already tried zipping the converters and
-        # row elements and got slightly worse performance.
-        elems = list(range(len(feat_type)))
-
-        row = raw.split(delim)
-        yield tuple([row[i] for i in elems])
-        for raw in row_iter:
-            while r_comment.match(raw) or r_empty.match(raw):
-                raw = next(row_iter)
-            row = raw.split(delim)
-            # yield tuple([np.float64(row[i]) for i in elems])
-            yield tuple([row[i] for i in elems])
-
-    with open(filename) as fh:
-        a = generator(fh, delim=' ')
-        # No error should happen here: it is a bug otherwise
-        data = np.fromiter(a, descr)
-
-        data = data.view(np.float32).reshape((len(data), -1))
-        return data
+    # The file is read in blocks of complete lines, which are parsed by numpy in a pool of threads while the next
+    #   blocks are read. At most 2 blocks per thread are in flight, to bound the memory next to the data itself.
+    num_features = len(feat_type)
+    num_threads = num_threads if num_threads != None else min(4, os.cpu_count() or 1)
+    block_size = int(block_size_in_mb * 1024 * 1024)
+
+    blocks = []
+    futures = []
+    with ThreadPoolExecutor(max_workers=num_threads) as executor, open(filename, 'rb') as fh:
+        remainder = b''
+        while True:
+            chunk = fh.read(block_size)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            end = chunk.rfind(b'\n') + 1
+            if end == 0:
+                remainder = chunk
+                continue
+            remainder = chunk[end:]
+            futures.append(executor.submit(_parse_dense_block, chunk[:end], num_features))
+            while len(futures) >= 2 * num_threads:
+                blocks.append(futures.pop(0).result())
+        if remainder.strip():
+            futures.append(executor.submit(_parse_dense_block, remainder + b'\n', num_features))
+        blocks.extend([future.result() for future in futures])
+
+    if blocks == []:
+        return np.zeros((0, num_features), dtype=np.float32)
+    return np.concatenate(blocks, axis=0)
+
+
+def _parse_dense_block(block, num_features):
+    # Comment lines start with %, empty lines are skipped
+    if block.startswith(b'%') or b'\n%' in block:
+        block = b'\n'.join([line for line in block.split(b'\n') if not line.startswith(b'%')])
+    values = np.fromstring(block, dtype=np.float32, sep=' ')
+    # The total number of values can match while the rows do not, e.g. a line with an extra field and one with a
+    #   missing field, so the fields are counted per line
+    num_fields = _get_num_fields_per_line(block)
+    if values.size == num_fields.size * num_features and np.all(num_fields == num_features):
+        return values.reshape((num_fields.size, num_features))
+
+    # Lines with more fields than features (e.g. a trailing separator): only the first fields are used
+    rows = []
+    for line in block.split(b'\n'):
+        fields = line.decode().split()
+        if fields == []:
+            continue
+        if len(fields) < num_features:
+            raise ValueError("Line with %d instead of %d fields: %s" % (len(fields), num_features, line.decode()))
+        rows.append(fields[:num_features])
+    return np.array(rows, dtype=np.float32).reshape((len(rows), num_features))
+
+
+def _get_num_fields_per_line(block):
+    # Number of whitespace separated fields of every line with at least one field
+    chars = np.frombuffer(block, dtype=np.uint8)
+    is_space = IS_WHITESPACE[chars]
+    is_newline = chars == ord('\n')
+    is_field_start = ~is_space & np.concatenate(([True], is_space[:-1]))
+    line_numbers = np.cumsum(is_newline) - is_newline
+    num_fields = np.bincount(line_numbers[is_field_start])
+    return num_fields[num_fields > 0]
 
 
 def data_sparse(filename, feat_type):
@@ -290,6 +330,17 @@ def file_to_array(filename):
     return data
 
 
+def read_first_lines(filename, num_lines):
+    # Converts the first lines of a file to a list of list of STRING, see file_to_array
+    data = []
+    with open(filename, 'r') as data_file:
+        for line in data_file:
+            data.append(line.strip().split())
+            if len(data) == num_lines:
+                break
+    return data
+
+
 def read_first_line(filename):
     # Read fist line of file
     with open(filename, 'r') as data_file:
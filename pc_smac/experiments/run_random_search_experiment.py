@@ -4,15 +4,19 @@ import os
 from pc_smac.pc_smac.config_space.config_space_builder import ConfigSpaceBuilder
 from pc_smac.pc_smac.data_loader.data_loader import DataLoader
 from pc_smac.pc_smac.pipeline.pipeline_runner import PipelineRunner, CachedPipelineRunner, PipelineTester
+from pc_smac.pc_smac.pipeline.worker_pool import EvaluationWorkerPool
 from pc_smac.pc_smac.pipeline_space.pipeline_space import PipelineSpace
 from pc_smac.pc_smac.pipeline_space.pipeline_step import OneHotEncodingStep, ImputationStep, RescalingStep, \
     BalancingStep, PreprocessingStep, ClassificationStep
-from pc_smac.pc_smac.random_search.random_search import RandomSearch, TreeRandomSearch, SigmoidRandomSearch
+from pc_smac.pc_smac.random_search.random_search import RandomSearch, TreeRandomSearch, SigmoidRandomSearch, \
+    ParallelRandomSearch, SuccessiveHalvingRandomSearch
 from pc_smac.pc_smac.utils.statistics import Statistics
 
 
 def run_random_search(stamp, data_path, version, wallclock_limit, run_limit, memory_limit, cutoff, splitting_number, random_splitting_enabled,
-                      seed=None, output_dir=None, cache_directory=None, downsampling=None):
+                      seed=None, output_dir=None, cache_directory=None, downsampling=None, shared_data_directory=None,
+                      persistent_workers=False, num_workers=1, prefix_sharing=False,
+                      num_batch_workers=1, eta=3):
     # data set
     data_set = data_path.split("/")[-1]
 
@@ -84,17 +88,21 @@ def run_random_search(stamp, data_path, version, wallclock_limit, run_limit, mem
                                                statistics=statistics,
                                                cache_directory=cache_directory,
                                                downsampling=downsampling,
-                                               num_cross_validation_folds=num_cross_validation_folds)
+                                               num_cross_validation_folds=num_cross_validation_folds,
+                                               shared_data_directory=shared_data_directory)
         random_search = TreeRandomSearch(config_space=config_space,
                                          pipeline_runner=pipeline_runner,
                                          wallclock_limit=wallclock_limit,
                                          memory_limit=memory_limit,
                                          statistics=statistics,
+                                         worker_pool=build_worker_pool(pipeline_runner, memory_limit, persistent_workers),
                                          constant_pipeline_steps=["one_hot_encoder", "imputation", "rescaling",
                                                                   "balancing", "feature_preprocessor"],
                                          variable_pipeline_steps=["classifier"],
                                          splitting_number=splitting_number,
-                                         random_splitting_enabled=random_splitting_enabled)
+                                         random_splitting_enabled=random_splitting_enabled,
+                                         prefix_sharing=prefix_sharing,
+                                         num_batch_workers=num_batch_workers)
     elif version == 'sigmoid':
         pipeline_runner = CachedPipelineRunner(data=data,
                                                data_info=dataset_properties,
@@ -104,17 +112,55 @@ def run_random_search(stamp, data_path, version, wallclock_limit, run_limit, mem
                                                statistics=statistics,
                                                cache_directory=cache_directory,
                                                downsampling=downsampling,
-                                               num_cross_validation_folds=num_cross_validation_folds)
+                                               num_cross_validation_folds=num_cross_validation_folds,
+                                               shared_data_directory=shared_data_directory)
         random_search = SigmoidRandomSearch(config_space=config_space,
                                          pipeline_runner=pipeline_runner,
                                          wallclock_limit=wallclock_limit,
                                          memory_limit=memory_limit,
                                          statistics=statistics,
+                                         worker_pool=build_worker_pool(pipeline_runner, memory_limit, persistent_workers),
                                          constant_pipeline_steps=["one_hot_encoder", "imputation", "rescaling",
                                                                   "balancing", "feature_preprocessor"],
                                          variable_pipeline_steps=["classifier"],
                                          splitting_number=splitting_number,
-                                         random_splitting_enabled=False)
+                                         random_splitting_enabled=False,
+                                         prefix_sharing=prefix_sharing,
+                                         num_batch_workers=num_batch_workers)
+    elif version == 'successive_halving':
+        pipeline_runner = CachedPipelineRunner(data=data,
+                                               data_info=dataset_properties,
+                                               pipeline_space=pipeline_space,
+                                               runhistory=None,
+                                               cached_pipeline_steps=cached_pipeline_steps,
+                                               statistics=statistics,
+                                               cache_directory=cache_directory,
+                                               downsampling=downsampling,
+                                               num_cross_validation_folds=num_cross_validation_folds,
+                                               shared_data_directory=shared_data_directory)
+        random_search = SuccessiveHalvingRandomSearch(config_space=config_space,
+                                                      pipeline_runner=pipeline_runner,
+                                                      wallclock_limit=wallclock_limit,
+                                                      memory_limit=memory_limit,
+                                                      statistics=statistics,
+                                                      worker_pool=build_worker_pool(pipeline_runner, memory_limit,
+                                                                                    persistent_workers),
+                                                      eta=eta)
+    elif num_workers > 1:
+        pipeline_runner = PipelineRunner(data=data,
+                                         data_info=dataset_properties,
+                                         pipeline_space=pipeline_space,
+                                         runhistory=None,
+                                         statistics=statistics,
+                                         downsampling=downsampling,
+                                         num_cross_validation_folds=num_cross_validation_folds,
+                                         shared_data_directory=shared_data_directory)
+        random_search = ParallelRandomSearch(config_space=config_space,
+                                             pipeline_runner=pipeline_runner,
+                                             wallclock_limit=wallclock_limit,
+                                             memory_limit=memory_limit,
+                                             statistics=statistics,
+                                             num_workers=num_workers)
     else:
         pipeline_runner = PipelineRunner(data=data,
                                          data_info=dataset_properties,
@@ -122,17 +168,21 @@ def run_random_search(stamp, data_path, version, wallclock_limit, run_limit, mem
                                          runhistory=None,
                                          statistics=statistics,
                                          downsampling=downsampling,
-                                         num_cross_validation_folds=num_cross_validation_folds)
+                                         num_cross_validation_folds=num_cross_validation_folds,
+                                         shared_data_directory=shared_data_directory)
         random_search = RandomSearch(config_space=config_space,
                                      pipeline_runner=pipeline_runner,
                                      wallclock_limit=wallclock_limit,
                                      memory_limit=memory_limit,
-                                     statistics=statistics)
+                                     statistics=statistics,
+                                     worker_pool=build_worker_pool(pipeline_runner, memory_limit, persistent_workers))
 
     # Run random search
     print("start random search")
     incumbent = random_search.run(cutoff=cutoff)
     print("... end random search")
+    if random_search.worker_pool != None:
+        random_search.worker_pool.shutdown()
 
     # test performance of incumbents
     incumbent_trajectory = statistics.get_incumbent_trajectory(config_space=config_space)
@@ -145,14 +195,23 @@ def run_random_search(stamp, data_path, version, wallclock_limit, run_limit, mem
         traj['incumbent'] = traj['incumbent'].get_dictionary()
     statistics.add_incumbents_trajectory(trajectory)
 
+    pipeline_runner.clean_shared_data()
+
     return incumbent
 
 
+def build_worker_pool(pipeline_runner, memory_limit, persistent_workers):
+    if not persistent_workers:
+        return None
+    return EvaluationWorkerPool(ta=pipeline_runner.run, memory_limit=memory_limit, state_owner=pipeline_runner)
+
+
 def run_tests(data, dataset_properties, trajectory, pipeline_space, downsampling=None):
     pt = PipelineTester(data, dataset_properties, pipeline_space, downsampling=downsampling)
 
-    for traj in trajectory:
-        traj['test_performance'] = pt.get_error(traj['incumbent'])
+    test_performances = pt.get_errors([traj['incumbent'] for traj in trajectory])
+    for traj, test_performance in zip(trajectory, test_performances):
+        traj['test_performance'] = test_performance
 
     return trajectory
 
@@ -172,6 +231,12 @@ def parse_arguments():
     parser.add_argument("-o", "--outputdir", type=str, default=None, help="Output directory")
     parser.add_argument("-cd", "--cachedir", type=str, default=None, help="Cache directory")
     parser.add_argument("-ds", "--downsampling", type=int, default=None, help="Downsampling of data")
+    parser.add_argument("-sd", "--shared_data_dir", type=str, default=None, help="Directory for memory-mapped training data")
+    parser.add_argument("-pw", "--persistent_workers", type=int, default=0, help="Use a pool of persistent workers")
+    parser.add_argument("-nw", "--num_workers", type=int, default=1, help="Number of workers of the parallel random search")
+    parser.add_argument("-pf", "--prefix_sharing", type=int, default=0, help="Fit the shared pipeline prefix once per batch (2step and sigmoid)")
+    parser.add_argument("-bw", "--num_batch_workers", type=int, default=1, help="Number of processes that evaluate a batch with a shared prefix")
+    parser.add_argument("-et", "--eta", type=int, default=3, help="Fraction of configurations promoted per rung of successive halving (1/eta)")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -188,4 +253,10 @@ if __name__ == "__main__":
                       seed=args.seed,
                       output_dir=args.outputdir,
                       cache_directory=args.cachedir,
-                      downsampling=args.downsampling)
\ No newline at end of file
+                      downsampling=args.downsampling,
+                      shared_data_directory=args.shared_data_dir,
+                      persistent_workers=args.persistent_workers == 1,
+                      num_workers=args.num_workers,
+                      prefix_sharing=args.prefix_sharing == 1,
+                      num_batch_workers=args.num_batch_workers,
+                      eta=args.eta)
\ No newline at end of file
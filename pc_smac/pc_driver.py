@@ -9,19 +9,24 @@ import shutil
 from smac.scenario.scenario import Scenario
 from smac.optimizer.objective import average_cost
 from smac.stats.stats import Stats
-from smac.tae.execute_func import ExecuteTAFuncDict
 from smac.utils.io.traj_logging import TrajLogger
 
 from pc_smac.pc_smac.config_space.config_space_builder import ConfigSpaceBuilder
 from pc_smac.pc_smac.data_loader.data_loader import DataLoader
+from pc_smac.pc_smac.pc_runhistory.columnar_runhistory import ColumnarPCRunHistory
 from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
 from pc_smac.pc_smac.pc_smbo.smbo_builder import SMBOBuilder
+from pc_smac.pc_smac.pc_smbo.checkpoint import Checkpointer
+from pc_smac.pc_smac.pc_smbo.warm_start import WarmStarter, compute_meta_features
 from pc_smac.pc_smac.pipeline.pipeline_runner import PipelineRunner, CachedPipelineRunner, PipelineTester
+from pc_smac.pc_smac.pipeline.worker_pool import EvaluationWorkerPool, ExecuteTAFuncWithWorkerPool
 from pc_smac.pc_smac.pipeline_space.pipeline_space import PipelineSpace
 from pc_smac.pc_smac.pipeline_space.pipeline_space_builder import PipelineSpaceBuilder
 from pc_smac.pc_smac.pipeline_space.pipeline_step import OneHotEncodingStep, ImputationStep, RescalingStep, \
     BalancingStep, PreprocessingStep, ClassificationStep
+from pc_smac.pc_smac.utils.result_store import ExecuteTAFuncWithResultStore
 from pc_smac.pc_smac.utils.statistics import Statistics
+from pc_smac.pc_smac.pc_smbo.overhead import OverheadRecorder
 
 
 class Driver:
@@ -49,9 +54,26 @@ class Driver:
 
     def initialize(self, stamp, acq_func, double_intensification, cache_directory, wallclock_limit, runcount_limit,
                    cutoff, memory_limit, downsampling, intensification_fold_size,
-                   random_splitting_number, random_splitting_enabled):
+                   random_splitting_number, random_splitting_enabled, shared_data_directory=None,
+                   persistent_workers=False, max_tasks_per_worker=100, trace_allocations=False,
+                   full_model_retrain_every=None, batch_size=1, asynchronous=False,
+                   vectorized_marginalization=False, checkpoint_every=None, resume=False, warm_start=0,
+                   warm_start_transfer=False, initial_design_prefixes=0, initial_design_classifiers_per_prefix=3,
+                   initial_design_budget_fraction=0.1, cache_aware_ordering=False,
+                   racing=False, racing_alpha=0.05, log_overhead=False, result_store_directory=None,
+                   materialize_folds=False, columnar_runhistory=True):
         # Check if caching is enabled
         caching = True if acq_func[:2] == "pc" else False
+        self.caching = caching
+
+        # Reuse the cache directory and the cache of the checkpoint when resuming
+        checkpoint_directory = os.path.join(self.output_dir, "checkpoints", str(stamp))
+        cachedir = None
+        if resume and Checkpointer(checkpoint_directory, self.config_space).has_checkpoint():
+            checkpoint_state = Checkpointer(checkpoint_directory, self.config_space).load_state()
+            if cache_directory == None:
+                cache_directory = checkpoint_state['cache_directory']
+            cachedir = checkpoint_state.get('cachedir')
 
         # Make a cache directory
         if cache_directory == None:
@@ -71,9 +93,10 @@ class Driver:
         # Load data
         self.data = self.data_loader.get_data()
 
-        # Build runhistory
+        # Build runhistory, the columnar runhistory lets the data of the model be converted incrementally (see
+        #   IncrementalRunHistory2EPM)
         # TODO Does this work correctly for non-caching?
-        runhistory = PCRunHistory(average_cost)
+        runhistory = ColumnarPCRunHistory(average_cost) if columnar_runhistory else PCRunHistory(average_cost)
 
         # Setup statistics
         info = {
@@ -90,6 +113,17 @@ class Driver:
                                      information=info,
                                      total_runtime=wallclock_limit)
 
+        # Seed the initial design with the best configurations of previous optimizations on similar datasets
+        meta_features = compute_meta_features(self.data_loader.info)
+        initial_configurations, transfer_runhistory = None, None
+        if warm_start > 0:
+            warm_starter = WarmStarter([self.output_dir], self.config_space, num_neighbours=warm_start,
+                                       exclude_files=[self.statistics.meta_features_file])
+            initial_configurations = warm_starter.get_initial_configurations(meta_features)
+            if warm_start_transfer:
+                transfer_runhistory = warm_starter.get_transfer_runhistory(meta_features, average_cost)
+        self.statistics.save_meta_features(meta_features)
+
         # The pipeline parts that get marginalized
         constant_pipeline_steps = ["one_hot_encoder", "imputation", "rescaling",
                                    "balancing", "feature_preprocessor"]
@@ -107,11 +141,21 @@ class Driver:
                                       cached_pipeline_steps=cached_pipeline_steps,
                                       cache_directory=self.cache_directory,
                                       downsampling=downsampling,
-                                      num_cross_validation_folds=intensification_fold_size)
+                                      num_cross_validation_folds=intensification_fold_size,
+                                      shared_data_directory=shared_data_directory,
+                                      trace_allocations=trace_allocations,
+                                      result_store_directory=result_store_directory,
+                                      materialize_folds=materialize_folds,
+                                      cachedir=cachedir)
         else:
             pr = PipelineRunner(self.data, self.data_loader.info, self.pipeline_space, runhistory, self.statistics,
                                              downsampling=downsampling,
-                                            num_cross_validation_folds=intensification_fold_size)
+                                            num_cross_validation_folds=intensification_fold_size,
+                                            shared_data_directory=shared_data_directory,
+                                            trace_allocations=trace_allocations,
+                                            result_store_directory=result_store_directory,
+                                            materialize_folds=materialize_folds)
+        self.pipeline_runner = pr
 
         # Choose acquisition function
         if acq_func in ["eips", "pc-eips", "m-eips", "pc-m-eips", "pceips", "pc-m-pceips"]:
@@ -150,11 +194,47 @@ class Driver:
                       stamp=stamp)
 
         # Build tae runner
-        tae_runner = ExecuteTAFuncDict(ta=pr.run,
-                                       stats=stats,
-                                       runhistory=runhistory,
-                                       run_obj=scenario.run_obj,
-                                       memory_limit=scenario.memory_limit)
+        self.worker_pool = None
+        if persistent_workers or batch_size > 1 or asynchronous:
+            # A batch of challengers is evaluated concurrently by one worker per challenger, the asynchronous
+            #   optimization loop keeps batch_size workers busy
+            self.worker_pool = EvaluationWorkerPool(ta=pr.run,
+                                                    memory_limit=scenario.memory_limit,
+                                                    num_workers=batch_size,
+                                                    max_tasks_per_worker=max_tasks_per_worker,
+                                                    state_owner=pr)
+            tae_runner = ExecuteTAFuncWithWorkerPool(ta=pr.run,
+                                                     worker_pool=self.worker_pool,
+                                                     stats=stats,
+                                                     runhistory=runhistory,
+                                                     run_obj=scenario.run_obj,
+                                                     memory_limit=scenario.memory_limit)
+        else:
+            tae_runner = ExecuteTAFuncWithResultStore(ta=pr.run,
+                                                      pipeline_runner=pr,
+                                                      stats=stats,
+                                                      runhistory=runhistory,
+                                                      run_obj=scenario.run_obj,
+                                                      memory_limit=scenario.memory_limit)
+
+        # Build the record of the overhead of the optimizer at every iteration
+        overhead_recorder = None
+        if log_overhead:
+            overhead_recorder = OverheadRecorder(self.statistics)
+            overhead_recorder.instrument_runhistory(runhistory)
+
+        # Build checkpointer
+        self.checkpointer = None
+        if checkpoint_every != None or resume:
+            self.checkpointer = Checkpointer(checkpoint_directory,
+                                             self.config_space,
+                                             statistics=self.statistics,
+                                             checkpoint_every=checkpoint_every if checkpoint_every != None else 600,
+                                             cache_directory=self.cache_directory,
+                                             cachedir=pr.pipeline_builder.cachedir if caching else None)
+            # A new optimization with the same stamp must not continue from an old checkpoint
+            if not resume and self.checkpointer.has_checkpoint():
+                self.checkpointer.remove()
 
         # Build SMBO object
         intensification_instances = [1] if intensification_fold_size == None else [i for i in range(0, intensification_fold_size)]
@@ -177,7 +257,23 @@ class Driver:
             num_marginalized_configurations_by_random_search=20,
             num_configs_for_marginalization=40,
             random_splitting_number=random_splitting_number,
-            random_splitting_enabled=random_splitting_enabled)
+            random_splitting_enabled=random_splitting_enabled,
+            incremental_model_updates=full_model_retrain_every != None,
+            full_model_retrain_every=full_model_retrain_every,
+            batch_size=batch_size,
+            worker_pool=self.worker_pool,
+            asynchronous=asynchronous,
+            vectorized_marginalization=vectorized_marginalization,
+            checkpointer=self.checkpointer,
+            initial_configurations=initial_configurations,
+            transfer_runhistory=transfer_runhistory,
+            initial_design_prefixes=initial_design_prefixes,
+            initial_design_classifiers_per_prefix=initial_design_classifiers_per_prefix,
+            initial_design_budget_fraction=initial_design_budget_fraction,
+            cache_aware_ordering=cache_aware_ordering,
+            racing=racing,
+            racing_alpha=racing_alpha,
+            overhead_recorder=overhead_recorder)
 
 
     def run(self,
@@ -192,7 +288,30 @@ class Driver:
             downsampling=None,
             intensification_fold_size=None,
             random_splitting_number=5,
-            random_splitting_enabled=False):
+            random_splitting_enabled=False,
+            shared_data_directory=None,
+            persistent_workers=False,
+            max_tasks_per_worker=100,
+            trace_allocations=False,
+            test_workers=1,
+            full_model_retrain_every=None,
+            batch_size=1,
+            asynchronous=False,
+            vectorized_marginalization=False,
+            checkpoint_every=None,
+            resume=False,
+            warm_start=0,
+            warm_start_transfer=False,
+            initial_design_prefixes=0,
+            initial_design_classifiers_per_prefix=3,
+            initial_design_budget_fraction=0.1,
+            cache_aware_ordering=False,
+            racing=False,
+            racing_alpha=0.05,
+            log_overhead=False,
+            result_store_directory=None,
+            materialize_folds=False,
+            columnar_runhistory=True):
 
         random_leaf_size = None
 
@@ -208,24 +327,54 @@ class Driver:
                         downsampling=downsampling,
                         intensification_fold_size=intensification_fold_size,
                         random_splitting_number=random_splitting_number,
-                        random_splitting_enabled=random_splitting_enabled)
+                        random_splitting_enabled=random_splitting_enabled,
+                        shared_data_directory=shared_data_directory,
+                        persistent_workers=persistent_workers,
+                        max_tasks_per_worker=max_tasks_per_worker,
+                        trace_allocations=trace_allocations,
+                        full_model_retrain_every=full_model_retrain_every,
+                        batch_size=batch_size,
+                        asynchronous=asynchronous,
+                        vectorized_marginalization=vectorized_marginalization,
+                        checkpoint_every=checkpoint_every,
+                        resume=resume,
+                        warm_start=warm_start,
+                        warm_start_transfer=warm_start_transfer,
+                        initial_design_prefixes=initial_design_prefixes,
+                        initial_design_classifiers_per_prefix=initial_design_classifiers_per_prefix,
+                        initial_design_budget_fraction=initial_design_budget_fraction,
+                        cache_aware_ordering=cache_aware_ordering,
+                        racing=racing,
+                        racing_alpha=racing_alpha,
+                        log_overhead=log_overhead,
+                        result_store_directory=result_store_directory,
+                        materialize_folds=materialize_folds,
+                        columnar_runhistory=columnar_runhistory)
+
+        # When resuming, the trajectory and statistics files of the interrupted run are continued
+        resuming = self.checkpointer != None and self.checkpointer.has_checkpoint()
 
         # clean trajectory files
-        self._clean_trajectory_files()
+        if not resuming:
+            self._clean_trajectory_files()
 
         # Start timer and clean statistics files
         self.statistics.start_timer()
-        self.statistics.clean_files()
+        if not resuming:
+            self.statistics.clean_files()
 
         # Run SMBO
         incumbent = self.smbo.run()
 
+        if self.worker_pool != None:
+            self.worker_pool.shutdown()
+
         # Save statistics
         # self.statistics.save()
 
         # Read trajectory files with incumbents and retrieve test performances
         self.trajectory = TrajLogger.read_traj_aclib_format(self.trajectory_path_json, self.config_space)
-        trajectory = self.run_tests(self.trajectory, downsampling=downsampling)
+        trajectory = self.run_tests(self.trajectory, downsampling=downsampling, num_workers=test_workers)
 
         # Save new trajectory to output directory
         # First transform the configuration to a dictionary
@@ -233,17 +382,27 @@ class Driver:
             traj['incumbent'] = traj['incumbent'].get_dictionary()
         self.statistics.add_incumbents_trajectory(trajectory)
 
+        # Remove the memory-mapped copies of the data
+        self.pipeline_runner.clean_shared_data()
+
         # Clean cache after running
         # shutil.rmtree(dir_name)
 
         return incumbent
 
 
-    def run_tests(self, trajectory, downsampling=None):
-        pt = PipelineTester(self.data, self.data_loader.info, self.pipeline_space, downsampling=downsampling)
+    def run_tests(self, trajectory, downsampling=None, num_workers=1):
+        # Reuse fitted pipeline prefixes between the incumbents in the cache of the optimization when caching is
+        #   enabled
+        cachedir = self.pipeline_runner.pipeline_builder.cachedir if self.caching else None
+        pt = PipelineTester(self.data, self.data_loader.info, self.pipeline_space, downsampling=downsampling,
+                            cachedir=cachedir)
 
-        for traj in trajectory:
-            traj['test_performance'] = pt.get_error(traj['incumbent'])
+        test_performances = pt.get_errors([traj['incumbent'] for traj in trajectory], num_workers=num_workers)
+        for traj, test_performance in zip(trajectory, test_performances):
+            traj['test_performance'] = test_performance
+
+        pt.clean_cache()
 
         return trajectory
 
@@ -0,0 +1,113 @@
+
+import numpy as np
+
+
+class CachingDiscountEngine(object):
+    """
+    Computes the caching discounts (the runtime of the cached pipeline parts) for a whole matrix of configuration
+    vectors (see Configuration.get_array()) at once.
+
+    The column indices of every group of cached pipeline steps are computed once. The cached configurations of the
+    ledger are converted to vector keys once, after which the discounts of a batch of candidates only need a
+    unique over the rows of every group and one dictionary lookup per distinct prefix.
+    """
+
+    def __init__(self, config_space, cached_pipeline_steps):
+        self.config_space = config_space
+        self.cached_pipeline_steps = cached_pipeline_steps
+
+        # Column indices of the hyperparameters of every group of cached pipeline steps
+        self.columns = []
+        for pipeline_steps in cached_pipeline_steps:
+            columns = [config_space._hyperparameter_idx[hp_name] for hp_name in config_space.get_hyperparameter_names()
+                       if hp_name.split(":")[0] in pipeline_steps]
+            self.columns.append(np.array(sorted(columns), dtype=int))
+
+        # For every group a dictionary vector key -> digest of the cached configuration in the ledger
+        self.prefix_keys = [{} for _ in cached_pipeline_steps]
+        self.known_digests = set()
+
+    def compute_discounts(self, X, ledger):
+        """
+
+        Parameters
+        ----------
+        X:          np.ndarray (N, D) with the configuration vectors of the candidates
+        ledger:     CachedConfigurationLedger of the runhistory
+
+        Returns
+        -------
+        np.ndarray (N,) with the sum of the runtimes of the cached pipeline parts of every candidate
+
+        """
+        X = np.atleast_2d(X)
+        self._update_prefix_keys(ledger)
+
+        discounts = np.zeros(X.shape[0])
+        for columns, prefix_keys in zip(self.columns, self.prefix_keys):
+            if prefix_keys == {} or len(columns) == 0:
+                continue
+            rows = self._get_row_keys(X[:, columns])
+            unique_rows, inverse = np.unique(rows, return_inverse=True)
+            unique_discounts = np.array([ledger.get(prefix_keys.get(row.tobytes()), 0) for row in unique_rows])
+            discounts += unique_discounts[inverse]
+        return discounts
+
+    def get_prefix_keys(self, X, ledger):
+        """
+
+        Parameters
+        ----------
+        X:          np.ndarray (N, D) with the configuration vectors of the candidates
+        ledger:     CachedConfigurationLedger of the runhistory
+
+        Returns
+        -------
+        For every group of cached pipeline steps a list with, for every candidate, a pair (key of its pipeline
+        prefix, digest of the prefix in the ledger or None if the prefix is not cached)
+
+        """
+        X = np.atleast_2d(X)
+        self._update_prefix_keys(ledger)
+
+        groups = []
+        for columns, prefix_keys in zip(self.columns, self.prefix_keys):
+            keys = [row.tobytes() for row in self._get_row_keys(X[:, columns])]
+            groups.append([(key, prefix_keys.get(key)) for key in keys])
+        return groups
+
+    #### Internal methods ####
+
+    def _update_prefix_keys(self, ledger):
+        for digest, cached_config in ledger.configs.items():
+            if digest in self.known_digests:
+                continue
+            self.known_digests.add(digest)
+            step_names = set([hp_name.split(":")[0] for hp_name in cached_config])
+            for group_idx, pipeline_steps in enumerate(self.cached_pipeline_steps):
+                if step_names != set(pipeline_steps):
+                    continue
+                vector = self._get_vector(cached_config)
+                if vector is not None:
+                    row = self._get_row_keys(vector[self.columns[group_idx]].reshape((1, -1)))[0]
+                    self.prefix_keys[group_idx][row.tobytes()] = digest
+
+    def _get_vector(self, config_dict):
+        vector = np.ndarray(len(self.config_space._hyperparameters), dtype=np.float64)
+        vector[:] = np.nan
+        for hp_name, value in config_dict.items():
+            if value is None:
+                continue
+            try:
+                hyperparameter = self.config_space.get_hyperparameter(hp_name)
+                vector[self.config_space._hyperparameter_idx[hp_name]] = hyperparameter._inverse_transform(value)
+            except (KeyError, ValueError):
+                return None
+        return vector
+
+    def _get_row_keys(self, X_sub):
+        # Inactive hyperparameters are NaN, which never compares equal, so replace them by -1 (vector values are >= 0)
+        #   and round away the float noise of transforming values back and forth
+        X_sub = np.where(np.isnan(X_sub), -1., np.round(X_sub, 8) + 0.)
+        X_sub = np.ascontiguousarray(X_sub, dtype=np.float64)
+        return X_sub.view(np.dtype((np.void, X_sub.dtype.itemsize * X_sub.shape[1]))).ravel()
@@ -0,0 +1,236 @@
+
+import numpy as np
+
+from smac.configspace import convert_configurations_to_array
+from smac.runhistory.runhistory import RunKey
+from smac.runhistory.runhistory2epm import RunHistory2EPM4Cost, RunHistory2EPM4LogCost, RunHistory2EPM4EIPS
+from smac.tae.execute_ta_run import StatusType
+from smac.utils import constants
+
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
+
+
+class ColumnarPCRunHistory(PCRunHistory):
+    """
+    PCRunHistory that additionally stores every run, in the order the runs were added, in preallocated numpy arrays
+    that grow by doubling: configuration vectors (with the inactive hyperparameters imputed by their default, as the
+    EPM gets them), costs, times, statuses, instance ids and seeds. This makes it possible to retrieve the runs that
+    were added since a given offset without going over the whole runhistory, see IncrementalRunHistory2EPM.
+    """
+
+    def __init__(self, aggregate_func, initial_capacity=1024):
+        super(ColumnarPCRunHistory, self).__init__(aggregate_func)
+        self.initial_capacity = initial_capacity
+        self._reset_rows()
+
+    def add(self, config, cost, time,
+            status, instance_id=None,
+            seed=None,
+            additional_info=None):
+        super(ColumnarPCRunHistory, self).add(config, cost, time, status, instance_id, seed, additional_info)
+        self._set_row(RunKey(self.config_ids[config], instance_id, seed))
+
+    def load_json(self, fn, cs):
+        super(ColumnarPCRunHistory, self).load_json(fn, cs)
+        # The rows follow the runs of the file, whether or not the runs were loaded with add
+        self._reset_rows()
+        for key in self.data.keys():
+            self._set_row(key)
+
+    def get_run_keys_since(self, offset):
+        return self.run_keys[offset:self.num_rows]
+
+    def get_arrays(self, offset=0):
+        """
+
+        Returns
+        -------
+        Dictionary with read-only views on the rows that were added since the offset
+
+        """
+        arrays = {
+            'config_vectors': self.config_vectors[offset:self.num_rows] if self.config_vectors is not None
+                                else np.zeros((0, 0)),
+            'costs': self.costs[offset:self.num_rows],
+            'times': self.times[offset:self.num_rows],
+            'statuses': self.statuses[offset:self.num_rows],
+            'instance_ids': self.instance_ids[offset:self.num_rows],
+            'seeds': self.seeds[offset:self.num_rows]
+        }
+        for array in arrays.values():
+            array.flags.writeable = False
+        return arrays
+
+    #### Internal methods ####
+
+    def _reset_rows(self):
+        self.capacity = self.initial_capacity
+        self.num_rows = 0
+        # Number of runs that were added for a key that already existed. The row of such a run changes, so
+        #   incremental consumers have to start over
+        self.num_overwrites = 0
+        self.row_index = {}
+        self.run_keys = []
+
+        self.config_vectors = None
+        self.costs = np.zeros(self.capacity)
+        self.times = np.zeros(self.capacity)
+        self.statuses = np.zeros(self.capacity, dtype=int)
+        self.instance_ids = np.empty(self.capacity, dtype=object)
+        self.seeds = np.empty(self.capacity, dtype=object)
+
+    def _set_row(self, key):
+        run_value = self.data[key]
+        if key in self.row_index:
+            row = self.row_index[key]
+            self.num_overwrites += 1
+        else:
+            row = self._append_row(key, self.ids_config[key.config_id])
+
+        self.costs[row] = np.mean(run_value.cost) if np.iterable(run_value.cost) else run_value.cost
+        self.times[row] = run_value.time
+        self.statuses[row] = run_value.status.value
+        self.instance_ids[row] = key.instance_id
+        self.seeds[row] = key.seed
+
+    def _append_row(self, key, config):
+        vector = convert_configurations_to_array([config])[0]
+        if self.config_vectors is None:
+            self.config_vectors = np.zeros((self.capacity, vector.shape[0]))
+        if self.num_rows == self.capacity:
+            self._grow()
+
+        row = self.num_rows
+        self.config_vectors[row] = vector
+        self.row_index[key] = row
+        self.run_keys.append(key)
+        self.num_rows += 1
+        return row
+
+    def _grow(self):
+        self.capacity *= 2
+        self.config_vectors = self._resize(self.config_vectors)
+        self.costs = self._resize(self.costs)
+        self.times = self._resize(self.times)
+        self.statuses = self._resize(self.statuses)
+        self.instance_ids = self._resize(self.instance_ids)
+        self.seeds = self._resize(self.seeds)
+
+    def _resize(self, array):
+        resized = np.zeros((self.capacity,) + array.shape[1:], dtype=array.dtype) if array.dtype != object \
+            else np.empty((self.capacity,) + array.shape[1:], dtype=object)
+        resized[:array.shape[0]] = array
+        return resized
+
+
+class IncrementalRunHistory2EPM(object):
+    """
+    Wraps a runhistory2epm object (RunHistory2EPM4Cost, RunHistory2EPM4LogCost or RunHistory2EPM4EIPS) and builds X
+    and Y from the arrays of a ColumnarPCRunHistory (see get_arrays): only the runs that were added since the previous
+    call are converted, with array operations, and appended to the previously converted rows. The rows are the same
+    and in the same order as the ones of the wrapped transform: the block of the successful runs, followed by the
+    block of the runs that timed out at the cutoff, each in the order the runs were added. The rows of new runs are
+    therefore not all at the end of the data when there are timeouts, get_row_keys tells which run every row belongs
+    to.
+
+    The rows are converted again from the start when runs were overwritten and every full_transform_every calls.
+    Other converters, the imputation of censored data and runhistories that are not columnar are left to the wrapped
+    object.
+    """
+
+    def __init__(self, runhistory2epm, full_transform_every=50):
+        self.runhistory2epm = runhistory2epm
+        self.full_transform_every = full_transform_every
+        self.num_calls = 0
+        # Whether the last transform was done by this object, otherwise it was left to the wrapped converter
+        self.is_incremental = False
+        self._reset(0)
+
+    def transform(self, runhistory):
+        self.num_calls += 1
+        self.is_incremental = self._is_supported(runhistory)
+        if not self.is_incremental:
+            return self.runhistory2epm.transform(runhistory)
+
+        if runhistory.num_overwrites != self.num_overwrites \
+                or (self.full_transform_every and self.num_calls % self.full_transform_every == 0):
+            self._reset(runhistory.num_overwrites)
+
+        if runhistory.num_rows > self.offset or self.X_success is None:
+            self._add_rows(runhistory.get_arrays(self.offset), runhistory.get_run_keys_since(self.offset))
+            self.offset = runhistory.num_rows
+        return np.vstack((self.X_success, self.X_timeout)), np.concatenate((self.Y_success, self.Y_timeout))
+
+    def get_row_keys(self):
+        """
+
+        Returns
+        -------
+        List with the run key of every row of the data of the last transform, in the order of the rows, or None if the
+        last transform was left to the wrapped converter
+
+        """
+        if not self.is_incremental:
+            return None
+        return self.keys_success + self.keys_timeout
+
+    def __getattr__(self, name):
+        return getattr(self.runhistory2epm, name)
+
+    #### Internal methods ####
+
+    def _is_supported(self, runhistory):
+        return isinstance(runhistory, ColumnarPCRunHistory) and not self.runhistory2epm.impute_censored_data \
+               and type(self.runhistory2epm) in [RunHistory2EPM4Cost, RunHistory2EPM4LogCost, RunHistory2EPM4EIPS]
+
+    def _reset(self, num_overwrites):
+        self.X_success, self.Y_success = None, None
+        self.X_timeout, self.Y_timeout = None, None
+        self.keys_success, self.keys_timeout = [], []
+        self.offset = 0
+        self.num_overwrites = num_overwrites
+
+    def _add_rows(self, arrays, run_keys):
+        converter = self.runhistory2epm
+        statuses = arrays['statuses']
+        times = arrays['times']
+        success = np.isin(statuses, [status.value for status in converter.success_states])
+        timeout = statuses == StatusType.TIMEOUT.value
+        if converter.cutoff_time != None:
+            timeout &= times >= converter.cutoff_time
+        else:
+            timeout[:] = False
+
+        X = np.array(arrays['config_vectors'], dtype=np.float64).reshape((statuses.shape[0], converter.num_params))
+        if converter.n_feats:
+            features = [converter.instance_features[instance_id] for instance_id in arrays['instance_ids']]
+            X = np.hstack((X, np.array(features, dtype=np.float64).reshape((X.shape[0], converter.n_feats))))
+
+        X_success, Y_success = X[success], self._get_Y(arrays, success, par_factor=1)
+        X_timeout, Y_timeout = X[timeout], self._get_Y(arrays, timeout, par_factor=converter.scenario.par_factor)
+        self.keys_success.extend([run_keys[row] for row in np.flatnonzero(success)])
+        self.keys_timeout.extend([run_keys[row] for row in np.flatnonzero(timeout)])
+        if self.X_success is None:
+            self.X_success, self.Y_success = X_success, Y_success
+            self.X_timeout, self.Y_timeout = X_timeout, Y_timeout
+        else:
+            self.X_success = np.vstack((self.X_success, X_success))
+            self.Y_success = np.concatenate((self.Y_success, Y_success))
+            self.X_timeout = np.vstack((self.X_timeout, X_timeout))
+            self.Y_timeout = np.concatenate((self.Y_timeout, Y_timeout))
+
+    def _get_Y(self, arrays, rows, par_factor):
+        # As in _build_matrix of the wrapped converter
+        costs, times, statuses = arrays['costs'][rows], arrays['times'][rows], arrays['statuses'][rows]
+        if type(self.runhistory2epm) == RunHistory2EPM4EIPS:
+            return np.vstack((costs, np.log(1 + times))).T
+
+        if self.runhistory2epm.scenario.run_obj == "runtime":
+            y = np.where(statuses != StatusType.SUCCESS.value, times * par_factor, times)
+        else:
+            y = np.array(costs)
+        y = y.reshape((-1, 1))
+        if type(self.runhistory2epm) == RunHistory2EPM4LogCost:
+            y[y < constants.MINIMAL_COST_FOR_LOG] = constants.MINIMAL_COST_FOR_LOG
+            y = np.log10(y)
+        return y
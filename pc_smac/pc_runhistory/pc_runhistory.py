@@ -1,11 +1,111 @@
+import os
+import json
+
+from smac.runhistory.runhistory import RunHistory, RunKey
+
+from pc_smac.pc_smac.utils.config_digest import get_config_digest
+
+
+class CachedConfigurationLedger(dict):
+    """
+    Dictionary digest -> runtime of the cached algorithm configurations (parts of pipelines). Next to the runtime it
+    keeps the cached configuration itself and the number of times it was hit.
+
+    The keys are stable digests (see get_config_digest) such that the ledger can be persisted and shared between
+    processes. Ledgers that were stored with the old, process dependent key hash(frozenset(cached_config.items()))
+    are converted to digests when they are loaded (see from_json_dict).
+    """
+
+    def __init__(self):
+        super(CachedConfigurationLedger, self).__init__()
+        self.configs = {}
+        self.hits = {}
+        # Digests in the order they were added, such that the entries added since a point are found without a scan
+        self.digests = []
+        # Digests in the order they were added or their hits changed, only logged for a SharedRunHistory (see
+        #   record_changes)
+        self.changed_digests = None
+
+    def add(self, cached_config, runtime):
+        """
+
+        Returns
+        -------
+        True if the configuration was not in the ledger yet, otherwise the hit is counted and False is returned
+
+        """
+        digest = get_config_digest(cached_config)
+        if digest in self.configs:
+            self.hits[digest] += 1
+            self._add_changed_digest(digest)
+            return False
+        self._add(digest, cached_config, runtime, 0)
+        return True
+
+    def get_runtime(self, cached_config):
+        return dict.get(self, get_config_digest(cached_config))
+
+    def get_hits(self, cached_config):
+        return self.hits.get(get_config_digest(cached_config), 0)
+
+    def update_from_ledger(self, ledger):
+        for digest in ledger.configs:
+            if digest not in self.configs:
+                self._add(digest, ledger.configs[digest], ledger[digest], ledger.hits[digest])
+            else:
+                # Peers report their total number of hits, so take the maximum to avoid counting hits twice
+                if ledger.hits[digest] > self.hits[digest]:
+                    self.hits[digest] = ledger.hits[digest]
+                    self._add_changed_digest(digest)
+
+    def record_changes(self):
+        # The reader of the log empties it after every write, see SharedRunHistory
+        if self.changed_digests == None:
+            self.changed_digests = []
+
+    def to_json_dict(self):
+        return {digest: {'config': self.configs[digest],
+                         'runtime': self[digest],
+                         'hits': self.hits[digest]} for digest in self.configs}
+
+    @staticmethod
+    def from_json_dict(json_dict):
+        ledger = CachedConfigurationLedger()
+        for key, entry in json_dict.items():
+            digest = get_config_digest(entry['config'])
+            if digest in ledger.configs:
+                # Old keys of equal configurations (e.g. of different processes) are merged like the ledgers of peers
+                ledger.hits[digest] = max(ledger.hits[digest], entry['hits'])
+            else:
+                ledger._add(digest, entry['config'], entry['runtime'], entry['hits'])
+        return ledger
+
+    #### Internal methods ####
+
+    def _add(self, digest, cached_config, runtime, hits):
+        self[digest] = runtime
+        self.configs[digest] = cached_config
+        self.hits[digest] = hits
+        self.digests.append(digest)
+        self._add_changed_digest(digest)
+
+    def _add_changed_digest(self, digest):
+        if self.changed_digests != None:
+            self.changed_digests.append(digest)
 
-from smac.runhistory.runhistory import RunHistory
 
 class PCRunHistory(RunHistory):
 
     def __init__(self, aggregate_func):
-        self.cached_configurations = {}
-        self.hash_to_configs = {}
+        self.cached_configurations = CachedConfigurationLedger()
+        self.hash_to_configs = self.cached_configurations.configs
+        # The runs of a json file already contain the caching discounts, so they must not be added again
+        self._loading = False
+        # The cached configurations of a json file come from its ledger file, the runs must not count them as hits
+        self._ledger_from_file = False
+        # Keys of the runs in the order they were added or overwritten, without the runs that were loaded from a file
+        #   (e.g. of a peer), only logged for a SharedRunHistory (see record_changes)
+        self.changed_run_keys = None
         super(PCRunHistory, self).__init__(aggregate_func)
 
     def add(self, config, cost, time,
@@ -13,29 +113,85 @@ class PCRunHistory(RunHistory):
             seed=None,
             additional_info=None):
 
-        if additional_info and 't_rc' in additional_info.keys():
+        if additional_info and 'memoized_runtime' in additional_info.keys():
+            # The run was not executed, its result was recorded before (see ResultStore)
+            time = additional_info['memoized_runtime']
+        if additional_info and 't_rc' in additional_info.keys() and not self._ledger_from_file:
             # additional_info['t_rc'] is a list of tuples (dict, time) where dict is a cached algorithm (part of pipeline)
             #   configuration and time is runtime that this algorithm configuration took
             for cached_config, runtime in additional_info['t_rc']:
                 #print("cached config: {}".format(cached_config))
-                hash_value = hash(frozenset(cached_config.items()))
-                if not hash_value in self.cached_configurations.keys():
-                    self.cached_configurations[hash_value] = runtime
-                    self.hash_to_configs[hash_value] = cached_config
-                else:
-                    runtime_discount = self.cached_configurations[hash_value]
+                if not self.cached_configurations.add(cached_config, runtime) and not self._loading:
+                    runtime_discount = self.cached_configurations.get_runtime(cached_config)
                     time += runtime_discount
         #print("cached configurations reductions: {}".format(self.cached_configurations))
 
         super(PCRunHistory, self).add(config, cost, time, status, instance_id, seed, additional_info)
+        if not self._loading and self.changed_run_keys != None:
+            self.changed_run_keys.append(RunKey(self.config_ids[config], instance_id, seed))
 
-
+    def record_changes(self):
+        '''
+        Starts the logs of the runs and the cached configurations that were added or changed (changed_run_keys and
+        the changed_digests of the ledger). The logs are only kept for a SharedRunHistory, which empties them at
+        every write, otherwise they would grow with every run.
+        '''
+        if self.changed_run_keys == None:
+            self.changed_run_keys = []
+        self.cached_configurations.record_changes()
 
     def get_cached_configurations(self):
         return self.cached_configurations
 
     def get_cached_configurations_list(self):
-        return [key[0] for key in self.get_cached_configurations()]
+        return list(self.cached_configurations.configs.values())
 
     def get_all_configs(self):
-        return list(self.config_ids.keys())
\ No newline at end of file
+        return list(self.config_ids.keys())
+
+    def save_json(self, fn="runhistory.json", *args, **kwargs):
+        super(PCRunHistory, self).save_json(fn, *args, **kwargs)
+        self.save_cached_configurations_json(self._get_cached_configurations_file(fn))
+
+    def load_json(self, fn, cs):
+        cached_configurations_file = self._get_cached_configurations_file(fn)
+        self._loading = True
+        self._ledger_from_file = os.path.exists(cached_configurations_file)
+        try:
+            super(PCRunHistory, self).load_json(fn, cs)
+        finally:
+            self._loading = False
+            self._ledger_from_file = False
+        if os.path.exists(cached_configurations_file):
+            self.cached_configurations = self.load_cached_configurations_json(cached_configurations_file)
+            self.hash_to_configs = self.cached_configurations.configs
+            if self.changed_run_keys != None:
+                self.cached_configurations.record_changes()
+
+    def update_from_json(self, fn, cs, *args, **kwargs):
+        # The ledger of the peer is merged from its own counts (see CachedConfigurationLedger.update_from_ledger),
+        #   the replayed runs of the peer would count their cached configurations as hits of this runhistory
+        cached_configurations_file = self._get_cached_configurations_file(fn)
+        self._loading = True
+        self._ledger_from_file = os.path.exists(cached_configurations_file)
+        try:
+            super(PCRunHistory, self).update_from_json(fn, cs, *args, **kwargs)
+        finally:
+            self._loading = False
+            self._ledger_from_file = False
+        if os.path.exists(cached_configurations_file):
+            self.cached_configurations.update_from_ledger(
+                self.load_cached_configurations_json(cached_configurations_file))
+
+    def save_cached_configurations_json(self, fn):
+        with open(fn, "w") as fp:
+            json.dump(self.cached_configurations.to_json_dict(), fp, indent=2, sort_keys=True)
+
+    def load_cached_configurations_json(self, fn):
+        with open(fn) as fp:
+            return CachedConfigurationLedger.from_json_dict(json.load(fp))
+
+    #### Internal methods ####
+
+    def _get_cached_configurations_file(self, fn):
+        return os.path.splitext(fn)[0] + "_cached_configurations.json"
@@ -0,0 +1,190 @@
+
+import os
+import glob
+import json
+import fcntl
+import logging
+import itertools
+
+from collections import OrderedDict
+
+from ConfigSpace.configuration_space import Configuration
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory, CachedConfigurationLedger
+
+
+class SharedRunHistory(object):
+    """
+    Incremental replacement of pSMAC.read/pSMAC.write for parallel optimizers that share their runs (shared_model).
+
+    Every optimizer appends its new runs and its new or updated cached configurations (the ledger of the
+    PCRunHistory) as json lines to its own file shared_runhistory_<num_run>.jsonl, instead of rewriting its full
+    runhistory at every iteration. A reader keeps for every peer file the offset up to which it has read and only
+    reads the records after it, so both the writes and the reads are proportional to the new runs. The writer
+    follows the runs that were added or overwritten and the cached configurations that were added or hit since its
+    last write in the change logs of the PCRunHistory (changed_run_keys) and its ledger (changed_digests), the runs
+    that were read from the peers are not in these logs. The logs are started at the first read or write (see
+    attach), with the runs and cached configurations that the runhistory already has, and emptied at every write.
+    For other runhistories the runs after the last written one are shared.
+
+    Appends hold an exclusive lock on the file and reads a shared one. A reader only consumes complete lines, an
+    incomplete last record is read at the next call.
+    """
+
+    def __init__(self, directories, num_run, config_space):
+        self.directories = [directories] if isinstance(directories, str) else directories
+        self.num_run = num_run
+        self.config_space = config_space
+        self.file = os.path.join(self.directories[0], "shared_runhistory_%d.jsonl" % num_run)
+        self.logger = logging.getLogger("SharedRunHistory")
+
+        # Offsets of the peer files and the number of runs of other runhistories that are already shared
+        self.offsets = {}
+        self.num_runs_seen = 0
+        self.peer_run_keys = set()
+        self.ledger = None
+        self.shared_hits = {}
+
+    def attach(self, runhistory):
+        if isinstance(runhistory, PCRunHistory) and runhistory.changed_run_keys == None:
+            runhistory.record_changes()
+            runhistory.changed_run_keys.extend(runhistory.data.keys())
+            ledger = runhistory.get_cached_configurations()
+            ledger.changed_digests.extend(ledger.digests)
+
+    def write(self, runhistory):
+        self.attach(runhistory)
+        records = [self._get_run_record(runhistory, run_key) for run_key in self._get_new_run_keys(runhistory)]
+
+        if isinstance(runhistory, PCRunHistory):
+            ledger = runhistory.get_cached_configurations()
+            if ledger is not self.ledger:
+                # The ledger is replaced when a runhistory is loaded, its entries are compared with the shared ones
+                self.ledger = ledger
+                changed_digests = list(ledger.digests)
+            else:
+                changed_digests = list(ledger.changed_digests)
+            del ledger.changed_digests[:]
+            for digest in changed_digests:
+                if self.shared_hits.get(digest) != ledger.hits[digest]:
+                    records.append({'type': 'cached_configuration',
+                                    'digest': digest,
+                                    'config': ledger.configs[digest],
+                                    'runtime': ledger[digest],
+                                    'hits': ledger.hits[digest]})
+                    self.shared_hits[digest] = ledger.hits[digest]
+
+        if records == []:
+            return
+        lines = "".join([json.dumps(record, sort_keys=True) + "\n" for record in records])
+        with open(self.file, "a") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(lines)
+                fp.flush()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+        self.logger.debug("Shared model mode: Wrote %d records to %s" % (len(records), self.file))
+
+    def read(self, runhistory):
+        # The runs that the runhistory has before the first records of the peers are its own
+        self.attach(runhistory)
+        num_runs = len(runhistory.data)
+        for peer_file in self._get_peer_files():
+            records = self._read_new_records(peer_file)
+            if records == []:
+                continue
+            self._add_records(runhistory, records)
+            self.logger.debug("Shared model mode: Read %d new records from %s" % (len(records), peer_file))
+
+        # The runs of the peers are not written again
+        if not isinstance(runhistory, PCRunHistory):
+            for run_key in itertools.islice(runhistory.data.keys(), num_runs, None):
+                self.peer_run_keys.add(run_key)
+        self.logger.debug("Shared model mode: Finished loading new runs, found %d new runs." %
+                          (len(runhistory.data) - num_runs))
+
+    #### Internal methods ####
+
+    def _get_new_run_keys(self, runhistory):
+        if isinstance(runhistory, PCRunHistory):
+            # The run keys of the log are unique in the written order, an overwritten run is written again
+            run_keys = list(OrderedDict.fromkeys(runhistory.changed_run_keys))
+            del runhistory.changed_run_keys[:]
+            return run_keys
+
+        run_keys = [run_key for run_key in itertools.islice(runhistory.data.keys(), self.num_runs_seen, None)
+                    if run_key not in self.peer_run_keys]
+        self.num_runs_seen = len(runhistory.data)
+        return run_keys
+
+    def _get_run_record(self, runhistory, run_key):
+        run_value = runhistory.data[run_key]
+        return {'type': 'run',
+                'config': runhistory.ids_config[run_key.config_id].get_dictionary(),
+                'instance': run_key.instance_id,
+                'seed': run_key.seed,
+                'cost': run_value.cost,
+                'time': run_value.time,
+                'status': run_value.status.value,
+                'additional_info': run_value.additional_info}
+
+    def _get_peer_files(self):
+        peer_files = []
+        for directory in self.directories:
+            for fn in glob.glob(os.path.join(directory, "shared_runhistory_*.jsonl")):
+                if os.path.abspath(fn) != os.path.abspath(self.file):
+                    peer_files.append(fn)
+        return sorted(peer_files)
+
+    def _read_new_records(self, peer_file):
+        offset = self.offsets.get(peer_file, 0)
+        with open(peer_file, "rb") as fp:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            try:
+                fp.seek(offset)
+                content = fp.read()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+        end = content.rfind(b"\n") + 1
+        self.offsets[peer_file] = offset + end
+        return [json.loads(line) for line in content[:end].decode("utf-8").splitlines() if line.strip() != ""]
+
+    def _add_records(self, runhistory, records):
+        # The times of the runs already contain the caching discounts of the peer and the cached configurations
+        #   of the peer are merged from its ledger records
+        is_pc_runhistory = isinstance(runhistory, PCRunHistory)
+        if is_pc_runhistory:
+            runhistory._loading = True
+            runhistory._ledger_from_file = True
+        try:
+            for record in records:
+                if record['type'] != 'run':
+                    continue
+                try:
+                    config = Configuration(self.config_space, values=record['config'])
+                except (ValueError, KeyError):
+                    continue
+                runhistory.add(config=config,
+                               cost=record['cost'],
+                               time=record['time'],
+                               status=StatusType(record['status']),
+                               instance_id=record['instance'],
+                               seed=record['seed'],
+                               additional_info=record['additional_info'])
+        finally:
+            if is_pc_runhistory:
+                runhistory._loading = False
+                runhistory._ledger_from_file = False
+
+        if is_pc_runhistory:
+            ledger = CachedConfigurationLedger.from_json_dict({record['digest']: record for record in records
+                                                               if record['type'] == 'cached_configuration'})
+            runhistory.get_cached_configurations().update_from_ledger(ledger)
+            # Entries that are equal to the ones of the peer do not have to be shared again
+            hits = runhistory.get_cached_configurations().hits
+            for digest in ledger.configs:
+                if hits[digest] == ledger.hits[digest]:
+                    self.shared_hits[digest] = hits[digest]
@@ -0,0 +1,160 @@
+
+import math
+import logging
+
+import numpy as np
+
+
+class BatchSelector(object):
+    """
+    Selects a batch of diverse challengers out of the challengers sorted by acquisition value (local penalization):
+    a challenger is skipped if its configuration vector is closer than min_distance to an already selected challenger.
+
+    If a discount engine (see CachingDiscountEngine) is given, a challenger is also skipped if it shares a cached
+    pipeline part that is not in the cache yet with an already selected challenger, because the concurrent runs
+    would compute the same pipeline part twice.
+
+    Skipped challengers only fill up the batch if there are not enough diverse challengers.
+    """
+
+    def __init__(self, min_distance=0.05, discount_engine=None):
+        self.min_distance = min_distance
+        self.discount_engine = discount_engine
+
+    def select(self, challengers, batch_size, runhistory, exclude=None):
+        exclude = exclude if exclude != None else []
+        candidates = []
+        for challenger in challengers:
+            if challenger in exclude or challenger in candidates \
+                    or len(runhistory.get_runs_for_config(challenger)) > 0:
+                continue
+            candidates.append(challenger)
+        if len(candidates) <= batch_size:
+            return candidates
+
+        X = np.array([candidate.get_array() for candidate in candidates])
+        uncached_prefixes = self._get_uncached_prefixes(X, runhistory)
+
+        selected, skipped = [], []
+        for idx in range(len(candidates)):
+            if len(selected) == batch_size:
+                break
+            if selected != [] and (np.min(self._get_distances(X[idx], X[selected])) < self.min_distance or
+                                   any([uncached[idx] != None and uncached[idx] in uncached[selected]
+                                        for uncached in uncached_prefixes])):
+                skipped.append(idx)
+            else:
+                selected.append(idx)
+        selected.extend(skipped[:batch_size - len(selected)])
+        return [candidates[idx] for idx in selected]
+
+    #### Internal methods ####
+
+    def _get_distances(self, x, X):
+        # Mean distance over the hyperparameters, an inactive hyperparameter (NaN) differs maximally from an active one
+        differences = np.abs(X - x)
+        nans = np.isnan(X) != np.isnan(x)
+        differences[nans] = 1.
+        differences[np.isnan(differences)] = 0.
+        return np.mean(differences, axis=1)
+
+    def _get_uncached_prefixes(self, X, runhistory):
+        """
+        Returns
+        -------
+        For every group of cached pipeline steps an array with, for every candidate, the key of its pipeline prefix if
+            the prefix is not in the cache yet, otherwise None
+
+        """
+        if self.discount_engine == None:
+            return []
+        uncached_prefixes = []
+        for group in self.discount_engine.get_prefix_keys(X, runhistory.get_cached_configurations()):
+            uncached_prefixes.append(np.array([key if digest == None else None for key, digest in group],
+                                              dtype=object))
+        return uncached_prefixes
+
+
+class BatchEvaluator(object):
+    """
+    Evaluates a batch of configurations concurrently in an EvaluationWorkerPool on the instance-seed pairs of the
+    incumbent and adds the results to the runhistory and the stats, as the target algorithm runner would do for every
+    single run. The per-run limits are enforced by the worker pool.
+
+    The configurations are first evaluated on one instance-seed pair. Only the configurations that are not worse than
+    the incumbent on this pair are evaluated on the remaining pairs of the incumbent.
+    """
+
+    def __init__(self, worker_pool, runhistory, stats, cutoff=None, run_obj="quality"):
+        self.worker_pool = worker_pool
+        self.runhistory = runhistory
+        self.stats = stats
+        self.cutoff = int(math.ceil(cutoff)) if cutoff != None else None
+        self.run_obj = run_obj
+        self.logger = logging.getLogger("BatchEvaluator")
+
+    def evaluate(self, configs, incumbent, aggregate_func):
+        """
+
+        Returns
+        -------
+        The configurations that were not worse than the incumbent on all evaluated instance-seed pairs, sorted by cost
+
+        """
+        inst_seeds = sorted(self.runhistory.get_runs_for_config(incumbent))
+        if inst_seeds == [] or configs == []:
+            return []
+
+        self.evaluate_runs([(config, inst_seeds[0]) for config in configs])
+        survivors = [config for config in configs if self.is_not_worse(config, incumbent, aggregate_func)]
+
+        self.evaluate_runs([(config, inst_seed) for config in survivors for inst_seed in inst_seeds[1:]])
+        survivors = [config for config in survivors if self.is_not_worse(config, incumbent, aggregate_func)]
+
+        return sorted(survivors, key=lambda config: aggregate_func(config, self.runhistory,
+                                                                   self.runhistory.get_runs_for_config(config)))
+
+    def evaluate_runs(self, runs):
+        """
+        Evaluates a list of tuples (configuration, instance-seed pair) with all workers of the pool until the budget
+        is exhausted
+        """
+        pending = list(runs)
+        tasks = {}
+        while pending != [] or tasks != {}:
+            while pending != [] and self.worker_pool.has_idle_worker() and not self.stats.is_budget_exhausted():
+                config, (instance, seed) = pending.pop(0)
+                task_id = self.worker_pool.submit(config, instance=instance, cutoff=self.cutoff, seed=seed)
+                tasks[task_id] = (config, instance, seed)
+            if self.stats.is_budget_exhausted():
+                pending = []
+            if tasks == {}:
+                break
+            for task_id, result in self.worker_pool.get_results():
+                config, instance, seed = tasks.pop(task_id)
+                self.add_run(config, instance, seed, result)
+
+    def add_run(self, config, instance, seed, result):
+        status, cost, runtime, additional_info = result
+        if self.run_obj == "runtime":
+            cost = runtime
+        self.stats.ta_runs += 1
+        self.stats.ta_time_used += float(runtime)
+        self.runhistory.add(config=config,
+                            cost=cost,
+                            time=runtime,
+                            status=status,
+                            instance_id=instance,
+                            seed=seed,
+                            additional_info=additional_info)
+
+    def is_not_worse(self, config, incumbent, aggregate_func):
+        # Only the common instance-seed pairs count, a result that comes in late can be on a pair that the incumbent
+        #   has no run on
+        inst_seeds = sorted(set(self.runhistory.get_runs_for_config(config)) &
+                            set(self.runhistory.get_runs_for_config(incumbent)))
+        if inst_seeds == []:
+            return False
+        return aggregate_func(config, self.runhistory, inst_seeds) <= \
+               aggregate_func(incumbent, self.runhistory, inst_seeds)
+
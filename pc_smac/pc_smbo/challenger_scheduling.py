@@ -0,0 +1,99 @@
+
+import numpy as np
+
+from pc_smac.pc_smac.pc_smbo.marginalization import get_imputation_values
+
+
+class ChallengerScheduler(object):
+    """
+    Reorders the challengers for the cache: within a band of near-tied challengers, the challengers of which the
+    pipeline prefix (the cached pipeline parts, see CachingDiscountEngine) is in the cache go first, and the
+    challengers that share a prefix are grouped, such that the siblings of a prefix run right after it was computed.
+    The order of the bands, and so the acquisition ranking, is kept.
+
+    A band consists of at most band_size consecutive challengers. If an acquisition function is given, a band also
+    ends at the first challenger of which the acquisition value is more than tolerance (relative to the range of the
+    acquisition values of all challengers) below the one of the first challenger of the band.
+
+    Prefixes of challengers that are scheduled in an earlier band count as cached, they are computed by then.
+
+    The random configurations that are interleaved with the challengers (origin "Random Search") are not ranked by
+    the acquisition function, so they are left out of the bands and keep their positions in the list.
+    """
+
+    def __init__(self, discount_engine, band_size=5, acquisition_func=None, tolerance=0.05):
+        self.discount_engine = discount_engine
+        self.band_size = band_size
+        self.acquisition_func = acquisition_func
+        self.tolerance = tolerance
+        self.imputation_values = None
+
+    def schedule(self, challengers, runhistory):
+        random_positions = set([position for position, challenger in enumerate(challengers)
+                                if self._is_random(challenger)])
+        if len(random_positions) == 0:
+            return self._schedule(challengers, runhistory)
+
+        ranked = [challenger for position, challenger in enumerate(challengers) if position not in random_positions]
+        scheduled = iter(self._schedule(ranked, runhistory))
+        return [challenger if position in random_positions else next(scheduled)
+                for position, challenger in enumerate(challengers)]
+
+    #### Internal methods ####
+
+    def _is_random(self, challenger):
+        return getattr(challenger, "origin", None) == "Random Search"
+
+    def _schedule(self, challengers, runhistory):
+        if len(challengers) <= 1:
+            return challengers
+        X = np.array([challenger.get_array() for challenger in challengers])
+        # For every group of cached pipeline steps, the key of the prefix of every challenger and the cached prefixes
+        groups = self.discount_engine.get_prefix_keys(X, runhistory.get_cached_configurations())
+        prefixes = [[key for key, _ in group] for group in groups]
+        cached = [set([key for key, digest in group if digest != None]) for group in groups]
+
+        scheduled = []
+        for band in self._get_bands(X):
+            scheduled.extend(self._order_band(band, prefixes, cached))
+            for group_idx, group_prefixes in enumerate(prefixes):
+                cached[group_idx].update([group_prefixes[idx] for idx in band])
+        return [challengers[idx] for idx in scheduled]
+
+    def _get_bands(self, X):
+        values = None
+        if self.acquisition_func != None:
+            if self.imputation_values is None:
+                self.imputation_values = get_imputation_values(self.discount_engine.config_space)
+            X_imputed = np.array(X, dtype=np.float64)
+            nans = np.isnan(X_imputed)
+            X_imputed[nans] = self.imputation_values[np.where(nans)[1]]
+            values = self.acquisition_func(X_imputed).ravel()
+            max_difference = self.tolerance * (np.max(values) - np.min(values))
+
+        bands, band = [], []
+        for idx in range(X.shape[0]):
+            if band != [] and (len(band) == self.band_size or
+                               (values is not None and values[band[0]] - values[idx] > max_difference)):
+                bands.append(band)
+                band = []
+            band.append(idx)
+        bands.append(band)
+        return bands
+
+    def _order_band(self, band, prefixes, cached):
+        # Cached prefixes first (the longer the cached prefix the better), then grouped by prefix, from the
+        #   shortest to the longest prefix, every group at the position of its best ranked challenger
+        first_positions = [{} for _ in prefixes]
+        for position, idx in enumerate(band):
+            for group_idx, group_prefixes in enumerate(prefixes):
+                first_positions[group_idx].setdefault(group_prefixes[idx], position)
+
+        def get_key(position_idx):
+            position, idx = position_idx
+            num_cached = sum([prefixes[group_idx][idx] in cached[group_idx] for group_idx in range(len(prefixes))])
+            return tuple([-num_cached] +
+                         [first_positions[group_idx][prefixes[group_idx][idx]] for group_idx in range(len(prefixes))] +
+                         [position])
+
+        return [idx for position, idx in sorted(enumerate(band), key=get_key)]
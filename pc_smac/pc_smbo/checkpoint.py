@@ -0,0 +1,140 @@
+
+import os
+import json
+import time
+import shutil
+import logging
+
+import numpy as np
+
+from ConfigSpace.configuration_space import Configuration
+
+
+class Checkpointer(object):
+    """
+    Periodically saves the state of an optimization such that it can be resumed after the process died:
+    the runhistory (with the cached configurations, see PCRunHistory.save_json), the incumbent, the budget that was
+    used (SMAC stats and the Statistics timer), the state of the random number generator, the iteration, the cache
+    directory and the cache of the pipeline builder (cachedir) such that a resumed optimization keeps its cache. The
+    model is not saved, it is retrained from the runhistory at the next iteration.
+
+    A checkpoint is written to a temporary directory. The previous checkpoint is moved aside before the new one takes
+    its place and is only removed afterwards, such that a crash while saving always leaves a complete checkpoint.
+    """
+
+    def __init__(self, directory, config_space, statistics=None, checkpoint_every=600, cache_directory=None,
+                 cachedir=None):
+        self.directory = directory
+        self.config_space = config_space
+        self.statistics = statistics
+        self.checkpoint_every = checkpoint_every
+        self.cache_directory = cache_directory
+        self.cachedir = cachedir
+        self.last_checkpoint_time = time.time()
+        self.logger = logging.getLogger("Checkpointer")
+
+    def has_checkpoint(self):
+        return self._get_checkpoint_directory() != None
+
+    def load_state(self):
+        with open(self._get_state_file(self._get_checkpoint_directory())) as fp:
+            return json.load(fp)
+
+    def remove(self):
+        for directory in [self.directory, self._get_previous_directory(), self._get_temporary_directory()]:
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+
+    def maybe_save(self, smbo, iteration):
+        if time.time() - self.last_checkpoint_time >= self.checkpoint_every:
+            self.save(smbo, iteration)
+
+    def save(self, smbo, iteration):
+        start_time = time.time()
+        rng_state = smbo.rng.get_state()
+        state = {
+            'iteration': iteration,
+            'incumbent': smbo.incumbent.get_dictionary() if smbo.incumbent != None else None,
+            'wallclock_time_used': smbo.stats.get_used_wallclock_time(),
+            'ta_runs': smbo.stats.ta_runs,
+            'ta_time_used': smbo.stats.ta_time_used,
+            'inc_changed': smbo.stats.inc_changed,
+            'statistics_time_point': self.statistics.get_time_point() if self.statistics != None else None,
+            'rng_state': [rng_state[0], rng_state[1].tolist(), int(rng_state[2]), int(rng_state[3]),
+                          float(rng_state[4])],
+            'cache_directory': self.cache_directory,
+            'cachedir': self.cachedir
+        }
+
+        temporary_directory = self._get_temporary_directory()
+        if os.path.exists(temporary_directory):
+            shutil.rmtree(temporary_directory)
+        os.makedirs(temporary_directory)
+        smbo.runhistory.save_json(self._get_runhistory_file(temporary_directory))
+        with open(self._get_state_file(temporary_directory), "w") as fp:
+            json.dump(state, fp, indent=2, sort_keys=True)
+
+        previous_directory = self._get_previous_directory()
+        if os.path.exists(self.directory):
+            if os.path.exists(previous_directory):
+                shutil.rmtree(previous_directory)
+            os.rename(self.directory, previous_directory)
+        os.rename(temporary_directory, self.directory)
+        if os.path.exists(previous_directory):
+            shutil.rmtree(previous_directory)
+
+        self.last_checkpoint_time = time.time()
+        self.logger.debug("Checkpoint of iteration %d saved in %.2f sec" % (iteration, time.time() - start_time))
+
+    def restore(self, smbo):
+        """
+        Restores the state of the checkpoint into the smbo object, its runhistory, stats and rng. The timing of the
+        stats has to be started already.
+
+        Returns
+        -------
+        The iteration at which the checkpoint was saved
+
+        """
+        directory = self._get_checkpoint_directory()
+        state = self.load_state()
+        smbo.runhistory.load_json(self._get_runhistory_file(directory), self.config_space)
+        if state['incumbent'] != None:
+            smbo.incumbent = Configuration(self.config_space, values=state['incumbent'])
+
+        # Shift the start of the timers such that only the remaining wallclock budget is used
+        smbo.stats._start_time = time.time() - state['wallclock_time_used']
+        smbo.stats.ta_runs = state['ta_runs']
+        smbo.stats.ta_time_used = state['ta_time_used']
+        smbo.stats.inc_changed = state['inc_changed']
+        if self.statistics != None and state['statistics_time_point'] != None:
+            self.statistics.start_time = time.time() - state['statistics_time_point']
+
+        rng_state = state['rng_state']
+        smbo.rng.set_state((rng_state[0], np.array(rng_state[1], dtype=np.uint32), rng_state[2], rng_state[3],
+                            rng_state[4]))
+
+        self.last_checkpoint_time = time.time()
+        self.logger.info("Resumed from the checkpoint of iteration %d" % state['iteration'])
+        return state['iteration']
+
+    #### Internal methods ####
+
+    def _get_checkpoint_directory(self):
+        # The previous checkpoint is only left if saving a checkpoint crashed between moving it aside and replacing it
+        for directory in [self.directory, self._get_previous_directory()]:
+            if os.path.exists(self._get_state_file(directory)):
+                return directory
+        return None
+
+    def _get_previous_directory(self):
+        return self.directory + "_old"
+
+    def _get_temporary_directory(self):
+        return self.directory + "_tmp"
+
+    def _get_state_file(self, directory):
+        return os.path.join(directory, "state.json")
+
+    def _get_runhistory_file(self, directory):
+        return os.path.join(directory, "runhistory.json")
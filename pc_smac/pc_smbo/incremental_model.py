@@ -0,0 +1,130 @@
+
+import time
+import logging
+
+import numpy as np
+
+
+class IncrementalModel(object):
+    """
+    Wraps an empirical performance model (RandomForestWithInstances or
+    UncorrelatedMultiObjectiveRandomForestWithInstances) such that it is only fully retrained every
+    full_retrain_every trainings or when the data grew by more than retrain_growth_fraction since the last full
+    retraining. In between, a small forest with num_update_trees trees is trained only on the rows of the runs that
+    were added since the last full retraining and its predictions are mixed with the predictions of the fully trained
+    forest. The rows of new runs are not at the end of the data (the timeouts and the transfer rows of a warm start
+    follow the successful runs), so they are found by the keys of the rows of the runhistory converter (see
+    IncrementalRunHistory2EPM.get_row_keys). Rows after the ones of the converter, e.g. the fantasies of pending runs,
+    always count as new. Without row keys the model is fully retrained at every training.
+
+    The mixture weights every forest by the share of the data it is trained on, i.e. the update forest gets the
+    weight (number of new rows) / (number of rows). Each forest then counts as much as a forest that is trained on
+    all rows would weigh its part of the data, and the update forest never gets more than
+    retrain_growth_fraction / (1 + retrain_growth_fraction) of the weight: it only corrects the full forest close to
+    the new rows, its predictions elsewhere are extrapolations of a handful of points.
+
+    The time of every training is kept to be able to separate model fitting from the rest of the SMBO overhead.
+    """
+
+    def __init__(self, model, model_factory, num_trees=10, num_update_trees=2, full_retrain_every=5,
+                 retrain_growth_fraction=0.2, runhistory2epm=None):
+        """
+
+        Parameters
+        ----------
+        model:                      the model that is fully retrained
+        model_factory:              function num_trees -> new untrained model of the same type as model
+        num_trees:                  number of trees of the fully retrained model
+        num_update_trees:           number of trees that are trained at a cheap update
+        full_retrain_every:         maximum number of trainings between two full retrainings
+        retrain_growth_fraction:    the model is fully retrained if the data grew by more than this fraction
+        runhistory2epm:             converter of the training data, with get_row_keys
+
+        """
+        self.model = model
+        self.model_factory = model_factory
+        self.num_trees = num_trees
+        self.num_update_trees = num_update_trees
+        self.full_retrain_every = full_retrain_every
+        self.retrain_growth_fraction = retrain_growth_fraction
+        self.runhistory2epm = runhistory2epm
+        self.logger = logging.getLogger("IncrementalModel")
+
+        self.update_model = None
+        self.update_weight = 0.
+        self.num_data_at_full_training = 0
+        self.keys_at_full_training = set()
+        self.trainings_since_full_training = 0
+        self.training_times = []
+        self.last_training_time = 0
+        self.last_training_type = None
+
+    def train(self, X, Y, **kwargs):
+        start_time = time.time()
+        row_keys = self._get_row_keys(X.shape[0])
+        if row_keys is None or self._is_full_training_needed(X.shape[0]):
+            self.model.train(X, Y, **kwargs)
+            self.update_model = None
+            self.update_weight = 0.
+            self.num_data_at_full_training = X.shape[0]
+            self.keys_at_full_training = set([key for key in row_keys if key is not None]) if row_keys else set()
+            self.trainings_since_full_training = 0
+            self.last_training_type = 'full'
+        else:
+            new_rows = np.array([row for row, key in enumerate(row_keys)
+                                 if key is None or key not in self.keys_at_full_training], dtype=int)
+            X_new, Y_new = X[new_rows], Y[new_rows]
+            self.update_model = None
+            self.update_weight = 0.
+            if X_new.shape[0] > 0:
+                self.update_model = self.model_factory(self.num_update_trees)
+                self.update_model.train(X_new, Y_new, **kwargs)
+                self.update_weight = float(X_new.shape[0]) / X.shape[0]
+            self.trainings_since_full_training += 1
+            self.last_training_type = 'update'
+        self.last_training_time = time.time() - start_time
+        self.training_times.append((self.last_training_type, self.last_training_time))
+        self.logger.debug("Model training (%s) took %.2f sec" % (self.last_training_type, self.last_training_time))
+        return self
+
+    def predict(self, X):
+        mean, var = self.model.predict(X)
+        if self.update_model is None:
+            return mean, var
+        return self._mix(mean, var, *self.update_model.predict(X))
+
+    def predict_marginalized_over_instances(self, X):
+        mean, var = self.model.predict_marginalized_over_instances(X)
+        if self.update_model is None:
+            return mean, var
+        return self._mix(mean, var, *self.update_model.predict_marginalized_over_instances(X))
+
+    def get_last_training_time(self):
+        return self.last_training_time
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    #### Internal methods ####
+
+    def _get_row_keys(self, num_data):
+        # Keys of the rows of the converter, None for the rows after them
+        row_keys = None
+        if self.runhistory2epm != None and hasattr(self.runhistory2epm, 'get_row_keys'):
+            row_keys = self.runhistory2epm.get_row_keys()
+        if row_keys is None or len(row_keys) > num_data:
+            self.logger.debug("The rows of the training data are not known, the model is fully retrained")
+            return None
+        return row_keys + [None] * (num_data - len(row_keys))
+
+    def _is_full_training_needed(self, num_data):
+        return self.num_data_at_full_training == 0 \
+               or self.trainings_since_full_training + 1 >= self.full_retrain_every \
+               or num_data > (1 + self.retrain_growth_fraction) * self.num_data_at_full_training
+
+    def _mix(self, mean, var, update_mean, update_var):
+        # Mixture of the predictions of both forests, weighted by the share of the data they are trained on
+        w = self.update_weight
+        mixed_mean = (1 - w) * mean + w * update_mean
+        mixed_var = (1 - w) * (var + np.square(mean - mixed_mean)) + w * (update_var + np.square(update_mean - mixed_mean))
+        return mixed_mean, mixed_var
@@ -0,0 +1,162 @@
+
+import logging
+
+import numpy as np
+
+from ConfigSpace.configuration_space import Configuration
+from smac.initial_design.initial_design import InitialDesign
+from smac.runhistory.runhistory import RunKey
+from smac.utils.constants import MAXINT
+
+
+class PrefixSharingInitialDesign(InitialDesign):
+    """
+    Initial design for pipeline caching: a set of diverse preprocessing prefixes (the constant pipeline steps), each
+    of them combined with several classifiers (the variable pipeline steps). The prefixes are the farthest apart
+    ones out of a random sample. The design seeds the EPM and fills the cache with prefixes that get reused.
+
+    The design is evaluated in rounds: every round evaluates one classifier of every prefix, such that every round
+    uses another prefix per run (which can run concurrently without computing the same prefix twice). After the
+    first round, the prefixes are ordered by their runtime, cheapest first. The design stops when budget_fraction of
+    the wallclock limit is used. If a batch evaluator is given, every round is evaluated concurrently.
+    """
+
+    def __init__(self, tae_runner, scenario, stats, traj_logger, runhistory, rng, aggregate_func,
+                 constant_pipeline_steps, variable_pipeline_steps, num_prefixes=5, num_classifiers_per_prefix=3,
+                 budget_fraction=0.1, batch_evaluator=None, additional_configs=None):
+        super(PrefixSharingInitialDesign, self).__init__(tae_runner=tae_runner,
+                                                         scenario=scenario,
+                                                         stats=stats,
+                                                         traj_logger=traj_logger,
+                                                         rng=rng)
+        self.runhistory = runhistory
+        self.aggregate_func = aggregate_func
+        self.config_space = scenario.cs
+        self.num_prefixes = num_prefixes
+        self.num_classifiers_per_prefix = num_classifiers_per_prefix
+        self.budget_fraction = budget_fraction
+        self.batch_evaluator = batch_evaluator
+        self.additional_configs = additional_configs if additional_configs != None else []
+        self.logger = logging.getLogger("PrefixSharingInitialDesign")
+
+        hp_names = self.config_space.get_hyperparameter_names()
+        self.prefix_columns = np.array(sorted([self.config_space._hyperparameter_idx[hp_name] for hp_name in hp_names
+                                               if hp_name.split(":")[0] in constant_pipeline_steps]), dtype=int)
+        self.variable_columns = np.array(sorted([self.config_space._hyperparameter_idx[hp_name] for hp_name in hp_names
+                                                 if hp_name.split(":")[0] in variable_pipeline_steps]), dtype=int)
+
+    def run(self):
+        '''
+        Evaluates the design on one instance and returns the best configuration as incumbent
+        '''
+        if self.scenario.deterministic:
+            self.seed = 0
+        else:
+            self.seed = self.rng.randint(MAXINT)
+        self.instance = self.scenario.train_insts[self.rng.randint(len(self.scenario.train_insts))]
+
+        designs = self.get_design()
+        evaluated = self._evaluate(self.additional_configs)
+        evaluated += self._evaluate([configs[0] for configs in designs if configs != []])
+
+        # Continue with the cheapest prefixes first, such that the budget covers as many runs as possible
+        runtimes = [self._get_runtime(configs[0]) if configs != [] else np.inf for configs in designs]
+        designs = [designs[idx] for idx in np.argsort(runtimes, kind="mergesort")]
+        for i in range(1, self.num_classifiers_per_prefix):
+            if self._is_budget_used() or self.stats.is_budget_exhausted():
+                break
+            evaluated += self._evaluate([configs[i] for configs in designs if len(configs) > i])
+
+        if evaluated == []:
+            evaluated = self._evaluate(self._sample(1))
+
+        incumbent = min(evaluated, key=lambda config: self.aggregate_func(
+            config, self.runhistory, self.runhistory.get_runs_for_config(config)))
+        inc_perf = self.aggregate_func(incumbent, self.runhistory, self.runhistory.get_runs_for_config(incumbent))
+        self.stats.inc_changed += 1
+        self.traj_logger.add_entry(train_perf=inc_perf, incumbent_id=self.stats.inc_changed, incumbent=incumbent)
+        self.logger.info("Initial design evaluated %d configurations, incumbent cost: %.4f" % (len(evaluated),
+                                                                                                inc_perf))
+        return incumbent
+
+    def get_design(self):
+        '''
+        Returns
+        ----------
+        list with for every prefix the list of its configurations
+        '''
+        prefixes = self._get_diverse_prefixes()
+        designs = []
+        for prefix in prefixes:
+            configs = []
+            for classifier in self._sample(self.num_classifiers_per_prefix * 2):
+                if len(configs) == self.num_classifiers_per_prefix:
+                    break
+                vector = prefix.copy()
+                vector[self.variable_columns] = classifier.get_array()[self.variable_columns]
+                try:
+                    config = Configuration(self.config_space, vector=vector)
+                    config.is_valid_configuration()
+                except ValueError:
+                    continue
+                if config not in configs:
+                    config.origin = "Prefix Sharing Initial Design"
+                    configs.append(config)
+            designs.append(configs)
+        return designs
+
+    #### Internal methods ####
+
+    def _get_diverse_prefixes(self):
+        # Farthest point selection on the prefix hyperparameters out of a random sample
+        X = np.array([config.get_array() for config in self._sample(self.num_prefixes * 10)])
+        X_prefix = X[:, self.prefix_columns]
+        selected = [0]
+        min_distances = self._get_distances(X_prefix[0], X_prefix)
+        while len(selected) < min(self.num_prefixes, X.shape[0]):
+            idx = int(np.argmax(min_distances))
+            if min_distances[idx] == 0:
+                break
+            selected.append(idx)
+            min_distances = np.minimum(min_distances, self._get_distances(X_prefix[idx], X_prefix))
+        return [X[idx] for idx in selected]
+
+    def _get_distances(self, x, X):
+        differences = np.abs(X - x)
+        differences[np.isnan(X) != np.isnan(x)] = 1.
+        differences[np.isnan(differences)] = 0.
+        return np.mean(differences, axis=1) if differences.shape[1] > 0 else np.zeros(X.shape[0])
+
+    def _sample(self, size):
+        configs = self.config_space.sample_configuration(size=size)
+        return configs if isinstance(configs, list) else [configs]
+
+    def _evaluate(self, configs):
+        configs = [config for config in configs if len(self.runhistory.get_runs_for_config(config)) == 0]
+        if configs == []:
+            return []
+        if self.batch_evaluator != None:
+            self.batch_evaluator.evaluate_runs([(config, (self.instance, self.seed)) for config in configs])
+            return [config for config in configs if len(self.runhistory.get_runs_for_config(config)) > 0]
+
+        evaluated = []
+        for config in configs:
+            if evaluated != [] and (self._is_budget_used() or self.stats.is_budget_exhausted()):
+                break
+            self.tae_runner.start(config=config,
+                                  instance=self.instance,
+                                  cutoff=self.scenario.cutoff,
+                                  seed=self.seed,
+                                  instance_specific=self.scenario.instance_specific.get(self.instance, "0"))
+            evaluated.append(config)
+        return evaluated
+
+    def _get_runtime(self, config):
+        runs = self.runhistory.get_runs_for_config(config)
+        if runs == []:
+            return np.inf
+        return np.mean([self.runhistory.data[RunKey(self.runhistory.config_ids[config],
+                                                    inst_seed.instance, inst_seed.seed)].time for inst_seed in runs])
+
+    def _is_budget_used(self):
+        return self.stats.get_used_wallclock_time() > self.budget_fraction * self.scenario.wallclock_limit
@@ -0,0 +1,222 @@
+
+import time
+import itertools
+import logging
+
+import numpy as np
+
+from ConfigSpace.configuration_space import Configuration
+from ConfigSpace.util import get_one_exchange_neighbourhood
+from smac.utils.constants import MAXINT
+
+
+def get_imputation_values(config_space):
+    """
+    Returns the vector values of the defaults of the hyperparameters, which replace the inactive hyperparameters
+    """
+    imputation_values = np.zeros(len(config_space.get_hyperparameters()))
+    for hyperparameter in config_space.get_hyperparameters():
+        default = hyperparameter.default_value if hasattr(hyperparameter, 'default_value') else hyperparameter.default
+        imputation_values[config_space._hyperparameter_idx[hyperparameter.name]] = \
+            hyperparameter._inverse_transform(default)
+    return imputation_values
+
+
+class VectorizedMarginalization(object):
+    """
+    Marginalizes an acquisition function over the hyperparameters of the variable pipeline steps (the classifier).
+
+    The samples of the variable pipeline steps are drawn once (see sample) and reused for all candidates until the
+    next call of sample. The candidates (N, D) are completed with every sample in one (N * S, D) matrix, which is
+    imputed and passed to the acquisition function at once, such that the model makes a single batched prediction.
+    The time of every marginalization is added to the overhead recorder, if one is given (see OverheadRecorder).
+    """
+
+    def __init__(self, acquisition_func, config_space, variable_pipeline_steps, num_samples=40,
+                 overhead_recorder=None):
+        self.acquisition_func = acquisition_func
+        self.config_space = config_space
+        self.num_samples = num_samples
+        self.overhead_recorder = overhead_recorder
+
+        self.variable_columns = np.array(sorted([config_space._hyperparameter_idx[hp_name]
+                                                 for hp_name in config_space.get_hyperparameter_names()
+                                                 if hp_name.split(":")[0] in variable_pipeline_steps]), dtype=int)
+        self.imputation_values = get_imputation_values(config_space)
+        self.samples = None
+
+    def sample(self):
+        configs = self.config_space.sample_configuration(size=self.num_samples)
+        configs = configs if isinstance(configs, list) else [configs]
+        self.samples = np.array([config.get_array() for config in configs])[:, self.variable_columns]
+
+    def get_completions(self, X):
+        """
+        Returns
+        -------
+        np.ndarray (N * S, D) in which row i * S + j is candidate i completed with sample j
+
+        """
+        X = np.atleast_2d(X)
+        X_completed = np.repeat(X, self.samples.shape[0], axis=0)
+        X_completed[:, self.variable_columns] = np.tile(self.samples, (X.shape[0], 1))
+        return X_completed
+
+    def impute(self, X):
+        # Inactive hyperparameters get their default value, as in the model data of the runhistory2epm objects
+        X = np.array(X, dtype=np.float64)
+        nans = np.isnan(X)
+        X[nans] = self.imputation_values[np.where(nans)[1]]
+        return X
+
+    def __call__(self, X):
+        return self.marginalize(X)
+
+    def marginalize(self, X):
+        """
+
+        Returns
+        -------
+        np.ndarray (N,) with the marginalized acquisition values of the candidates and np.ndarray (N,) with for
+            every candidate the index of the sample that completes it best
+
+        """
+        start_time = time.time()
+        X = np.atleast_2d(X)
+        if self.samples is None:
+            self.sample()
+        values = self.acquisition_func(self.impute(self.get_completions(X))).reshape((X.shape[0], -1))
+        if self.overhead_recorder != None:
+            self.overhead_recorder.add_time('marginalization', time.time() - start_time)
+            self.overhead_recorder.add_count('num_marginalized_candidates', X.shape[0])
+        return np.mean(values, axis=1), np.argmax(values, axis=1)
+
+
+class SelectConfigurationsWithVectorizedMarginalization(object):
+    """
+    Selects the next challengers with an acquisition function that is marginalized over the variable pipeline steps
+    (see VectorizedMarginalization). Random pipeline prefixes are scored in one batch, after which the best ones are
+    improved with a local search over their one-exchange neighbourhood, again scoring every neighbourhood in one
+    batch. Every selected prefix is completed with the sample of the variable pipeline steps that scores best for it.
+
+    The challengers are interleaved with random configurations, as in SMAC. If there is no incumbent yet (e.g. the
+    initial design crashed), the best observed cost is the reference of the acquisition function and the local
+    search only starts from the random prefixes.
+
+    The scoring of the random prefixes, the local searches and the marginalizations are added to the overhead
+    recorder, if one is given.
+    """
+
+    def __init__(self, scenario, runhistory, model, acquisition_func, rng, variable_pipeline_steps,
+                 num_configs_for_marginalization=40, max_local_search_steps=10, overhead_recorder=None):
+        self.config_space = scenario.cs
+        self.runhistory = runhistory
+        self.model = model
+        self.acquisition_func = acquisition_func
+        self.rng = rng
+        self.max_local_search_steps = max_local_search_steps
+        self.overhead_recorder = overhead_recorder
+        self.logger = logging.getLogger("SelectConfigurationsWithVectorizedMarginalization")
+
+        self.marginalization = VectorizedMarginalization(acquisition_func=acquisition_func,
+                                                         config_space=self.config_space,
+                                                         variable_pipeline_steps=variable_pipeline_steps,
+                                                         num_samples=num_configs_for_marginalization,
+                                                         overhead_recorder=overhead_recorder)
+        self.prefix_columns = np.setdiff1d(np.arange(len(self.config_space.get_hyperparameters())),
+                                           self.marginalization.variable_columns)
+
+    def run(self, X, Y, incumbent, num_configurations_by_random_search_sorted=100,
+            num_configurations_by_local_search=10, double_intensification=False, **kwargs):
+        self.model.train(X, Y)
+        self.acquisition_func.update(model=self.model, eta=self._get_best_cost(incumbent))
+
+        # The samples are shared by all candidates of this iteration
+        self.marginalization.sample()
+
+        start_time = time.time()
+        X_random = np.array([config.get_array() for config in self._sample(num_configurations_by_random_search_sorted)])
+        values_random, best_samples_random = self.marginalization(X_random)
+        self._record('acquisition_random_search', start_time, 'num_random_search_candidates', X_random.shape[0])
+
+        start_time = time.time()
+        starts = [(X_random[idx], values_random[idx], best_samples_random[idx]) for idx in
+                  np.argsort(-values_random)[:num_configurations_by_local_search]]
+        if incumbent is not None:
+            incumbent_vector = incumbent.get_array()
+            value_incumbent, best_sample_incumbent = self.marginalization(incumbent_vector)
+            starts.append((incumbent_vector, value_incumbent[0], best_sample_incumbent[0]))
+        X_local, values_local, best_samples_local = zip(*[self._local_search(*start) for start in starts])
+        self._record('acquisition_local_search', start_time, 'num_local_searches', len(starts))
+
+        challengers = self._get_challengers(np.vstack((np.array(X_local), X_random)),
+                                            np.concatenate((np.array(values_local), values_random)),
+                                            np.concatenate((np.array(best_samples_local), best_samples_random)))
+
+        random_configs = self._sample(len(challengers))
+        for config in random_configs:
+            config.origin = "Random Search"
+        if double_intensification:
+            return challengers, random_configs
+        return list(itertools.chain(*zip(challengers, random_configs)))
+
+    #### Internal methods ####
+
+    def _record(self, name, start_time, count_name, count):
+        if self.overhead_recorder != None:
+            self.overhead_recorder.add_time(name, time.time() - start_time)
+            self.overhead_recorder.add_count(count_name, count)
+
+    def _get_best_cost(self, incumbent):
+        if incumbent is not None:
+            return self.runhistory.get_cost(incumbent)
+        configs = self.runhistory.get_all_configs()
+        if configs == []:
+            raise ValueError("Runhistory is empty and the cost value of the incumbent is unknown.")
+        return min(self.runhistory.get_cost(config) for config in configs)
+
+    def _sample(self, size):
+        if size <= 0:
+            return []
+        configs = self.config_space.sample_configuration(size=size)
+        return configs if isinstance(configs, list) else [configs]
+
+    def _local_search(self, vector, value, best_sample):
+        for _ in range(self.max_local_search_steps):
+            neighbours = self._get_neighbours(vector)
+            if neighbours.shape[0] == 0:
+                break
+            values, best_samples = self.marginalization(neighbours)
+            best = np.argmax(values)
+            if values[best] <= value:
+                break
+            vector, value, best_sample = neighbours[best], values[best], best_samples[best]
+        return vector, value, best_sample
+
+    def _get_neighbours(self, vector):
+        # Only neighbours that change the prefix have a different marginalized acquisition value
+        try:
+            config = Configuration(self.config_space, vector=vector)
+            neighbours = [neighbour.get_array() for neighbour in
+                          get_one_exchange_neighbourhood(config, seed=self.rng.randint(MAXINT))]
+        except ValueError:
+            return np.zeros((0, vector.shape[0]))
+        prefix = vector[self.prefix_columns]
+        neighbours = [neighbour for neighbour in neighbours
+                      if not np.all((neighbour[self.prefix_columns] == prefix) |
+                                    (np.isnan(neighbour[self.prefix_columns]) & np.isnan(prefix)))]
+        return np.array(neighbours) if neighbours != [] else np.zeros((0, vector.shape[0]))
+
+    def _get_challengers(self, X_candidates, values, best_samples):
+        challengers = []
+        for idx in np.argsort(-values, kind="mergesort"):
+            vector = X_candidates[idx].copy()
+            vector[self.marginalization.variable_columns] = self.marginalization.samples[best_samples[idx]]
+            try:
+                challenger = Configuration(self.config_space, vector=vector)
+                challenger.is_valid_configuration()
+            except ValueError:
+                continue
+            if challenger not in challengers:
+                challengers.append(challenger)
+        return challengers
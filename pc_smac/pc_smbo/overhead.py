@@ -0,0 +1,117 @@
+
+import time
+
+
+class OverheadRecorder(object):
+    """
+    Records where the time of every iteration of the SMBO loop goes and writes one record per iteration to the
+    overhead file of the Statistics (see Statistics.add_overhead), next to the run records. A record contains the
+    seconds spent in every part of the optimizer, the candidate counts, and the number and the runtime of the target
+    algorithm runs of the iteration, such that it shows when the overhead of the optimizer dominates.
+
+    The parts are measured by instrumenting the methods of the objects of the SMBO loop (see instrument), so the
+    loop itself only has to call finish_iteration. Our own components take the recorder explicitly and record their
+    parts themselves (see add_time and add_count), such as the acquisition optimization of the vectorized
+    marginalization, every part is measured in one place only. The time of a method that is called inside another instrumented
+    method is also part of the time of the outer one: select_configurations includes model_training, the acquisition
+    optimization and marginalization, intensification includes the target algorithm runs of the intensifier.
+
+    statistics_logging is the time of the run records of the iteration plus the time of writing the previous overhead
+    record. The run records are written by the processes that execute the runs, which report the time in the
+    additional info of the run (see instrument_runhistory).
+    """
+
+    TIMINGS = ['transform', 'select_configurations', 'model_training', 'acquisition_random_search',
+               'acquisition_local_search', 'marginalization', 'intensification', 'psmac_io', 'checkpointing',
+               'statistics_logging']
+
+    def __init__(self, statistics):
+        self.statistics = statistics
+        self.timings = {}
+        self.counts = {}
+        self.iteration_start_time = time.time()
+        self.previous_ta_runs = 0
+        self.previous_ta_time_used = 0
+        self._reset()
+
+    def instrument(self, obj, method_name, name, count_name=None, count_func=None):
+        """
+        Replaces the method of the object by a wrapper that adds its time to the timing name. If count_name is given,
+        count_func(result) (or 1 per call if count_func is None) is added to the count count_name.
+
+        Returns
+        -------
+        False if the object does not have the method
+
+        """
+        if obj == None or not hasattr(obj, method_name):
+            return False
+        method = getattr(obj, method_name)
+
+        def timed_method(*args, **kwargs):
+            start_time = time.time()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self.add_time(name, time.time() - start_time)
+            if count_name != None:
+                self.add_count(count_name, count_func(result) if count_func != None else 1)
+            return result
+
+        setattr(obj, method_name, timed_method)
+        return True
+
+    def instrument_runhistory(self, runhistory):
+        """
+        Adds the time of logging the run in the process of the run (statistics_logging_time in the additional info)
+        to statistics_logging for every run that is added to the runhistory. The runs that are loaded from a file
+        (e.g. of another optimization, see PCRunHistory.update_from_json) are not counted.
+        """
+        add = runhistory.add
+
+        def add_run(*args, **kwargs):
+            additional_info = kwargs.get('additional_info', args[6] if len(args) > 6 else None)
+            if additional_info and not getattr(runhistory, '_loading', False):
+                self.add_time('statistics_logging', additional_info.get('statistics_logging_time', 0.))
+            return add(*args, **kwargs)
+
+        runhistory.add = add_run
+
+    def add_time(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.) + seconds
+
+    def add_count(self, name, count):
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def finish_iteration(self, iteration, stats):
+        """
+        Writes the record of the iteration and starts the next one
+
+        Parameters
+        ----------
+        iteration: int
+            the iteration that finished
+        stats: Stats
+            the SMAC stats, for the number and the runtime of the target algorithm runs
+        """
+        record = {'iteration': iteration,
+                  'iteration_time': time.time() - self.iteration_start_time,
+                  'num_target_runs': stats.ta_runs - self.previous_ta_runs,
+                  'target_runs_time': stats.ta_time_used - self.previous_ta_time_used}
+        for name in self.TIMINGS:
+            record['time_' + name] = self.timings.get(name, 0.)
+        record.update(self.counts)
+        self.previous_ta_runs = stats.ta_runs
+        self.previous_ta_time_used = stats.ta_time_used
+
+        start_time = time.time()
+        self.statistics.add_overhead(record)
+        self._reset()
+        self.add_time('statistics_logging', time.time() - start_time)
+
+    #### Internal methods ####
+
+    def _reset(self):
+        self.timings = {}
+        self.counts = {}
+        self.iteration_start_time = time.time()
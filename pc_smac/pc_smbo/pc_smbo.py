@@ -16,13 +16,20 @@ from smac.optimizer.local_search import LocalSearch
 from smac.intensification.intensification import Intensifier
 from smac.optimizer import pSMAC
 from smac.scenario.scenario import Scenario
-from smac.runhistory.runhistory import RunHistory
+from smac.runhistory.runhistory import RunHistory, InstSeedKey
 from smac.runhistory.runhistory2epm import AbstractRunHistory2EPM
 from smac.stats.stats import Stats
 from smac.initial_design.initial_design import InitialDesign
-from smac.tae.execute_ta_run import FirstRunCrashedException
+from smac.tae.execute_ta_run import FirstRunCrashedException, StatusType
+from smac.utils.constants import MAXINT
 from smac.optimizer.select_configurations import SelectConfigurations
 
+from pc_smac.pc_smac.pc_smbo.batch_evaluation import BatchSelector, BatchEvaluator
+from pc_smac.pc_smac.pc_smbo.checkpoint import Checkpointer
+from pc_smac.pc_smac.pc_smbo.challenger_scheduling import ChallengerScheduler
+from pc_smac.pc_smac.pc_smbo.overhead import OverheadRecorder
+from pc_smac.pc_smac.pc_runhistory.shared_runhistory import SharedRunHistory
+
 
 class PCSMBO(BaseSolver):
 
@@ -38,7 +45,14 @@ class PCSMBO(BaseSolver):
                  model: RandomForestWithInstances,
                  rng: np.random.RandomState,
                  select_configuration: SelectConfigurations,
-                 double_intensification: bool):
+                 double_intensification: bool,
+                 batch_size: int=1,
+                 batch_selector: BatchSelector=None,
+                 batch_evaluator: BatchEvaluator=None,
+                 checkpointer: Checkpointer=None,
+                 shared_runhistory: SharedRunHistory=None,
+                 challenger_scheduler: ChallengerScheduler=None,
+                 overhead_recorder: OverheadRecorder=None):
         '''
         Interface that contains the main Bayesian optimization loop
 
@@ -64,6 +78,20 @@ class PCSMBO(BaseSolver):
             empirical performance model (right now, we support only RandomForestWithInstances)
         rng: np.random.RandomState
             Random number generator
+        batch_size: int
+            number of challengers that are evaluated concurrently at every iteration
+        batch_selector: BatchSelector
+            selects a diverse batch of challengers (only used if batch_size > 1)
+        batch_evaluator: BatchEvaluator
+            evaluates the batch of challengers in a worker pool (only used if batch_size > 1)
+        checkpointer: Checkpointer
+            periodically saves the state of the optimization and restores it if a checkpoint exists
+        shared_runhistory: SharedRunHistory
+            incremental exchange of the runs with the parallel optimizers (shared_model), replaces pSMAC
+        challenger_scheduler: ChallengerScheduler
+            reorders the challengers within bands of near-tied challengers to group the ones that share a cached prefix
+        overhead_recorder: OverheadRecorder
+            writes a record with the overhead of the optimizer at every iteration
         '''
         self.logger = logging.getLogger("SMBO")
         self.incumbent = None
@@ -82,6 +110,13 @@ class PCSMBO(BaseSolver):
 
         self.select_configuration = select_configuration
         self.double_intensification = double_intensification
+        self.batch_size = batch_size
+        self.batch_selector = batch_selector
+        self.batch_evaluator = batch_evaluator
+        self.checkpointer = checkpointer
+        self.shared_runhistory = shared_runhistory
+        self.challenger_scheduler = challenger_scheduler
+        self.overhead_recorder = overhead_recorder
 
     def run(self):
         '''
@@ -92,17 +127,16 @@ class PCSMBO(BaseSolver):
         incumbent: np.array(1, H)
             The best found configuration
         '''
-        self.stats.start_timing()
-        try:
-            self.incumbent = self.initial_design.run()
-        except FirstRunCrashedException as err:
-            if self.scenario.abort_on_first_run_crash:
-                raise
+        iteration = self._initialize()
+        if self.overhead_recorder != None:
+            # The record of the initial design (or of restoring the checkpoint)
+            self.overhead_recorder.finish_iteration(iteration - 1, self.stats)
 
         # Main BO loop
-        iteration = 1
         while True:
-            if self.scenario.shared_model:
+            if self.shared_runhistory != None:
+                self.shared_runhistory.read(self.runhistory)
+            elif self.scenario.shared_model:
                 pSMAC.read(run_history=self.runhistory,
                            output_directory=self.scenario.output_dir,
                            configuration_space=self.config_space,
@@ -114,7 +148,22 @@ class PCSMBO(BaseSolver):
             #print("Shapes: {}, {}".format(X.shape, Y.shape))
 
             self.logger.debug("Search for next configuration")
-            if self.double_intensification:
+            if self.batch_size > 1 and self.batch_evaluator != None and self.incumbent != None:
+                challengers = \
+                    self.select_configuration.run(X, Y,
+                                                  incumbent=self.incumbent,
+                                                  num_configurations_by_random_search_sorted=100,
+                                                  num_configurations_by_local_search=10,
+                                                  double_intensification=False)
+
+                time_spend = time.time() - start_time
+                logging.debug(
+                    "Time spend to choose next configurations: %.2f sec" % (time_spend))
+                self._log_model_training_time()
+
+                self.logger.debug("Evaluate batch")
+                self.incumbent, inc_perf = self._evaluate_batch(challengers)
+            elif self.double_intensification:
                 # get all found configurations sorted according to acq
                 challengers_smac, challengers_random = \
                     self.select_configuration.run(X, Y,
@@ -122,10 +171,13 @@ class PCSMBO(BaseSolver):
                                                   num_configurations_by_random_search_sorted=100,
                                                   num_configurations_by_local_search=10,
                                                   double_intensification=self.double_intensification)
+                if self.challenger_scheduler != None:
+                    challengers_smac = self.challenger_scheduler.schedule(challengers_smac, self.runhistory)
 
                 time_spend = time.time() - start_time
                 logging.debug(
                     "Time spend to choose next configurations: %.2f sec" % (time_spend))
+                self._log_model_training_time()
 
                 self.logger.debug("Intensify")
 
@@ -157,10 +209,13 @@ class PCSMBO(BaseSolver):
                                                   num_configurations_by_local_search=10,
                                                   double_intensification=self.double_intensification)
                 #print("Challengers: {}".format(challengers))
+                if self.challenger_scheduler != None:
+                    challengers = self.challenger_scheduler.schedule(challengers, self.runhistory)
 
                 time_spend = time.time() - start_time
                 logging.debug(
                     "Time spend to choose next configurations: %.2f sec" % (time_spend))
+                self._log_model_training_time()
 
                 self.logger.debug("Intensify")
 
@@ -174,13 +229,21 @@ class PCSMBO(BaseSolver):
 
             print("Incumbent: {}, Performance: {}".format(self.incumbent, inc_perf))
 
-            if self.scenario.shared_model:
+            if self.shared_runhistory != None:
+                self.shared_runhistory.write(self.runhistory)
+            elif self.scenario.shared_model:
                 pSMAC.write(run_history=self.runhistory,
                             output_directory=self.scenario.output_dir,
                             num_run=self.num_run)
 
             iteration += 1
 
+            if self.checkpointer != None:
+                self.checkpointer.maybe_save(self, iteration)
+
+            if self.overhead_recorder != None:
+                self.overhead_recorder.finish_iteration(iteration - 1, self.stats)
+
             logging.debug("Remaining budget: %f (wallclock), %f (ta costs), %f (target runs)" % (
                 self.stats.get_remaing_time_budget(),
                 self.stats.get_remaining_ta_budget(),
@@ -193,6 +256,51 @@ class PCSMBO(BaseSolver):
 
         return self.incumbent
 
+    #### Internal methods ####
+
+    def _initialize(self):
+        '''
+        Runs the initial design or restores the state of the checkpoint
+
+        Returns
+        ----------
+        iteration: int
+            The iteration at which the main loop starts
+        '''
+        self.stats.start_timing()
+        if self.checkpointer != None and self.checkpointer.has_checkpoint():
+            return self.checkpointer.restore(self)
+        try:
+            self.incumbent = self.initial_design.run()
+        except FirstRunCrashedException as err:
+            if self.scenario.abort_on_first_run_crash:
+                raise
+        return 1
+
+    def _evaluate_batch(self, challengers):
+        batch = self.batch_selector.select(challengers, self.batch_size, self.runhistory, exclude=[self.incumbent])
+        survivors = self.batch_evaluator.evaluate(batch, self.incumbent, self.aggregate_func)
+
+        # All runs of the survivors are in the runhistory, so the intensifier only compares them with the incumbent
+        #   and updates the incumbent and the trajectory. If no configuration survived, the best one of the batch
+        #   is intensified such that the incumbent still gets runs on new instances.
+        if survivors == [] and batch != []:
+            survivors = [min(batch, key=lambda config: self.aggregate_func(
+                config, self.runhistory, self.runhistory.get_runs_for_config(config)))]
+        return self.intensifier.intensify(
+            challengers=survivors,
+            incumbent=self.incumbent,
+            run_history=self.runhistory,
+            aggregate_func=self.aggregate_func,
+            time_bound=0.01,
+            min_number_of_runs=1)
+
+    def _log_model_training_time(self):
+        # The incremental model keeps the time of its last training, which is part of the selection time
+        if hasattr(self.model, 'get_last_training_time'):
+            logging.debug("Time spend to train the model (%s): %.2f sec" % (self.model.last_training_type,
+                                                                          self.model.get_last_training_time()))
+
 
 class PCSMBOSigmoidRandomSearch(BaseSolver):
 
@@ -207,7 +315,10 @@ class PCSMBOSigmoidRandomSearch(BaseSolver):
                  num_run: int,
                  model: RandomForestWithInstances,
                  rng: np.random.RandomState,
-                 select_configuration: SelectConfigurations):
+                 select_configuration: SelectConfigurations,
+                 checkpointer: Checkpointer=None,
+                 shared_runhistory: SharedRunHistory=None,
+                 overhead_recorder: OverheadRecorder=None):
         '''
         Interface that contains the main Bayesian optimization loop
 
@@ -233,6 +344,12 @@ class PCSMBOSigmoidRandomSearch(BaseSolver):
             empirical performance model (right now, we support only RandomForestWithInstances)
         rng: np.random.RandomState
             Random number generator
+        checkpointer: Checkpointer
+            periodically saves the state of the optimization and restores it if a checkpoint exists
+        shared_runhistory: SharedRunHistory
+            incremental exchange of the runs with the parallel optimizers (shared_model), replaces pSMAC
+        overhead_recorder: OverheadRecorder
+            writes a record with the overhead of the optimizer at every iteration
         '''
         self.logger = logging.getLogger("SMBO")
         self.incumbent = None
@@ -250,6 +367,9 @@ class PCSMBOSigmoidRandomSearch(BaseSolver):
         self.rng = rng
 
         self.select_configuration = select_configuration
+        self.checkpointer = checkpointer
+        self.shared_runhistory = shared_runhistory
+        self.overhead_recorder = overhead_recorder
 
     def run(self):
         '''
@@ -261,17 +381,25 @@ class PCSMBOSigmoidRandomSearch(BaseSolver):
             The best found configuration
         '''
         self.stats.start_timing()
-        try:
-            self.incumbent = self.initial_design.run()
-        except FirstRunCrashedException as err:
-            if self.scenario.abort_on_first_run_crash:
-                raise
+        if self.checkpointer != None and self.checkpointer.has_checkpoint():
+            iteration = self.checkpointer.restore(self)
+        else:
+            iteration = 1
+            try:
+                self.incumbent = self.initial_design.run()
+            except FirstRunCrashedException as err:
+                if self.scenario.abort_on_first_run_crash:
+                    raise
+        if self.overhead_recorder != None:
+            # The record of the initial design (or of restoring the checkpoint)
+            self.overhead_recorder.finish_iteration(iteration - 1, self.stats)
 
         # Main BO loop
-        iteration = 1
         intensification_runtime = 0
         while True:
-            if self.scenario.shared_model:
+            if self.shared_runhistory != None:
+                self.shared_runhistory.read(self.runhistory)
+            elif self.scenario.shared_model:
                 pSMAC.read(run_history=self.runhistory,
                            output_directory=self.scenario.output_dir,
                            configuration_space=self.config_space,
@@ -311,13 +439,21 @@ class PCSMBOSigmoidRandomSearch(BaseSolver):
 
             #print("Incumbent: {}, Performance: {}".format(self.incumbent, inc_perf))
 
-            if self.scenario.shared_model:
+            if self.shared_runhistory != None:
+                self.shared_runhistory.write(self.runhistory)
+            elif self.scenario.shared_model:
                 pSMAC.write(run_history=self.runhistory,
                             output_directory=self.scenario.output_dir,
                             num_run=self.num_run)
 
             iteration += 1
 
+            if self.checkpointer != None:
+                self.checkpointer.maybe_save(self, iteration)
+
+            if self.overhead_recorder != None:
+                self.overhead_recorder.finish_iteration(iteration - 1, self.stats)
+
             logging.debug("Remaining budget: %f (wallclock), %f (ta costs), %f (target runs)" % (
                 self.stats.get_remaing_time_budget(),
                 self.stats.get_remaining_ta_budget(),
@@ -328,4 +464,281 @@ class PCSMBOSigmoidRandomSearch(BaseSolver):
 
             self.stats.print_stats(debug_out=True)
 
-        return self.incumbent
\ No newline at end of file
+        return self.incumbent
+
+class PCSMBOAsync(PCSMBO):
+
+    def __init__(self,
+                 scenario: Scenario,
+                 stats: Stats,
+                 initial_design: InitialDesign,
+                 runhistory: RunHistory,
+                 runhistory2epm: AbstractRunHistory2EPM,
+                 intensifier: Intensifier,
+                 aggregate_func: callable,
+                 num_run: int,
+                 model: RandomForestWithInstances,
+                 rng: np.random.RandomState,
+                 select_configuration: SelectConfigurations,
+                 batch_evaluator: BatchEvaluator,
+                 refresh_every: int=None,
+                 max_idle_refreshes: int=10,
+                 checkpointer: Checkpointer=None,
+                 shared_runhistory: SharedRunHistory=None,
+                 overhead_recorder: OverheadRecorder=None):
+        '''
+        Asynchronous Bayesian optimization loop: every worker of the worker pool of the batch evaluator gets the
+        next run as soon as it is idle. The results are added to the runhistory as they come in and the model and
+        the challengers are refreshed every refresh_every results (or when there are no challengers left). The runs
+        that are still pending are added to the model data with a fantasized outcome (the mean of the observed
+        outcomes, constant liar) such that the new challengers move away from them.
+
+        Challengers are raced against the incumbent one instance-seed pair at a time, as the intensifier does, and
+        the incumbent gets a run on a new instance at every refresh. If there is no incumbent yet (e.g. the initial
+        design crashed), the challengers are random configurations that all run on the same instance-seed pair and
+        the first result becomes the incumbent. The loop stops when the budget is exhausted or when no run could be
+        started after max_idle_refreshes consecutive refreshes of the challengers (e.g. the configuration space is
+        evaluated completely).
+
+        Parameters
+        ----------
+        See PCSMBO
+        batch_evaluator: BatchEvaluator
+            provides the worker pool and adds the results to the runhistory and the stats
+        refresh_every: int
+            number of results after which the model and the challengers are refreshed, default the number of workers
+        max_idle_refreshes: int
+            number of consecutive refreshes of the challengers without a new run after which the loop stops
+        '''
+        super(PCSMBOAsync, self).__init__(scenario=scenario,
+                                          stats=stats,
+                                          initial_design=initial_design,
+                                          runhistory=runhistory,
+                                          runhistory2epm=runhistory2epm,
+                                          intensifier=intensifier,
+                                          aggregate_func=aggregate_func,
+                                          num_run=num_run,
+                                          model=model,
+                                          rng=rng,
+                                          select_configuration=select_configuration,
+                                          double_intensification=False,
+                                          batch_evaluator=batch_evaluator,
+                                          checkpointer=checkpointer,
+                                          shared_runhistory=shared_runhistory,
+                                          overhead_recorder=overhead_recorder)
+        self.worker_pool = batch_evaluator.worker_pool
+        self.refresh_every = refresh_every if refresh_every != None else self.worker_pool.num_workers
+        self.max_idle_refreshes = max_idle_refreshes
+
+        # Dictionary task id -> (configuration, instance-seed pair) of the runs that are being evaluated
+        self.pending = {}
+        # Runs that continue the race of a challenger, they get precedence over new challengers
+        self.next_runs = []
+        self.incumbent_run_due = False
+        # Instance-seed pair of the challengers as long as there is no incumbent
+        self.first_inst_seed = None
+
+    def run(self):
+        '''
+        Runs the asynchronous Bayesian optimization loop
+
+        Returns
+        ----------
+        incumbent: np.array(1, H)
+            The best found configuration
+        '''
+        iteration = self._initialize()
+        if self.overhead_recorder != None:
+            # The record of the initial design (or of restoring the checkpoint)
+            self.overhead_recorder.finish_iteration(iteration - 1, self.stats)
+
+        challengers = []
+        nb_results_since_refresh = self.refresh_every
+        nb_idle_refreshes = 0
+        while not self.stats.is_budget_exhausted():
+            if challengers == [] or nb_results_since_refresh >= self.refresh_every:
+                challengers = self._refresh_challengers()
+                nb_results_since_refresh = 0
+
+            # Give every idle worker a run
+            while self.worker_pool.has_idle_worker() and not self.stats.is_budget_exhausted():
+                run = self._get_next_run(challengers)
+                if run == None:
+                    break
+                config, inst_seed = run
+                task_id = self.worker_pool.submit(config,
+                                                  instance=inst_seed.instance,
+                                                  cutoff=self.batch_evaluator.cutoff,
+                                                  seed=inst_seed.seed)
+                self.pending[task_id] = (config, inst_seed)
+                nb_idle_refreshes = 0
+
+            if self.pending == {}:
+                # Nothing could be started with the current challengers, draw new ones
+                nb_idle_refreshes += 1
+                if nb_idle_refreshes >= self.max_idle_refreshes:
+                    self.logger.warning("No new run could be started after %d refreshes of the challengers, "
+                                        "stop the optimization" % nb_idle_refreshes)
+                    break
+                nb_results_since_refresh = self.refresh_every
+                continue
+
+            for task_id, result in self.worker_pool.get_results():
+                config, inst_seed = self.pending.pop(task_id)
+                self.batch_evaluator.add_run(config, inst_seed.instance, inst_seed.seed, result)
+                self._process_result(config)
+                nb_results_since_refresh += 1
+                iteration += 1
+
+            if self.checkpointer != None:
+                self.checkpointer.maybe_save(self, iteration)
+
+            if self.overhead_recorder != None:
+                self.overhead_recorder.finish_iteration(iteration - 1, self.stats)
+
+            logging.debug("Remaining budget: %f (wallclock), %f (ta costs), %f (target runs)" % (
+                self.stats.get_remaing_time_budget(),
+                self.stats.get_remaining_ta_budget(),
+                self.stats.get_remaining_ta_runs()))
+
+        # Stop the runs that are still going on, their results do not count anymore
+        self.worker_pool.cancel_all()
+        self.pending = {}
+
+        return self.incumbent
+
+    #### Internal methods ####
+
+    def _refresh_challengers(self):
+        if self.shared_runhistory != None:
+            self.shared_runhistory.write(self.runhistory)
+            self.shared_runhistory.read(self.runhistory)
+        elif self.scenario.shared_model:
+            pSMAC.write(run_history=self.runhistory,
+                        output_directory=self.scenario.output_dir,
+                        num_run=self.num_run)
+            pSMAC.read(run_history=self.runhistory,
+                       output_directory=self.scenario.output_dir,
+                       configuration_space=self.config_space,
+                       logger=self.logger)
+
+        if self.incumbent == None:
+            return self._sample_new_configurations()
+
+        start_time = time.time()
+        X, Y = self.rh2EPM.transform(self.runhistory)
+        X, Y = self._add_fantasies(X, Y)
+
+        challengers = \
+            self.select_configuration.run(X, Y,
+                                          incumbent=self.incumbent,
+                                          num_configurations_by_random_search_sorted=100,
+                                          num_configurations_by_local_search=10,
+                                          double_intensification=False)
+        logging.debug("Time spend to choose next configurations: %.2f sec" % (time.time() - start_time))
+        self._log_model_training_time()
+
+        self.incumbent_run_due = True
+        challengers = [challenger for challenger in challengers if self._is_new(challenger)]
+        if challengers == []:
+            # All selected configurations are evaluated already, keep the workers busy with random configurations
+            challengers = self._sample_new_configurations()
+        return challengers
+
+    def _sample_new_configurations(self):
+        configs = self.config_space.sample_configuration(size=self.worker_pool.num_workers)
+        # ConfigSpace returns a single configuration for size 1
+        if self.worker_pool.num_workers == 1:
+            configs = [configs]
+        for config in configs:
+            config.origin = "Random Search"
+        return [config for config in configs if self._is_new(config)]
+
+    def _add_fantasies(self, X, Y):
+        if self.pending == {} or X.shape[0] == 0:
+            return X, Y
+        fantasies = RunHistory(self.aggregate_func)
+        for config, inst_seed in self.pending.values():
+            fantasies.add(config=config, cost=0, time=1, status=StatusType.SUCCESS,
+                          instance_id=inst_seed.instance, seed=inst_seed.seed)
+        # Convert the fantasies with the converter itself, an incremental converter would take them for new runs
+        runhistory2epm = self.rh2EPM
+        while hasattr(runhistory2epm, 'runhistory2epm'):
+            runhistory2epm = runhistory2epm.runhistory2epm
+        X_fantasies, Y_fantasies = runhistory2epm.transform(fantasies)
+        if X_fantasies.shape[0] == 0:
+            return X, Y
+        Y_fantasies[:] = np.mean(Y, axis=0)
+        return np.vstack((X, X_fantasies)), np.concatenate((Y, Y_fantasies))
+
+    def _get_next_run(self, challengers):
+        if self.next_runs != []:
+            return self.next_runs.pop(0)
+
+        if self.incumbent_run_due:
+            self.incumbent_run_due = False
+            inst_seed = self._get_new_incumbent_inst_seed()
+            if inst_seed != None:
+                return self.incumbent, inst_seed
+
+        if self.incumbent == None:
+            # The challengers are compared on one instance-seed pair until the first result is in
+            if self.first_inst_seed == None:
+                self.first_inst_seed = self._get_inst_seed(set())
+            inc_inst_seeds = [self.first_inst_seed]
+        else:
+            inc_inst_seeds = sorted(self.runhistory.get_runs_for_config(self.incumbent))
+        while challengers != [] and inc_inst_seeds != []:
+            challenger = challengers.pop(0)
+            if self._is_new(challenger):
+                return challenger, inc_inst_seeds[0]
+        return None
+
+    def _process_result(self, config):
+        if self.incumbent == None:
+            self._change_incumbent(config)
+            return
+        if config == self.incumbent or not self.batch_evaluator.is_not_worse(config, self.incumbent,
+                                                                                 self.aggregate_func):
+            return
+
+        # Continue the race with the next instance-seed pair of the incumbent
+        started_inst_seeds = set(self.runhistory.get_runs_for_config(config)) | self._get_pending_inst_seeds(config)
+        missing_inst_seeds = sorted(set(self.runhistory.get_runs_for_config(self.incumbent)) - started_inst_seeds)
+        if missing_inst_seeds != []:
+            self.next_runs.append((config, missing_inst_seeds[0]))
+        elif self._get_pending_inst_seeds(config) == set():
+            self._change_incumbent(config)
+
+    def _change_incumbent(self, config):
+        self.incumbent = config
+        self.stats.inc_changed += 1
+        inc_perf = self.aggregate_func(config, self.runhistory, self.runhistory.get_runs_for_config(config))
+        self.logger.info("Challenger (%.4f) is better than incumbent" % inc_perf)
+        self.intensifier.traj_logger.add_entry(train_perf=inc_perf,
+                                               incumbent_id=self.stats.inc_changed,
+                                               incumbent=config)
+
+    def _get_new_incumbent_inst_seed(self):
+        if self.incumbent == None or self._get_pending_inst_seeds(self.incumbent) != set():
+            return None
+        inc_instances = set([inst_seed.instance for inst_seed in self.runhistory.get_runs_for_config(self.incumbent)])
+        if len(inc_instances) >= self.intensifier.maxR:
+            return None
+        return self._get_inst_seed(inc_instances)
+
+    def _get_inst_seed(self, excluded_instances):
+        available_instances = sorted(set(self.intensifier.instances) - excluded_instances)
+        if available_instances == []:
+            return None
+        instance = available_instances[self.rng.randint(len(available_instances))]
+        seed = 0 if self.intensifier.deterministic else self.rng.randint(low=0, high=MAXINT)
+        return InstSeedKey(instance, seed)
+
+    def _get_pending_inst_seeds(self, config):
+        return set([inst_seed for pending_config, inst_seed in list(self.pending.values()) + self.next_runs
+                    if pending_config == config])
+
+    def _is_new(self, config):
+        return config != self.incumbent and len(self.runhistory.get_runs_for_config(config)) == 0 \
+               and self._get_pending_inst_seeds(config) == set()
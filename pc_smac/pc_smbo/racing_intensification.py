@@ -0,0 +1,180 @@
+
+import time
+from collections import Counter
+
+import numpy as np
+from scipy import stats as scipy_stats
+
+from smac.intensification.intensification import Intensifier
+from smac.runhistory.runhistory import RunKey
+from smac.tae.execute_ta_run import BudgetExhaustedException, CappedRunException
+from smac.utils.constants import MAXINT
+
+
+class RacingIntensifier(Intensifier):
+    """
+    Intensifier that races a challenger against the incumbent one fold (instance-seed pair of the incumbent) at a
+    time and rejects it as soon as it cannot beat the incumbent anymore, such that a bad challenger stops consuming
+    folds early. After every fold, the challenger is rejected if
+
+        - a one-sided paired t-test on the costs of the challenger and the incumbent on the same folds says that the
+          challenger is worse (p-value < alpha), from min_folds_for_test folds on, or
+        - the challenger cannot reach the mean cost of the incumbent anymore, even if it would get the cost
+          cost_lower_bound on all remaining folds.
+
+    A challenger that survives all folds of the incumbent becomes the incumbent if its mean cost is not worse.
+    """
+
+    def __init__(self, tae_runner, stats, traj_logger, rng, instances, alpha=0.05, min_folds_for_test=3,
+                 cost_lower_bound=0., **kwargs):
+        super(RacingIntensifier, self).__init__(tae_runner=tae_runner,
+                                                stats=stats,
+                                                traj_logger=traj_logger,
+                                                rng=rng,
+                                                instances=instances,
+                                                **kwargs)
+        self.alpha = alpha
+        self.min_folds_for_test = min_folds_for_test
+        self.cost_lower_bound = cost_lower_bound
+
+        # Number of folds that the rejected challengers did not have to run
+        self.num_folds_saved = 0
+
+    def intensify(self, challengers, incumbent, run_history, aggregate_func, time_bound=MAXINT, min_number_of_runs=1):
+        '''
+        Races the challengers against the incumbent, see the class description
+
+        Returns
+        ----------
+        incumbent: Configuration
+            current (maybe new) incumbent configuration
+        inc_perf: float
+            empirical performance of incumbent configuration
+        '''
+        self.start_time = time.time()
+        self._num_run = 0
+        self._chall_indx = 0
+
+        for challenger in challengers:
+            if challenger == incumbent:
+                continue
+            try:
+                self._add_incumbent_runs(incumbent, run_history, min_number_of_runs)
+                incumbent = self._race(challenger, incumbent, run_history, aggregate_func)
+            except BudgetExhaustedException:
+                return incumbent, run_history.get_cost(incumbent)
+
+            if self._chall_indx > 1 and self._num_run > self.run_limit:
+                self.logger.debug("Maximum #runs for intensification reached")
+                break
+            elif self._chall_indx > 1 and time.time() - self.start_time - time_bound >= 0:
+                self.logger.debug("Timelimit for intensification reached (used: %f sec, available: %f sec)" %
+                                  (time.time() - self.start_time, time_bound))
+                break
+
+        inc_runs = run_history.get_runs_for_config(incumbent)
+        inc_perf = aggregate_func(incumbent, run_history, inc_runs)
+        self.logger.info("Updated estimated performance of incumbent on %d runs: %.4f, %d folds saved by racing" %
+                         (len(inc_runs), inc_perf, self.num_folds_saved))
+        return incumbent, inc_perf
+
+    def is_rejected(self, challenger, incumbent, run_history):
+        """
+        A crashed fold (cost 1234567890) rejects the challenger at once by the bound: with cost_lower_bound=0. its
+        best reachable mean cost is still 1234567890 divided by the number of folds of the incumbent, so the race does
+        not continue to find out whether the crash was a fluke of that fold.
+
+        Returns
+        -------
+        True if the challenger cannot beat the incumbent anymore on the folds of the incumbent
+
+        """
+        inc_inst_seeds = run_history.get_runs_for_config(incumbent)
+        inc_costs = self._get_costs(incumbent, inc_inst_seeds, run_history)
+        chall_inst_seeds = set(run_history.get_runs_for_config(challenger))
+        common = [inst_seed for inst_seed in inc_inst_seeds if inst_seed in chall_inst_seeds]
+        if common == []:
+            return False
+        chall_costs = self._get_costs(challenger, common, run_history)
+        differences = chall_costs - self._get_costs(incumbent, common, run_history)
+
+        # Bound: the best mean cost that the challenger can still reach on all folds of the incumbent
+        remaining = len(inc_inst_seeds) - len(common)
+        best_reachable = (np.sum(chall_costs) + self.cost_lower_bound * remaining) / len(inc_inst_seeds)
+        if best_reachable > np.mean(inc_costs):
+            return True
+
+        # Test: one-sided paired t-test with the null hypothesis that the challenger is not worse
+        if len(common) < self.min_folds_for_test or remaining == 0:
+            return False
+        std = np.std(differences, ddof=1)
+        if std == 0:
+            return np.mean(differences) > 0
+        t_statistic = np.mean(differences) / (std / np.sqrt(len(common)))
+        return scipy_stats.t.sf(t_statistic, len(common) - 1) < self.alpha
+
+    #### Internal methods ####
+
+    def _add_incumbent_runs(self, incumbent, run_history, min_number_of_runs):
+        # Give the incumbent a run on a new instance, and more until it has min_number_of_runs runs
+        while len(run_history.get_runs_for_config(incumbent)) < self.maxR:
+            inc_instances = Counter([inst_seed.instance for inst_seed in run_history.get_runs_for_config(incumbent)])
+            max_runs = max(inc_instances.values()) if inc_instances else 0
+            available_instances = self.instances - set([instance for instance, num_runs in inc_instances.items()
+                                                        if num_runs == max_runs])
+            if not self.deterministic and not available_instances:
+                available_instances = self.instances
+            if not available_instances:
+                break
+
+            instance = self.rs.choice(sorted(available_instances))
+            seed = 0 if self.deterministic else self.rs.randint(low=0, high=MAXINT, size=1)[0]
+            self.tae_runner.start(config=incumbent,
+                                  instance=instance,
+                                  seed=seed,
+                                  cutoff=self.cutoff,
+                                  instance_specific=self.instance_specifics.get(instance, "0"))
+            self._num_run += 1
+            if len(run_history.get_runs_for_config(incumbent)) >= min_number_of_runs:
+                break
+
+    def _race(self, challenger, incumbent, run_history, aggregate_func):
+        inc_inst_seeds = run_history.get_runs_for_config(incumbent)
+        chall_inst_seeds = set(run_history.get_runs_for_config(challenger))
+        missing = [inst_seed for inst_seed in inc_inst_seeds if inst_seed not in chall_inst_seeds]
+        self.rs.shuffle(missing)
+
+        if missing != []:
+            self._chall_indx += 1
+        for position, (instance, seed) in enumerate(missing):
+            try:
+                self.tae_runner.start(config=challenger,
+                                      instance=instance,
+                                      seed=seed,
+                                      cutoff=self.cutoff,
+                                      instance_specific=self.instance_specifics.get(instance, "0"))
+                self._num_run += 1
+            except CappedRunException:
+                # The capped fold was run until the cutoff, only the folds after it are saved
+                self.num_folds_saved += len(missing) - position - 1
+                return incumbent
+            if self.is_rejected(challenger, incumbent, run_history):
+                self.num_folds_saved += len(missing) - position - 1
+                self.logger.debug("Rejected challenger after %d of %d folds" % (position + 1, len(missing)))
+                return incumbent
+
+        chal_perf = aggregate_func(challenger, run_history, inc_inst_seeds)
+        inc_perf = aggregate_func(incumbent, run_history, inc_inst_seeds)
+        if chal_perf > inc_perf:
+            return incumbent
+
+        self.logger.info("Challenger (%.4f) is better than incumbent (%.4f) on %d runs." %
+                         (chal_perf, inc_perf, len(inc_inst_seeds)))
+        self.stats.inc_changed += 1
+        self.traj_logger.add_entry(train_perf=chal_perf, incumbent_id=self.stats.inc_changed, incumbent=challenger)
+        return challenger
+
+    def _get_costs(self, config, inst_seeds, run_history):
+        config_id = run_history.config_ids[config]
+        return np.array([run_history.data[RunKey(config_id, inst_seed.instance, inst_seed.seed)].cost
+                         for inst_seed in inst_seeds])
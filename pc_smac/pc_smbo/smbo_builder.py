@@ -17,7 +17,17 @@ from smac.initial_design.multi_config_initial_design import MultiConfigInitialDe
 from smac.utils.io.traj_logging import TrajLogger
 from smac.utils.util_funcs import get_types
 
-from pc_smac.pc_smac.pc_smbo.pc_smbo import PCSMBO, PCSMBOSigmoidRandomSearch
+from pc_smac.pc_smac.pc_runhistory.columnar_runhistory import ColumnarPCRunHistory, IncrementalRunHistory2EPM
+from pc_smac.pc_smac.pc_runhistory.caching_discount import CachingDiscountEngine
+from pc_smac.pc_smac.pc_runhistory.shared_runhistory import SharedRunHistory
+from pc_smac.pc_smac.pc_smbo.pc_smbo import PCSMBO, PCSMBOSigmoidRandomSearch, PCSMBOAsync
+from pc_smac.pc_smac.pc_smbo.incremental_model import IncrementalModel
+from pc_smac.pc_smac.pc_smbo.batch_evaluation import BatchSelector, BatchEvaluator
+from pc_smac.pc_smac.pc_smbo.marginalization import SelectConfigurationsWithVectorizedMarginalization
+from pc_smac.pc_smac.pc_smbo.warm_start import WarmStartRunHistory2EPM
+from pc_smac.pc_smac.pc_smbo.initial_design import PrefixSharingInitialDesign
+from pc_smac.pc_smac.pc_smbo.challenger_scheduling import ChallengerScheduler
+from pc_smac.pc_smac.pc_smbo.racing_intensification import RacingIntensifier
 
 
 
@@ -30,40 +40,72 @@ class SMBOBuilder:
                         logging_directory, double_intensification=False, constant_pipeline_steps=None, variable_pipeline_steps=None,
                       cached_pipeline_steps=None, seed=None,
                       intensification_instances=None, num_marginalized_configurations_by_random_search=20, num_configs_for_marginalization=40,
-                      random_splitting_number=5, random_splitting_enabled=False):
+                      random_splitting_number=5, random_splitting_enabled=False,
+                      incremental_model_updates=False, full_model_retrain_every=5, model_retrain_growth_fraction=0.2,
+                      batch_size=1, worker_pool=None, asynchronous=False, vectorized_marginalization=False,
+                      checkpointer=None, initial_configurations=None, transfer_runhistory=None,
+                      initial_design_prefixes=0, initial_design_classifiers_per_prefix=3,
+                      initial_design_budget_fraction=0.1, cache_aware_ordering=False, ordering_band_size=5,
+                      racing=False, racing_alpha=0.05, overhead_recorder=None):
 
         # Build intensifier
         rng = np.random.RandomState(seed)
         traj_logger = TrajLogger(logging_directory, stats)
-        intensifier = Intensifier(tae_runner=tae_runner,
-                                  stats=stats,
-                                  traj_logger=traj_logger,
-                                  rng=rng,
-                                  cutoff=scenario.cutoff,
-                                  deterministic=scenario.deterministic,
-                                  run_obj_time=scenario.run_obj == "runtime",
-                                  run_limit=scenario.ta_run_limit,
-                                  instances=intensification_instances,
-                                  maxR=len(intensification_instances))
+        if racing:
+            # Reject challengers after every fold as soon as they cannot beat the incumbent anymore
+            intensifier = RacingIntensifier(tae_runner=tae_runner,
+                                            stats=stats,
+                                            traj_logger=traj_logger,
+                                            rng=rng,
+                                            instances=intensification_instances,
+                                            alpha=racing_alpha,
+                                            cutoff=scenario.cutoff,
+                                            deterministic=scenario.deterministic,
+                                            run_obj_time=scenario.run_obj == "runtime",
+                                            run_limit=scenario.ta_run_limit,
+                                            maxR=len(intensification_instances))
+        else:
+            intensifier = Intensifier(tae_runner=tae_runner,
+                                      stats=stats,
+                                      traj_logger=traj_logger,
+                                      rng=rng,
+                                      cutoff=scenario.cutoff,
+                                      deterministic=scenario.deterministic,
+                                      run_obj_time=scenario.run_obj == "runtime",
+                                      run_limit=scenario.ta_run_limit,
+                                      instances=intensification_instances,
+                                      maxR=len(intensification_instances))
 
         # Build model
         types, bounds = get_types(scenario.cs, scenario.feature_array)
         #types = get_types(scenario.cs)
         if len(model_target_names) > 1:
             # model_target_names = ['cost','time']
-            model = UncorrelatedMultiObjectiveRandomForestWithInstances(target_names=model_target_names,
-                                                                       bounds=bounds,
-                                                                       types=types)
+            build_model = lambda num_trees: UncorrelatedMultiObjectiveRandomForestWithInstances(
+                target_names=model_target_names, bounds=bounds, types=types, num_trees=num_trees)
             # UncorrelatedMultiObjectiveRandomForestWithInstances(target_names=model_target_names,
             #                                                    types=types)
+            model = build_model(10)
         elif len(model_target_names) == 1:
-            model = RandomForestWithInstances(types=types, bounds=bounds)
+            build_model = lambda num_trees: RandomForestWithInstances(types=types, bounds=bounds, num_trees=num_trees)
+            model = build_model(10)
         else:
+            build_model = None
             model = RandomEPM(rng=rng)
             # model = RandomForestWithInstances(types=types)
 
+        # Only fully retrain the model every full_model_retrain_every iterations and update it cheaply in between
+        if incremental_model_updates and build_model != None:
+            model = IncrementalModel(model=model,
+                                     model_factory=build_model,
+                                     num_trees=10,
+                                     full_retrain_every=full_model_retrain_every,
+                                     retrain_growth_fraction=model_retrain_growth_fraction)
+
         # Build acquisition function, runhistory2epm and local search
         num_params = len(scenario.cs.get_hyperparameters())
+        acquisition_func = None
+        local_search = None
         if acq_func_name in ["ei", "pc-ei"]:
             acquisition_func = EI(model)
             acq_func_wrapper = PCAquisitionFunctionWrapper(acquisition_func=acquisition_func,
@@ -224,7 +266,45 @@ class SMBOBuilder:
             # Not a valid acquisition function
             raise ValueError("The provided acquisition function is not valid")
 
+        # Score the candidates of the marginalized acquisition functions in batches, the caching reduction of
+        #   pc-m-pceips is part of its acquisition function wrapper, so it keeps the wrapper
+        if vectorized_marginalization and acq_func_name in ["m-ei", "pc-m-ei", "m-eips", "pc-m-eips"]:
+            if variable_pipeline_steps == None:
+                raise ValueError("Variable pipeline steps should not be none when using vectorized marginalization")
+            select_configuration = SelectConfigurationsWithVectorizedMarginalization(
+                scenario=scenario,
+                runhistory=runhistory,
+                model=model,
+                acquisition_func=acquisition_func,
+                rng=rng,
+                variable_pipeline_steps=variable_pipeline_steps,
+                num_configs_for_marginalization=num_configs_for_marginalization,
+                overhead_recorder=overhead_recorder)
+
+        # Only convert the new runs of the runhistory to EPM data at every iteration
+        if isinstance(runhistory, ColumnarPCRunHistory):
+            runhistory2epm = IncrementalRunHistory2EPM(runhistory2epm)
+
+        # Add the runs of previous optimizations on similar datasets to the data of the EPM
+        if transfer_runhistory != None:
+            runhistory2epm = WarmStartRunHistory2EPM(runhistory2epm, transfer_runhistory)
 
+        # The updates of the incremental model are trained on the rows of the new runs, which the converter tells
+        if isinstance(model, IncrementalModel):
+            model.runhistory2epm = runhistory2epm
+
+        # Build the selection and evaluation of a batch of challengers
+        batch_selector, batch_evaluator = None, None
+        if (batch_size > 1 or asynchronous) and worker_pool != None:
+            discount_engine = None
+            if acq_func_name[:2] == "pc" and cached_pipeline_steps != None:
+                discount_engine = CachingDiscountEngine(scenario.cs, cached_pipeline_steps)
+            batch_selector = BatchSelector(discount_engine=discount_engine)
+            batch_evaluator = BatchEvaluator(worker_pool=worker_pool,
+                                             runhistory=runhistory,
+                                             stats=stats,
+                                             cutoff=scenario.cutoff,
+                                             run_obj=scenario.run_obj)
 
         # Build initial design
         # initial_design = RandomConfiguration(tae_runner=tae_runner,
@@ -232,24 +312,97 @@ class SMBOBuilder:
         #                                      stats=stats,
         #                                      traj_logger=traj_logger,
         #                                      rng=rng)
-        initial_configs = scenario.cs.sample_configuration(size=2)
+        if initial_configurations:
+            # Warm start with the best configurations of previous optimizations on similar datasets
+            initial_configs = initial_configurations
+        else:
+            initial_configs = scenario.cs.sample_configuration(size=2)
         for config in initial_configs:
             config._populate_values()
-        initial_design = MultiConfigInitialDesign(tae_runner=tae_runner,
-                                                  scenario=scenario,
-                                                  stats=stats,
-                                                  traj_logger=traj_logger,
-                                                  runhistory=runhistory,
-                                                  rng=rng,
-                                                  configs=initial_configs,
-                                                  intensifier=intensifier,
-                                                  aggregate_func=aggregate_func)
+        if initial_design_prefixes > 0 and constant_pipeline_steps != None and variable_pipeline_steps != None:
+            # Diverse preprocessing prefixes, each of them with several classifiers, cheapest prefixes first
+            initial_design = PrefixSharingInitialDesign(tae_runner=tae_runner,
+                                                        scenario=scenario,
+                                                        stats=stats,
+                                                        traj_logger=traj_logger,
+                                                        runhistory=runhistory,
+                                                        rng=rng,
+                                                        aggregate_func=aggregate_func,
+                                                        constant_pipeline_steps=constant_pipeline_steps,
+                                                        variable_pipeline_steps=variable_pipeline_steps,
+                                                        num_prefixes=initial_design_prefixes,
+                                                        num_classifiers_per_prefix=initial_design_classifiers_per_prefix,
+                                                        budget_fraction=initial_design_budget_fraction,
+                                                        batch_evaluator=batch_evaluator,
+                                                        additional_configs=initial_configurations)
+        else:
+            initial_design = MultiConfigInitialDesign(tae_runner=tae_runner,
+                                                      scenario=scenario,
+                                                      stats=stats,
+                                                      traj_logger=traj_logger,
+                                                      runhistory=runhistory,
+                                                      rng=rng,
+                                                      configs=initial_configs,
+                                                      intensifier=intensifier,
+                                                      aggregate_func=aggregate_func)
+
+        # Reorder the challengers within bands of near-tied challengers for more cache hits, the near-ties are only
+        #   computed with the plain EI and EIPS acquisition functions, otherwise the bands are fixed windows
+        challenger_scheduler = None
+        if cache_aware_ordering and cached_pipeline_steps != None:
+            challenger_scheduler = ChallengerScheduler(
+                discount_engine=CachingDiscountEngine(scenario.cs, cached_pipeline_steps),
+                band_size=ordering_band_size,
+                acquisition_func=acquisition_func if isinstance(acquisition_func, (EI, EIPS)) else None)
 
         # run id
         num_run = rng.randint(1234567980)
 
+        # Share the runs with the parallel optimizers incrementally
+        shared_runhistory = None
+        if scenario.shared_model:
+            shared_runhistory = SharedRunHistory(scenario.output_dir, num_run, scenario.cs)
+
+        # Measure the overhead of the parts of the optimizer at every iteration
+        if overhead_recorder != None:
+            overhead_recorder.instrument(runhistory2epm, 'transform', 'transform',
+                                         count_name='num_epm_data', count_func=lambda result: result[0].shape[0])
+            overhead_recorder.instrument(select_configuration, 'run', 'select_configurations',
+                                         count_name='num_challengers',
+                                         count_func=lambda result: sum([len(challengers) for challengers in result])
+                                         if isinstance(result, tuple) else len(result))
+            overhead_recorder.instrument(model, 'train', 'model_training')
+            # The vectorized marginalization records its acquisition optimization itself, the one of SMAC is measured
+            #   by the local search object only, which the SMAC selection calls
+            if not isinstance(select_configuration, SelectConfigurationsWithVectorizedMarginalization):
+                overhead_recorder.instrument(select_configuration, '_get_next_by_random_search',
+                                             'acquisition_random_search',
+                                             count_name='num_random_search_candidates', count_func=len)
+                overhead_recorder.instrument(local_search, 'maximize', 'acquisition_local_search',
+                                             count_name='num_local_searches')
+            overhead_recorder.instrument(intensifier, 'intensify', 'intensification')
+            overhead_recorder.instrument(shared_runhistory, 'read', 'psmac_io')
+            overhead_recorder.instrument(shared_runhistory, 'write', 'psmac_io')
+            overhead_recorder.instrument(checkpointer, 'save', 'checkpointing')
+
         # Build pc_smbo
-        if acq_func_name not in ['pc-roar-sigmoid-rs']:
+        if asynchronous and batch_evaluator != None and acq_func_name not in ['pc-roar-sigmoid-rs']:
+            smbo = PCSMBOAsync(scenario=scenario,
+                               stats=stats,
+                               initial_design=initial_design,
+                               runhistory=runhistory,
+                               runhistory2epm=runhistory2epm,
+                               intensifier=intensifier,
+                               aggregate_func=aggregate_func,
+                               num_run=num_run,
+                               model=model,
+                               rng=rng,
+                               select_configuration=select_configuration,
+                               batch_evaluator=batch_evaluator,
+                               checkpointer=checkpointer,
+                               shared_runhistory=shared_runhistory,
+                               overhead_recorder=overhead_recorder)
+        elif acq_func_name not in ['pc-roar-sigmoid-rs']:
             smbo = PCSMBO(scenario=scenario,
                           stats=stats,
                           initial_design=initial_design,
@@ -261,7 +414,14 @@ class SMBOBuilder:
                           model=model,
                           rng=rng,
                           select_configuration=select_configuration,
-                          double_intensification=double_intensification)
+                          double_intensification=double_intensification,
+                          batch_size=batch_size,
+                          batch_selector=batch_selector,
+                          batch_evaluator=batch_evaluator,
+                          checkpointer=checkpointer,
+                          shared_runhistory=shared_runhistory,
+                          challenger_scheduler=challenger_scheduler,
+                          overhead_recorder=overhead_recorder)
         else:
             smbo = PCSMBOSigmoidRandomSearch(scenario=scenario,
                           stats=stats,
@@ -273,6 +433,9 @@ class SMBOBuilder:
                           num_run=num_run,
                           model=model,
                           rng=rng,
-                          select_configuration=select_configuration)
+                          select_configuration=select_configuration,
+                          checkpointer=checkpointer,
+                          shared_runhistory=shared_runhistory,
+                          overhead_recorder=overhead_recorder)
 
         return smbo
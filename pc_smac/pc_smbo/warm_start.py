@@ -0,0 +1,191 @@
+
+import os
+import glob
+import json
+import logging
+
+import numpy as np
+
+from ConfigSpace.configuration_space import Configuration
+from smac.runhistory.runhistory import RunHistory
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.utils.config_digest import get_config_digest
+
+
+def compute_meta_features(info):
+    """
+    Simple meta-features of a dataset out of the info of the DataLoader. The sizes are on a log scale such that a
+    dataset with twice as many rows is equally near for small and large datasets.
+    """
+    return {
+        'log_num_rows': float(np.log10(info.get('train_num', 0) + 1)),
+        'log_num_features': float(np.log10(info.get('feat_num', 0) + 1)),
+        'log_num_classes': float(np.log2(max(info.get('label_num', info.get('target_num', 1)), 1) + 1)),
+        'is_sparse': float(info.get('is_sparse', 0)),
+        'has_categorical': float(info.get('has_categorical', 0)),
+        'has_missing': float(info.get('has_missing', 0)),
+        'task': int(info['task']),
+        'metric': int(info['metric'])
+    }
+
+
+class WarmStarter(object):
+    """
+    Finds the previous runs on the most similar datasets in the Statistics output directories (runs of which the
+    meta-features were saved, see Statistics.save_meta_features) and returns their best configurations to seed the
+    initial design. Only runs with the same task and metric are considered.
+
+    Optionally, their runs are converted into a RunHistory that can be added to the data of the EPM (see
+    WarmStartRunHistory2EPM).
+    """
+
+    def __init__(self, directories, config_space, num_neighbours=3, num_configs_per_neighbour=2, exclude_files=None):
+        self.directories = directories
+        self.config_space = config_space
+        self.num_neighbours = num_neighbours
+        self.num_configs_per_neighbour = num_configs_per_neighbour
+        self.exclude_files = [os.path.abspath(fn) for fn in exclude_files] if exclude_files != None else []
+        self.logger = logging.getLogger("WarmStarter")
+
+    def find_neighbours(self, meta_features):
+        """
+
+        Returns
+        -------
+        List of tuples (distance, runs file) of the nearest previous runs, nearest first
+
+        """
+        neighbours = []
+        for directory in self.directories:
+            for meta_features_file in glob.glob(os.path.join(directory, "statistics_*_meta_features.json")):
+                if os.path.abspath(meta_features_file) in self.exclude_files:
+                    continue
+                runs_file = meta_features_file[:-len("_meta_features.json")] + "_runs.json"
+                if not os.path.exists(runs_file):
+                    continue
+                with open(meta_features_file) as fp:
+                    previous_meta_features = json.load(fp)
+                if previous_meta_features.get('task') != meta_features['task'] \
+                        or previous_meta_features.get('metric') != meta_features['metric']:
+                    continue
+                neighbours.append((self._get_distance(meta_features, previous_meta_features), runs_file))
+        return sorted(neighbours)[:self.num_neighbours]
+
+    def get_initial_configurations(self, meta_features):
+        configs = []
+        for distance, runs_file in self.find_neighbours(meta_features):
+            best_configs = self._get_best_configs(self._read_runs(runs_file))
+            configs.extend([config for config in best_configs[:self.num_configs_per_neighbour] if config not in configs])
+            self.logger.info("Warm start with %d configurations of %s (distance %.3f)" %
+                             (len(best_configs[:self.num_configs_per_neighbour]), runs_file, distance))
+        return configs
+
+    def get_transfer_runhistory(self, meta_features, aggregate_func):
+        runhistory = RunHistory(aggregate_func)
+        for _, runs_file in self.find_neighbours(meta_features):
+            for run in self._read_runs(runs_file):
+                config = self._get_configuration(run['config'])
+                if config == None:
+                    continue
+                status = StatusType.SUCCESS if run['cost'] != 1234567890 else StatusType.CRASHED
+                runhistory.add(config=config, cost=run['cost'], time=run.get('runtime', 0), status=status,
+                               instance_id=runs_file + ":" + str(run.get('instance')), seed=0)
+        return runhistory
+
+    #### Internal methods ####
+
+    def _get_distance(self, meta_features, other_meta_features):
+        keys = ['log_num_rows', 'log_num_features', 'log_num_classes', 'is_sparse', 'has_categorical', 'has_missing']
+        return float(np.sum([abs(meta_features[key] - other_meta_features.get(key, 0)) for key in keys]))
+
+    def _get_best_configs(self, runs):
+        costs, configs = {}, {}
+        for run in runs:
+            if run['cost'] == 1234567890:
+                continue
+            digest = get_config_digest(run['config'])
+            costs.setdefault(digest, []).append(run['cost'])
+            configs[digest] = run['config']
+
+        best_configs = []
+        for digest in sorted(costs, key=lambda digest: np.mean(costs[digest])):
+            config = self._get_configuration(configs[digest])
+            if config != None:
+                best_configs.append(config)
+        return best_configs
+
+    def _get_configuration(self, config_dict):
+        # Configurations of another pipeline space do not fit in this configuration space
+        try:
+            config = Configuration(self.config_space, values=config_dict)
+            config.origin = "Warm start"
+            return config
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _read_runs(self, runs_file):
+        # The runs are appended to the file as indented json objects, one after the other
+        decoder = json.JSONDecoder()
+        with open(runs_file) as fp:
+            content = fp.read()
+        runs, position = [], 0
+        while True:
+            while position < len(content) and content[position].isspace():
+                position += 1
+            if position >= len(content):
+                break
+            try:
+                run, position = decoder.raw_decode(content, position)
+            except ValueError:
+                # The last run of an interrupted optimization can be incomplete
+                break
+            runs.append(run)
+        return runs
+
+
+class WarmStartRunHistory2EPM(object):
+    """
+    Wraps a runhistory2epm object and adds the converted runs of a transfer runhistory (e.g. of previous runs on
+    similar datasets) to the data of the EPM. The transfer runhistory is converted once.
+
+    The rows of the transfer runs follow the rows of this optimization and are not reweighted: a transfer run counts
+    as much for the model as a run of this optimization. The instances of the transfer runs are named after their
+    runs file, so they are never aggregated with the runs of this optimization.
+    """
+
+    def __init__(self, runhistory2epm, transfer_runhistory):
+        self.runhistory2epm = runhistory2epm
+        self.transfer_runhistory = transfer_runhistory
+        self.X_transfer = None
+        self.Y_transfer = None
+
+    def transform(self, runhistory):
+        X, Y = self.runhistory2epm.transform(runhistory)
+        if self.X_transfer is None:
+            # Convert with the wrapped converter itself, an incremental converter would take them for new runs
+            runhistory2epm = self.runhistory2epm
+            while hasattr(runhistory2epm, 'runhistory2epm'):
+                runhistory2epm = runhistory2epm.runhistory2epm
+            self.X_transfer, self.Y_transfer = runhistory2epm.transform(self.transfer_runhistory)
+        if self.X_transfer.shape[0] == 0:
+            return X, Y
+        return np.vstack((X, self.X_transfer)), np.concatenate((Y, self.Y_transfer))
+
+    def get_row_keys(self):
+        """
+
+        Returns
+        -------
+        List with a key for every row of the data of the last transform: the keys of the wrapped converter (see
+        IncrementalRunHistory2EPM.get_row_keys) followed by ('transfer', row) for the transfer rows, or None if the
+        wrapped converter does not know its rows
+
+        """
+        row_keys = self.runhistory2epm.get_row_keys() if hasattr(self.runhistory2epm, 'get_row_keys') else None
+        if row_keys is None or self.X_transfer is None:
+            return row_keys
+        return row_keys + [('transfer', row) for row in range(self.X_transfer.shape[0])]
+
+    def __getattr__(self, name):
+        return getattr(self.runhistory2epm, name)
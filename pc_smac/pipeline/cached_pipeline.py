@@ -12,13 +12,16 @@ from sklearn.base import clone
 from sklearn.externals.joblib import Memory
 from sklearn.externals import six
 
+from pc_smac.pc_smac.pipeline.resource_monitor import StepResourceMonitor
+
 # Use global variables to calculate the number of cache hits
 FIT_SINGLE_TRANSFORM_EVALUATIONS = 0
 FIT_TRANSFORM_ONE_EVALUATIONS = 0
 
 class CachedPipeline(Pipeline):
 
-    def __init__(self, steps, cached_step_names, memory=Memory(cachedir=None, verbose=0), min_runtime_for_caching=1, run_instance=None):
+    def __init__(self, steps, cached_step_names, memory=Memory(cachedir=None, verbose=0), min_runtime_for_caching=1, run_instance=None,
+                 trace_allocations=False):
         self.memory = memory
         if isinstance(memory, six.string_types):
             self.memory = Memory(cachedir=memory, verbose=0)
@@ -33,6 +36,7 @@ class CachedPipeline(Pipeline):
         self.min_runtime_for_caching = min_runtime_for_caching
 
         self.run_instance = run_instance
+        self.trace_allocations = trace_allocations
 
         super(CachedPipeline, self).__init__(steps)
 
@@ -46,6 +50,11 @@ class CachedPipeline(Pipeline):
             fit_params_steps[step][param] = pval
         Xt = X
         for idx_tr, (name, transform) in enumerate(self.steps[:-1]):
+            # The data of the steps is only described when the allocations are traced, as it scans the data
+            monitor = StepResourceMonitor(trace_allocations=self.trace_allocations,
+                                          describe_data=self.trace_allocations)
+            self.pipeline_info.set_running_step(name)
+            monitor.start(Xt)
             start_time = time.time()
             if transform is None:
                 pass
@@ -71,6 +80,7 @@ class CachedPipeline(Pipeline):
             else:
                 Xt = self._fit_single_transform(transform, name, None, Xt, y, **fit_params_steps[name])
             self.pipeline_info.add_preprocessor_timing(name, time.time() - start_time)
+            self.pipeline_info.add_preprocessor_resources(name, monitor.stop(Xt))
 
         if self._final_estimator is None:
             return Xt, {}
@@ -104,11 +114,44 @@ class CachedPipeline(Pipeline):
         """
         Xt, fit_params = self._fit(X, y, **fit_params)
         if self._final_estimator is not None:
+            monitor = StepResourceMonitor(trace_allocations=self.trace_allocations,
+                                          describe_data=self.trace_allocations)
+            self.pipeline_info.set_running_step(self.steps[-1][0])
+            monitor.start(Xt)
             start_time = time.time()
             self._final_estimator.fit(Xt, y, **fit_params)
             self.pipeline_info.add_estimator_timing(self.steps[-1][0], time.time() - start_time)
+            self.pipeline_info.add_estimator_resources(self.steps[-1][0], monitor.stop())
+        self.pipeline_info.set_running_step(None)
         return self
 
+    def predict(self, X):
+        """Apply transforms to the data, and predict with the final estimator
+
+        The time that every transform and the prediction of the final estimator take is kept in the pipeline info.
+
+        Parameters
+        ----------
+        X : iterable
+            Data to predict on. Must fulfill input requirements of first step
+            of the pipeline.
+
+        Returns
+        -------
+        y_pred : array-like
+        """
+        Xt = X
+        for name, transform in self.steps[:-1]:
+            if transform is not None:
+                start_time = time.time()
+                num_rows = Xt.shape[0]
+                Xt = self._single_transform(transform, Xt)
+                self.pipeline_info.add_predict_preprocessor_timing(name, time.time() - start_time, num_rows)
+        start_time = time.time()
+        y_pred = self.steps[-1][-1].predict(Xt)
+        self.pipeline_info.add_predict_estimator_timing(self.steps[-1][0], time.time() - start_time, Xt.shape[0])
+        return y_pred
+
     def score(self, X, y, sample_weight=None):
         """Apply transforms, and score with the final estimator
 
@@ -199,8 +242,16 @@ class PipelineInfo(object):
         self.timing = {
             'preprocessors': {},
             'cached_preprocessors': {},
+            'estimators': {},
+            'predict_preprocessors': {},
+            'predict_estimators': {}
+        }
+        self.resources = {
+            'preprocessors': {},
             'estimators': {}
         }
+        # Name of the step that is being fitted, used to find out which step exceeded the memory limit
+        self.running_step = None
         self.cache_hits = 0
 
     def add_preprocessor_timing(self, name, runtime):
@@ -229,6 +280,47 @@ class PipelineInfo(object):
         dct.update(self.get_estimator_timing())
         return dct
 
+    def add_predict_preprocessor_timing(self, name, runtime, num_rows):
+        self.timing['predict_preprocessors'][name] = self._get_predict_timing(runtime, num_rows)
+
+    def add_predict_estimator_timing(self, name, runtime, num_rows):
+        self.timing['predict_estimators'][name] = self._get_predict_timing(runtime, num_rows)
+
+    def get_predict_timing_flat(self):
+        dct = self.timing['predict_preprocessors'].copy()
+        dct.update(self.timing['predict_estimators'])
+        return dct
+
+    def get_total_predict_time(self):
+        return sum([timing['time'] for timing in self.get_predict_timing_flat().values()])
+
+    def add_preprocessor_resources(self, name, resources):
+        self.resources['preprocessors'][name] = resources
+
+    def add_estimator_resources(self, name, resources):
+        self.resources['estimators'][name] = resources
+
+    def get_resources(self):
+        return self.resources
+
+    def get_resources_flat(self):
+        dct = self.resources['preprocessors'].copy()
+        dct.update(self.resources['estimators'])
+        return dct
+
+    def set_running_step(self, name):
+        self.running_step = name
+
+    def get_running_step(self):
+        return self.running_step
+
+    def _get_predict_timing(self, runtime, num_rows):
+        return {
+            'time': runtime,
+            'rows': num_rows,
+            'rows_per_second': num_rows / runtime if runtime > 0 else None
+        }
+
     def get_cache_hits(self):
         if self.caching == True:
             global FIT_TRANSFORM_ONE_EVALUATIONS, FIT_SINGLE_TRANSFORM_EVALUATIONS
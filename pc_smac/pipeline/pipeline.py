@@ -4,15 +4,17 @@ import time
 from sklearn.pipeline import Pipeline
 
 from pc_smac.pc_smac.pipeline.cached_pipeline import PipelineInfo
+from pc_smac.pc_smac.pipeline.resource_monitor import StepResourceMonitor
 
 from sklearn.externals import six
 
 class OwnPipeline(Pipeline):
 
-    def __init__(self, steps):
+    def __init__(self, steps, trace_allocations=False):
         super(OwnPipeline, self).__init__(steps)
 
         self.pipeline_info = PipelineInfo(caching=False)
+        self.trace_allocations = trace_allocations
 
     def _fit(self, X, y=None, **fit_params):
         # self._validate_steps()
@@ -24,6 +26,11 @@ class OwnPipeline(Pipeline):
             fit_params_steps[step][param] = pval
         Xt = X
         for name, transform in self.steps[:-1]:
+            # The data of the steps is only described when the allocations are traced, as it scans the data
+            monitor = StepResourceMonitor(trace_allocations=self.trace_allocations,
+                                          describe_data=self.trace_allocations)
+            self.pipeline_info.set_running_step(name)
+            monitor.start(Xt)
             start_time = time.time()
 
             if transform is None:
@@ -34,6 +41,7 @@ class OwnPipeline(Pipeline):
                 Xt = transform.fit(Xt, y, **fit_params_steps[name]) \
                     .transform(Xt)
             self.pipeline_info.add_preprocessor_timing(name, time.time() - start_time)
+            self.pipeline_info.add_preprocessor_resources(name, monitor.stop(Xt))
         if self._final_estimator is None:
             return Xt, {}
         return Xt, fit_params_steps[self.steps[-1][0]]
@@ -65,8 +73,53 @@ class OwnPipeline(Pipeline):
             This estimator
         """
         Xt, fit_params = self._fit(X, y, **fit_params)
+        return self.fit_final_estimator(Xt, y, **fit_params)
+
+    def fit_final_estimator(self, Xt, y=None, **fit_params):
+        """Fit only the final estimator on data that is already transformed by the other steps"""
         if self._final_estimator is not None:
+            monitor = StepResourceMonitor(trace_allocations=self.trace_allocations,
+                                          describe_data=self.trace_allocations)
+            self.pipeline_info.set_running_step(self.steps[-1][0])
+            monitor.start(Xt)
             start_time = time.time()
             self._final_estimator.fit(Xt, y, **fit_params)
             self.pipeline_info.add_estimator_timing(self.steps[-1][0], time.time() - start_time)
-        return self
\ No newline at end of file
+            self.pipeline_info.add_estimator_resources(self.steps[-1][0], monitor.stop())
+        self.pipeline_info.set_running_step(None)
+        return self
+
+    def predict(self, X):
+        """Apply transforms to the data, and predict with the final estimator
+
+        The time that every transform and the prediction of the final estimator take is kept in the pipeline info.
+
+        Parameters
+        ----------
+        X : iterable
+            Data to predict on. Must fulfill input requirements of first step
+            of the pipeline.
+
+        Returns
+        -------
+        y_pred : array-like
+        """
+        return self.predict_final_estimator(self.transform_prefix(X))
+
+    def transform_prefix(self, X):
+        """Apply the transforms of all steps in front of the final estimator"""
+        Xt = X
+        for name, transform in self.steps[:-1]:
+            if transform is not None:
+                start_time = time.time()
+                num_rows = Xt.shape[0]
+                Xt = transform.transform(Xt)
+                self.pipeline_info.add_predict_preprocessor_timing(name, time.time() - start_time, num_rows)
+        return Xt
+
+    def predict_final_estimator(self, Xt):
+        """Predict with the final estimator on data that is already transformed by the other steps"""
+        start_time = time.time()
+        y_pred = self.steps[-1][-1].predict(Xt)
+        self.pipeline_info.add_predict_estimator_timing(self.steps[-1][0], time.time() - start_time, Xt.shape[0])
+        return y_pred
@@ -9,13 +9,19 @@ from pc_smac.pc_smac.pipeline.pipeline import OwnPipeline
 
 class PipelineBuilder:
 
-    def __init__(self, pipeline_space, caching, cache_directory=None, min_runtime_for_caching=1):
-        if (caching == False) and (cache_directory != None):
+    def __init__(self, pipeline_space, caching, cache_directory=None, min_runtime_for_caching=1, trace_allocations=False,
+                 cachedir=None):
+        if (caching == False) and (cache_directory != None or cachedir != None):
             raise ValueError("Caching is disabled but a cache directory is given!")
 
         self.caching = caching
         self.pipeline_space = pipeline_space
-        if self.caching and cache_directory:
+        if self.caching and cachedir:
+            # Reuse the cache of an earlier pipeline builder (e.g. of a resumed optimization)
+            self.cachedir = cachedir
+            if not os.path.exists(self.cachedir):
+                os.makedirs(self.cachedir)
+        elif self.caching and cache_directory:
             self.cachedir = tempfile.mkdtemp(dir=cache_directory, prefix="cache_")
             print(self.cachedir)
         elif self.caching:
@@ -23,6 +29,7 @@ class PipelineBuilder:
             print(self.cachedir)
 
         self.min_runtime_for_caching = min_runtime_for_caching
+        self.trace_allocations = trace_allocations
 
     def build_pipeline(self, config, run_instance=None):
         # pipeline_steps is a list of pipeline step names (e.g. feature_preprocessor, classifier)
@@ -51,8 +58,9 @@ class PipelineBuilder:
                                   cached_step_names=cached_step_names,
                                   memory=Memory(cachedir=self.cachedir, verbose=0),
                                   min_runtime_for_caching=self.min_runtime_for_caching,
-                                  run_instance=run_instance)
-        return OwnPipeline(concrete_steps)
+                                  run_instance=run_instance,
+                                  trace_allocations=self.trace_allocations)
+        return OwnPipeline(concrete_steps, trace_allocations=self.trace_allocations)
 
     def clean_cache(self):
         if self.caching == True and os.path.exists(self.cachedir):
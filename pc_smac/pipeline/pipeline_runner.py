@@ -1,6 +1,10 @@
 
+import copy
 import traceback
 import sys
+import multiprocessing
+
+from collections import OrderedDict
 
 import numpy as np
 import time
@@ -8,13 +12,21 @@ import time
 from sklearn.model_selection import StratifiedKFold
 from sklearn.metrics import accuracy_score
 
+from smac.tae.execute_ta_run import StatusType
+
 from pc_smac.pc_smac.utils.metrics import calculate_bac_score
 
 from pc_smac.pc_smac.pipeline.pipeline_builder import PipelineBuilder
+from pc_smac.pc_smac.pc_runhistory.caching_discount import CachingDiscountEngine
+from pc_smac.pc_smac.utils.config_digest import get_config_digest
+from pc_smac.pc_smac.utils.shared_data import SharedDataStore
+from pc_smac.pc_smac.utils.result_store import ResultStore, get_data_fingerprint
 
 class PipelineRunner(object):
 
-    def __init__(self, data, data_info, pipeline_space, runhistory, statistics, downsampling=None, num_cross_validation_folds=None):
+    def __init__(self, data, data_info, pipeline_space, runhistory, statistics, downsampling=None, num_cross_validation_folds=None,
+                 shared_data_directory=None, materialize_folds=False, trace_allocations=False,
+                 result_store_directory=None):
         # TODO Remove runhistory from arguments
         if downsampling:
             self.X_train = data["X_train"][:downsampling]
@@ -28,12 +40,35 @@ class PipelineRunner(object):
         self.runhistory = runhistory
         self.statistics = statistics
         self.pipeline_space = pipeline_space
-        self.pipeline_builder = PipelineBuilder(pipeline_space, caching=False, cache_directory=None)
+        self.trace_allocations = trace_allocations
+        self.pipeline_builder = PipelineBuilder(pipeline_space, caching=False, cache_directory=None,
+                                                trace_allocations=trace_allocations)
+        # The fitted pipeline prefix that the runs of the configurations with this prefix use, see fit_prefix
+        self.prefix_pipeline_builder = PipelineBuilder(pipeline_space, caching=False, cache_directory=None,
+                                                       trace_allocations=trace_allocations)
+        self.shared_prefix = None
         self.num_cross_validation_folds = num_cross_validation_folds if num_cross_validation_folds != None else 2
 
         self.cv = StratifiedKFold(n_splits=self.num_cross_validation_folds,
                                   shuffle=True,
                                   random_state=1)
+        # The folds are deterministic, so compute them only once instead of at every run
+        self.folds = list(self.cv.split(self.X_train, self.y_train))
+
+        # The runs are deterministic, so the results of configurations that were evaluated before on a fold of the
+        #   same data are reused
+        self.result_store = None
+        if result_store_directory != None:
+            fingerprint = get_data_fingerprint(self.X_train, self.y_train, data_info, self.num_cross_validation_folds,
+                                               downsampling=downsampling)
+            self.result_store = ResultStore(result_store_directory, fingerprint)
+
+        # Put the training data and the folds in memory-mapped files such that the processes that are forked for
+        #   every run attach to read-only views instead of copying the arrays
+        self.materialize_folds = materialize_folds
+        self.data_store = None
+        if shared_data_directory != None:
+            self._share_data(shared_data_directory)
 
     def run(self, config, instance, seed):
         """
@@ -68,22 +103,15 @@ class PipelineRunner(object):
         # start timer
         start_timer = time.time()
 
+        if self._has_shared_prefix(config, instance):
+            return self._run_with_shared_prefix(config, instance, start_timer)
+
         self.runtime_timing = {}
         additional_info = {}
 
         pipeline = self.pipeline_builder.build_pipeline(config)
 
-        for i, (train_split, test_split) in enumerate(self.cv.split(self.X_train, self.y_train)):
-            if i != int(instance):
-                continue
-            else:
-                break
-
-        X_train = self.X_train[train_split]
-        X_valid = self.X_train[test_split]
-
-        y_train = self.y_train[train_split]
-        y_valid = self.y_train[test_split]
+        X_train, X_valid, y_train, y_valid = self.get_fold(int(instance))
 
         try:
             # Fit pipeline
@@ -108,23 +136,156 @@ class PipelineRunner(object):
             # Display the *original* exception
             traceback.print_exception(*exc_info)
             del exc_info
+        except MemoryError:
+            self._add_memout_run(config, instance, pipeline, start_timer)
+            raise
 
         # Calculate score and total runtime
         runtime = time.time() - start_timer
         #print("cost: {}, time: {}".format(cost, runtime))
 
+        additional_info['pipeline_steps_resources'] = pipeline.pipeline_info.get_resources_flat()
+
         # Add information of this run to statistics
         run_information = {
             'instance': int(instance),
             'cost': cost,
             'runtime': runtime,
-            'pipeline_steps_timing': self.runtime_timing
+            'pipeline_steps_timing': self.runtime_timing,
+            'pipeline_steps_predict_timing': pipeline.pipeline_info.get_predict_timing_flat(),
+            'predict_time': pipeline.pipeline_info.get_total_predict_time(),
+            'pipeline_steps_resources': additional_info['pipeline_steps_resources']
         }
-        self.statistics.add_run(config.get_dictionary(), run_information, config_origin=config.origin)
+        self._log_run(config, run_information, additional_info)
+        self._memoize_result(config, instance, cost, runtime, additional_info, run_information)
 
         #print("stop tae_runner")
         return cost, additional_info
 
+    def fit_prefix(self, config, instance):
+        """
+        Fit the pipeline steps in front of the final estimator of the configuration on the training data of the fold
+        and transform the validation data. If the prefix is set as shared_prefix, the runs of the configurations with
+        the same prefix only fit and validate their final estimator on the transformed data.
+
+        Returns
+        -------
+        PipelinePrefix or None if the prefix could not be fitted
+
+        """
+        start_timer = time.time()
+        pipeline = self.prefix_pipeline_builder.build_pipeline(config)
+        X_train, X_valid, y_train, y_valid = self.get_fold(int(instance))
+        try:
+            Xt_train, _ = pipeline._fit(X_train, y_train)
+            Xt_valid = pipeline.transform_prefix(X_valid)
+        except ValueError as v:
+            traceback.print_exc()
+            return None
+        return PipelinePrefix(self.get_prefix_key(config), int(instance), Xt_train, Xt_valid, y_train, y_valid,
+                              pipeline.pipeline_info, time.time() - start_timer)
+
+    def get_prefix_key(self, config):
+        # All pipeline steps but the last one, the final estimator
+        estimator_step = self.pipeline_space.get_pipeline_step_names()[-1]
+        config_dict = config.get_dictionary()
+        return get_config_digest(dict([(hp_name, config_dict[hp_name]) for hp_name in config_dict
+                                       if hp_name.split(":")[0] != estimator_step]))
+
+    def get_memoized_result(self, config, instance, cutoff=None):
+        """
+        Looks up the recorded result of the run in the result store, if there is one. The lookup has to be done in
+        the process that dispatches the runs (e.g. by the worker pool or the target algorithm runner) before the run
+        is handed to another process, such that the results are read only once from the store.
+
+        The recorded status is replayed, but a recorded run that took longer than the cutoff of this run is a timeout.
+
+        Returns
+        -------
+        status, cost, runtime, additional_info of the recorded run or None if the run has to be executed
+
+        """
+        if self.result_store == None or instance == None:
+            return None
+        self.result_store.update()
+        result = self.result_store.get(config.get_dictionary(), instance)
+        if result == None:
+            return None
+
+        # Results that were recorded without their status only failed with the crash cost
+        if 'status' in result:
+            status = StatusType(result['status'])
+        else:
+            status = StatusType.CRASHED if result['cost'] == 1234567890 else StatusType.SUCCESS
+        cost = result['cost']
+        if cutoff != None and result['runtime'] > cutoff:
+            status, cost = StatusType.TIMEOUT, 1234567890
+
+        # The runhistory gets the runtime of the recorded run instead of the time of the lookup (see PCRunHistory.add)
+        additional_info = dict(result['additional_info'])
+        additional_info['memoized_runtime'] = result['runtime']
+        run_information = dict(result['run_information'])
+        run_information['memoized'] = True
+        if status != StatusType.SUCCESS:
+            run_information['cost'] = cost
+            run_information['status'] = status.name
+        self._log_run(config, run_information, additional_info)
+        return status, cost, result['runtime'], additional_info
+
+    def get_worker_state(self, token=None):
+        """
+        The state of this process that a forked worker of an EvaluationWorkerPool needs for a task: the start time of
+        the statistics, the cached configurations of the runhistory that the worker did not get yet and the shared
+        prefix (see fit_prefix) if the worker does not have it yet.
+
+        The cache hits and the number of evaluations in the run information of a worker only count the runs of the
+        worker process itself, as does the 'eval' index of its run records.
+
+        Parameters
+        ----------
+        token: tuple (number of cached configurations, key of the shared prefix) of the state that the worker already
+            got, None for a new worker
+
+        Returns
+        -------
+        state, token of the state
+
+        """
+        num_worker_cached_configurations, worker_prefix_key = token if token != None else (0, None)
+        ledger = self.runhistory.get_cached_configurations() if self.runhistory else None
+        cached_configurations = []
+        num_cached_configurations = 0
+        if ledger != None:
+            num_cached_configurations = len(ledger.digests)
+            cached_configurations = [(digest, ledger.configs[digest], ledger[digest])
+                                     for digest in ledger.digests[num_worker_cached_configurations:]]
+        state = {'start_time': self.statistics.start_time,
+                 'cached_configurations': cached_configurations}
+
+        prefix_key = (self.shared_prefix.key, self.shared_prefix.instance) if self.shared_prefix != None else None
+        if prefix_key != worker_prefix_key:
+            state['shared_prefix'] = self.shared_prefix
+        return state, (num_cached_configurations, prefix_key)
+
+    def set_worker_state(self, state):
+        self.statistics.start_time = state['start_time']
+        if self.runhistory:
+            ledger = self.runhistory.get_cached_configurations()
+            for digest, cached_config, runtime in state['cached_configurations']:
+                if digest not in ledger.configs:
+                    ledger._add(digest, cached_config, runtime, 0)
+        if 'shared_prefix' in state:
+            self.shared_prefix = state['shared_prefix']
+
+    def get_fold(self, instance):
+        if self.data_store != None and self.materialize_folds:
+            return tuple(self.data_store.get(name + "_" + str(instance))
+                         for name in ["X_train", "X_valid", "y_train", "y_valid"])
+
+        train_split, test_split = self.folds[instance]
+        return self.X_train[train_split], self.X_train[test_split], \
+               self.y_train[train_split], self.y_train[test_split]
+
     def add_runtime_timing(self, dct, timing):
         for key in timing.keys():
             if key in dct.keys():
@@ -135,20 +296,140 @@ class PipelineRunner(object):
     def update_statistics(self, statistics):
         self.statistics = statistics
 
+    def clean_shared_data(self):
+        if self.data_store != None:
+            self.data_store.clean()
+
+    #### Private methods ####
+
+    def _log_run(self, config, run_information, additional_info):
+        # The run is logged in the process that executes it, the optimizer gets the time it took with the result (see
+        #   OverheadRecorder.instrument_runhistory)
+        start_time = time.time()
+        self.statistics.add_run(config.get_dictionary(), run_information, config_origin=config.origin)
+        additional_info['statistics_logging_time'] = time.time() - start_time
+
+    def _memoize_result(self, config, instance, cost, runtime, additional_info, run_information):
+        # A run that raised a ValueError has the crash cost and is replayed as a crash. Timeouts and memouts are not
+        #   recorded, they depend on the limits of the run.
+        if self.result_store != None:
+            status = StatusType.CRASHED if cost == 1234567890 else StatusType.SUCCESS
+            self.result_store.add(config.get_dictionary(), instance, cost, runtime, additional_info, run_information,
+                                  status=status)
+
+    def _has_shared_prefix(self, config, instance):
+        return self.shared_prefix != None and self.shared_prefix.instance == int(instance) \
+               and self.shared_prefix.key == self.get_prefix_key(config)
+
+    def _run_with_shared_prefix(self, config, instance, start_timer):
+        prefix = self.shared_prefix
+        additional_info = {}
+
+        pipeline = self.prefix_pipeline_builder.build_pipeline(config)
+        # The timing and the resources of the prefix steps are the ones of the shared prefix
+        pipeline.pipeline_info = copy.deepcopy(prefix.pipeline_info)
+
+        try:
+            pipeline.fit_final_estimator(prefix.X_train, prefix.y_train)
+            y_pred = pipeline.predict_final_estimator(prefix.X_valid)
+            bac_score = calculate_bac_score(prefix.y_valid, y_pred, num_labels=self.data_info['label_num'],
+                                            task=self.data_info['task'])
+            cost = 1 - bac_score
+        except ValueError as v:
+            cost = 1234567890
+            traceback.print_exc()
+        except MemoryError:
+            self._add_memout_run(config, instance, pipeline, start_timer)
+            raise
+
+        runtime = time.time() - start_timer
+        additional_info['pipeline_steps_resources'] = pipeline.pipeline_info.get_resources_flat()
+
+        run_information = {
+            'instance': int(instance),
+            'cost': cost,
+            'runtime': runtime,
+            'prefix_runtime': prefix.runtime,
+            'shared_prefix': True,
+            'pipeline_steps_timing': pipeline.pipeline_info.get_timing_flat(),
+            'pipeline_steps_predict_timing': pipeline.pipeline_info.get_predict_timing_flat(),
+            'predict_time': pipeline.pipeline_info.get_total_predict_time(),
+            'pipeline_steps_resources': additional_info['pipeline_steps_resources']
+        }
+        self._log_run(config, run_information, additional_info)
+        # A later run of the configuration without the shared prefix has to fit the prefix too
+        self._memoize_result(config, instance, cost, runtime + prefix.runtime, additional_info, run_information)
+
+        return cost, additional_info
+
+    def _add_memout_run(self, config, instance, pipeline, start_timer):
+        # Record the steps that finished and the step that exceeded the memory limit before the run gets killed
+        run_information = {
+            'instance': int(instance),
+            'cost': 1234567890,
+            'runtime': time.time() - start_timer,
+            'status': 'MEMOUT',
+            'memout_step': pipeline.pipeline_info.get_running_step(),
+            'pipeline_steps_timing': pipeline.pipeline_info.get_timing_flat(),
+            'pipeline_steps_resources': pipeline.pipeline_info.get_resources_flat()
+        }
+        self.statistics.add_run(config.get_dictionary(), run_information, config_origin=config.origin)
+
+    def _share_data(self, shared_data_directory):
+        self.data_store = SharedDataStore(directory=shared_data_directory)
+        self.X_train = self.data_store.put("X_train", self.X_train)
+        self.y_train = self.data_store.put("y_train", self.y_train)
+
+        folds = []
+        for i, (train_split, test_split) in enumerate(self.folds):
+            folds.append((self.data_store.put("train_split_" + str(i), train_split),
+                          self.data_store.put("test_split_" + str(i), test_split)))
+            if self.materialize_folds:
+                # Store the data of every fold too, which costs disk space but avoids indexing the data at every run
+                self.data_store.put("X_train_" + str(i), self.X_train[train_split])
+                self.data_store.put("X_valid_" + str(i), self.X_train[test_split])
+                self.data_store.put("y_train_" + str(i), self.y_train[train_split])
+                self.data_store.put("y_valid_" + str(i), self.y_train[test_split])
+        self.folds = folds
+
 
 
 
 
+class PipelinePrefix(object):
+    """
+    The pipeline steps in front of the final estimator of a configuration, fitted on the training data of a fold,
+    with the transformed training and validation data of the fold (see PipelineRunner.fit_prefix)
+    """
+
+    def __init__(self, key, instance, X_train, X_valid, y_train, y_valid, pipeline_info, runtime):
+        self.key = key
+        self.instance = instance
+        self.X_train = X_train
+        self.X_valid = X_valid
+        self.y_train = y_train
+        self.y_valid = y_valid
+        self.pipeline_info = pipeline_info
+        self.runtime = runtime
+
+
 class CachedPipelineRunner(PipelineRunner):
 
     def __init__(self, data, data_info, pipeline_space, runhistory, statistics, cached_pipeline_steps, cache_directory=None,
-                 downsampling=None, num_cross_validation_folds=None):
+                 downsampling=None, num_cross_validation_folds=None, shared_data_directory=None, materialize_folds=False,
+                 trace_allocations=False, result_store_directory=None, cachedir=None):
 
         super(CachedPipelineRunner, self).__init__(data, data_info, pipeline_space, runhistory, statistics, downsampling=downsampling,
-                                                  num_cross_validation_folds=num_cross_validation_folds)
-
-        self.pipeline_builder = PipelineBuilder(pipeline_space, caching=True, cache_directory=cache_directory)
+                                                  num_cross_validation_folds=num_cross_validation_folds,
+                                                  shared_data_directory=shared_data_directory,
+                                                  materialize_folds=materialize_folds,
+                                                  trace_allocations=trace_allocations,
+                                                  result_store_directory=result_store_directory)
+
+        self.pipeline_builder = PipelineBuilder(pipeline_space, caching=True, cache_directory=cache_directory,
+                                                trace_allocations=trace_allocations, cachedir=cachedir)
         self.cached_pipeline_steps = cached_pipeline_steps
+        self.discount_engine = None
         self.cached_transformer_runtime_timing = {}
         self.cache_hits = {
             'total': 0,
@@ -162,6 +443,9 @@ class CachedPipelineRunner(PipelineRunner):
         # start timer
         start_timer = time.time()
 
+        if self._has_shared_prefix(config, instance):
+            return self._run_with_shared_prefix(config, instance, start_timer)
+
         self.runtime_timing = {}
         additional_info = {}
 
@@ -169,17 +453,7 @@ class CachedPipelineRunner(PipelineRunner):
 
         #print("Num cross validation folds: {}".format(self.num_cross_validation_folds))
 
-        for i, (train_split, test_split) in enumerate(self.cv.split(self.X_train, self.y_train)):
-            if i != int(instance):
-                continue
-            else:
-                break
-
-        X_train = self.X_train[train_split]
-        X_valid = self.X_train[test_split]
-
-        y_train = self.y_train[train_split]
-        y_valid = self.y_train[test_split]
+        X_train, X_valid, y_train, y_valid = self.get_fold(int(instance))
 
         try:
             # Fit pipeline
@@ -209,6 +483,9 @@ class CachedPipelineRunner(PipelineRunner):
             # Display the *original* exception
             traceback.print_exception(*exc_info)
             del exc_info
+        except MemoryError:
+            self._add_memout_run(config, instance, pipeline, start_timer)
+            raise
 
         # Update cache hits
         self.cache_hits['total'] += pipeline.pipeline_info.get_cache_hits()[0]
@@ -219,6 +496,7 @@ class CachedPipelineRunner(PipelineRunner):
         # if pipeline.pipeline_info.get_cache_hits()[1] == 0:
         t_rc = self._get_pipeline_steps_timing(self.cached_transformer_runtime_timing, config)
         additional_info['t_rc'] = t_rc
+        additional_info['pipeline_steps_resources'] = pipeline.pipeline_info.get_resources_flat()
 
         # Calculate score and total runtime
         runtime = time.time() - start_timer
@@ -238,11 +516,15 @@ class CachedPipelineRunner(PipelineRunner):
             'cost': cost,
             'runtime': runtime,
             'pipeline_steps_timing': self.runtime_timing,
+            'pipeline_steps_predict_timing': pipeline.pipeline_info.get_predict_timing_flat(),
+            'predict_time': pipeline.pipeline_info.get_total_predict_time(),
+            'pipeline_steps_resources': additional_info['pipeline_steps_resources'],
             'cache_hits': self.cache_hits['cache_hits'],
             'runtime_reduction_by_caching': runtime_reduction_by_caching_lst[0] if runtime_reduction_by_caching_lst != [] else 0,
             'total_evaluations': self.cache_hits['total']
         }
-        self.statistics.add_run(config.get_dictionary(), run_information, config_origin=config.origin)
+        self._log_run(config, run_information, additional_info)
+        self._memoize_result(config, instance, cost, runtime, additional_info, run_information)
 
         #print("stop cached tae_runner")
         return cost, additional_info
@@ -283,34 +565,18 @@ class CachedPipelineRunner(PipelineRunner):
         return t_rc
 
     def _compute_caching_discounts(self, configs, cached_configs):
-        runtime_discounts = []
-        for config in configs:
-            discount = 0
-            for cached_pipeline_part in self.cached_pipeline_steps:
-                cached_values = self._get_values(config.get_dictionary(), cached_pipeline_part)
-                hash_value = hash(frozenset(cached_values.items()))
-                if hash_value in cached_configs:
-                    discount += cached_configs[hash_value]
-                    #print("CACHING REDUCTION: {}, {}".format(hash_value, discount))
-                    #print("Config origin: {}".format(config.origin))
-                    # print("Config: {}".format(config))
-            runtime_discounts.append(discount)
-        return runtime_discounts
-
-    def _get_values(self, config_dict, pipeline_steps):
-        value_dict = {}
-        for step_name in pipeline_steps:
-            for hp_name in config_dict:
-                splt_hp_name = hp_name.split(":")
-                if splt_hp_name[0] == step_name:
-                    value_dict[hp_name] = config_dict[hp_name]
-        return value_dict
+        if configs == []:
+            return []
+        if self.discount_engine == None:
+            self.discount_engine = CachingDiscountEngine(configs[0].configuration_space, self.cached_pipeline_steps)
+        X = np.array([config.get_array() for config in configs])
+        return list(self.discount_engine.compute_discounts(X, cached_configs))
 
 
 
 class PipelineTester(object):
 
-    def __init__(self, data, data_info, pipeline_space, downsampling=None):
+    def __init__(self, data, data_info, pipeline_space, downsampling=None, cache_directory=None, cachedir=None):
         if downsampling:
             self.X_train = data["X_train"][:downsampling]
             self.y_train = data["y_train"][:downsampling]
@@ -323,10 +589,23 @@ class PipelineTester(object):
             self.y_test = data["y_test"]
 
         self.data_info = data_info
-        self.pipeline_builder = PipelineBuilder(pipeline_space, caching=False, cache_directory=None)
+        self.pipeline_space = pipeline_space
+        # If a cache directory is given, the fitted pipeline prefixes are cached and reused by the other
+        #   configurations that share the same prefix. If the cache of the optimization is given (cachedir), the
+        #   prefixes are fitted in that cache instead of a new one, which is then left in place by clean_cache
+        self.caching = cache_directory != None or cachedir != None
+        self.owns_cache = cachedir == None
+        self.pipeline_builder = PipelineBuilder(pipeline_space, caching=self.caching, cache_directory=cache_directory,
+                                                cachedir=cachedir)
+        # The cache ignores the data, so the run instance identifies the full (downsampled) training set, next to
+        #   the folds of the pipeline runner
+        self.run_instance = "test" if not downsampling else "test_" + str(downsampling)
 
     def run(self, config):
-        pipeline = self.pipeline_builder.build_pipeline(config)
+        if self.caching:
+            pipeline = self.pipeline_builder.build_pipeline(config, run_instance=self.run_instance)
+        else:
+            pipeline = self.pipeline_builder.build_pipeline(config)
 
         try:
             pipeline.fit(self.X_train, self.y_train)
@@ -343,4 +622,100 @@ class PipelineTester(object):
         score = self.run(config)
         return 1 - score
 
+    def get_errors(self, configs, num_workers=1):
+        """
+
+        Parameters
+        ----------
+        configs:        list of configurations, e.g. the incumbents of a trajectory
+        num_workers:    number of processes that test the configurations in parallel
+
+        Returns
+        -------
+        List with the test error of every configuration. Identical configurations are tested only once and
+            configurations that share a part of their pipeline prefix are tested by the same process, one after the
+            other and ordered by their prefix, such that they can reuse the cached prefix steps.
+
+        """
+        unique_configs = OrderedDict()
+        for config in configs:
+            key = self._get_config_key(config.get_dictionary())
+            if key not in unique_configs:
+                unique_configs[key] = config
+        groups = self._get_groups(unique_configs, num_workers)
+
+        errors = {}
+        if num_workers > 1 and len(groups) > 1:
+            # The tester is passed to every process by the initializer, which works with any start method
+            pool = multiprocessing.Pool(processes=min(num_workers, len(groups)),
+                                        initializer=_set_pipeline_tester, initargs=(self,))
+            try:
+                results = [(group, pool.apply_async(_get_errors_of_group, ([unique_configs[key] for key in group],)))
+                           for group in groups]
+                for group, result in results:
+                    errors.update(zip(group, result.get()))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for group in groups:
+                errors.update(zip(group, _get_errors_of_group([unique_configs[key] for key in group], tester=self)))
+
+        return [errors[self._get_config_key(config.get_dictionary())] for config in configs]
+
+    def clean_cache(self):
+        if self.caching and self.owns_cache:
+            self.pipeline_builder.clean_cache()
+
+    #### Private methods ####
+
+    def _get_config_key(self, config_dict):
+        return get_config_digest(config_dict)
+
+    def _get_prefix_keys(self, config_dict):
+        # Keys of the prefixes up to every cached step, from the shortest to the full prefix
+        cached_step_names = self.pipeline_space.get_cached_pipeline_step_names()
+        if cached_step_names == []:
+            return [self._get_config_key(config_dict)]
+        prefix_keys = []
+        for cached_step in cached_step_names:
+            prefix = {}
+            for hp_name in config_dict:
+                step_name = hp_name.split(":")[0]
+                if step_name == cached_step or self.pipeline_space.is_step_infront_of_step(step_name, cached_step):
+                    prefix[hp_name] = config_dict[hp_name]
+            prefix_keys.append(self._get_config_key(prefix))
+        return prefix_keys
+
+    def _get_groups(self, unique_configs, num_workers):
+        """
+        Groups the configurations by their prefix up to the first cached step at which there are at least num_workers
+            groups (or by their full prefix if there is no such step), such that configurations that share only a part
+            of their prefix are in the same group as long as there are enough groups for the processes. The
+            configurations of a group are ordered by their prefixes.
+        """
+        prefix_keys = OrderedDict((key, self._get_prefix_keys(config.get_dictionary()))
+                                  for key, config in unique_configs.items())
+        num_prefix_steps = len(next(iter(prefix_keys.values()))) if prefix_keys else 0
+        depth = num_prefix_steps
+        for d in range(1, num_prefix_steps + 1):
+            if len(set(keys[d - 1] for keys in prefix_keys.values())) >= num_workers:
+                depth = d
+                break
+
+        groups = OrderedDict()
+        for key, keys in prefix_keys.items():
+            groups.setdefault(keys[depth - 1], []).append(key)
+        return [sorted(group, key=lambda key: prefix_keys[key]) for group in groups.values()]
+
+
+# Tester of a process of PipelineTester.get_errors, set by the initializer of the process
+_PIPELINE_TESTER = None
+
+def _set_pipeline_tester(tester):
+    global _PIPELINE_TESTER
+    _PIPELINE_TESTER = tester
 
+def _get_errors_of_group(configs, tester=None):
+    tester = _PIPELINE_TESTER if tester == None else tester
+    return [tester.get_error(config) for config in configs]
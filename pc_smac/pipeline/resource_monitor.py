@@ -0,0 +1,186 @@
+
+import os
+import sys
+import time
+import resource
+import threading
+import tracemalloc
+
+import numpy as np
+import scipy.sparse
+
+
+# ru_maxrss is expressed in kilobytes on Linux and in bytes on Mac OS X
+RU_MAXRSS_TO_MB = 1. / (1024 * 1024) if sys.platform == "darwin" else 1. / 1024
+PAGE_SIZE_IN_MB = os.sysconf("SC_PAGE_SIZE") / (1024. * 1024.) if hasattr(os, 'sysconf') else None
+
+
+class StepResourceMonitor(object):
+    """
+    Measures the resources that one pipeline step uses: wallclock time, cpu user and system time, the resident set
+    size after the step and its change during the step, the peak resident set size during the step, the peak of the
+    allocated bytes (only if trace_allocations is enabled, because tracemalloc slows down allocations) and the shape,
+    dtype and number of non-zeros of the input and output data (only if describe_data is enabled, because counting
+    the non-zeros scans the data).
+
+    The peak resident set size of getrusage is the peak over the lifetime of the process, so the peak of a step is
+    sampled by an RSSSampler instead, by default the one of the process. tracemalloc is only on during the step if
+    the monitor started it.
+    """
+
+    def __init__(self, trace_allocations=False, describe_data=False, sampler=None):
+        self.trace_allocations = trace_allocations
+        self.describe_data = describe_data
+        self.sampler = sampler if sampler is not None else get_rss_sampler()
+        self.start_time = None
+        self.start_usage = None
+        self.start_rss = None
+        self.input_description = None
+        self._started_tracing = False
+
+    def start(self, X):
+        if self.trace_allocations:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            self._reset_allocation_peak()
+        self.input_description = describe_data(X) if self.describe_data else None
+        self.start_usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.start_rss = self.sampler.begin()
+        self.start_time = time.time()
+
+    def stop(self, Xt=None):
+        wallclock_time = time.time() - self.start_time
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        rss, peak_rss = self.sampler.end()
+
+        resources = {
+            'wallclock_time': wallclock_time,
+            'cpu_user_time': usage.ru_utime - self.start_usage.ru_utime,
+            'cpu_system_time': usage.ru_stime - self.start_usage.ru_stime,
+            'rss_mb': rss,
+            'rss_delta_mb': rss - self.start_rss,
+            'peak_rss_mb': peak_rss,
+            'peak_rss_delta_mb': peak_rss - self.start_rss
+        }
+        if self.trace_allocations:
+            resources['peak_allocated_mb'] = tracemalloc.get_traced_memory()[1] / (1024. * 1024.)
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        if self.describe_data:
+            resources['input'] = self.input_description
+            if Xt is not None:
+                resources['output'] = describe_data(Xt)
+        return resources
+
+    #### Internal methods ####
+
+    def _reset_allocation_peak(self):
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        else:
+            # Before python 3.9 the peak can only be reset by clearing the traces
+            tracemalloc.clear_traces()
+
+
+class RSSSampler(object):
+    """
+    Samples the resident set size of the process every sampling_interval seconds while a step is measured (between
+    begin and end). The thread is started at the first step and waits without sampling between the steps, so one
+    sampler serves all the steps of all the runs of a process. A temporary allocation that lives shorter than the
+    interval can be missed. Where /proc/self/statm is not available, the resident set size is the lifetime peak.
+
+    The steps of a process are measured one at a time: the peak of a step that is measured while another one is, is
+    the peak since the start of the other one.
+    """
+
+    def __init__(self, sampling_interval=0.01):
+        self.sampling_interval = sampling_interval
+        self.peak_rss = None
+        self.num_active = 0
+        self._pid = None
+        self._lock = None
+        self._active = None
+        self._thread = None
+
+    def begin(self):
+        """Starts sampling and returns the current resident set size"""
+        rss = get_rss_mb()
+        self._start_thread()
+        with self._lock:
+            self.peak_rss = rss if self.num_active == 0 else max(self.peak_rss, rss)
+            self.num_active += 1
+            self._active.set()
+        return rss
+
+    def end(self):
+        """Stops sampling and returns the current resident set size and its peak since begin"""
+        rss = get_rss_mb()
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            self.num_active -= 1
+            if self.num_active == 0:
+                self._active.clear()
+            return rss, self.peak_rss
+
+    def is_sampling(self):
+        return self._active is not None and self._active.is_set()
+
+    #### Internal methods ####
+
+    def _start_thread(self):
+        # A forked worker does not inherit the thread of its parent, it starts its own
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.num_active = 0
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = threading.Thread(target=self._sample, args=(self._lock, self._active))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _sample(self, lock, active):
+        while True:
+            active.wait()
+            time.sleep(self.sampling_interval)
+            rss = get_rss_mb()
+            with lock:
+                if self.num_active > 0:
+                    self.peak_rss = max(self.peak_rss, rss)
+
+
+_RSS_SAMPLER = None
+
+
+def get_rss_sampler():
+    """The RSSSampler of this process"""
+    global _RSS_SAMPLER
+    if _RSS_SAMPLER is None:
+        _RSS_SAMPLER = RSSSampler()
+    return _RSS_SAMPLER
+
+
+def get_rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * PAGE_SIZE_IN_MB
+    except (IOError, OSError, IndexError, ValueError, TypeError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RU_MAXRSS_TO_MB
+
+
+def describe_data(X):
+    """Shape, dtype and number of non-zeros of the data"""
+    if not hasattr(X, 'shape'):
+        return {}
+    description = {
+        'shape': list(X.shape),
+        'dtype': str(X.dtype)
+    }
+    if scipy.sparse.issparse(X):
+        description['nnz'] = int(X.nnz)
+    else:
+        description['nnz'] = int(np.count_nonzero(X))
+    return description
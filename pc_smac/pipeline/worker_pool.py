@@ -0,0 +1,337 @@
+
+import atexit
+import importlib
+import inspect
+import logging
+import math
+import multiprocessing
+import resource
+import signal
+import time
+import traceback
+
+from multiprocessing.connection import wait
+
+from smac.tae.execute_ta_run import StatusType
+from smac.tae.execute_func import ExecuteTAFuncDict
+
+
+# Modules that the nodes of the pipeline space import lazily inside their fit methods. The pool imports them once
+#   before it forks the workers, which inherit them, instead of at every run.
+PRELOADED_MODULES = ["sklearn.cluster",
+                     "sklearn.decomposition",
+                     "sklearn.discriminant_analysis",
+                     "sklearn.ensemble",
+                     "sklearn.feature_selection",
+                     "sklearn.kernel_approximation",
+                     "sklearn.linear_model",
+                     "sklearn.multiclass",
+                     "sklearn.naive_bayes",
+                     "sklearn.neighbors",
+                     "sklearn.preprocessing",
+                     "sklearn.svm",
+                     "sklearn.tree",
+                     "pc_smac.pc_smac.pipeline_space.pipeline_step"]
+
+
+class WorkerTimeoutException(Exception):
+    pass
+
+
+class EvaluationWorkerPool(object):
+    """
+    Pool of long-lived worker processes that evaluate the target algorithm. The workers are forked once, inherit the
+    heavy modules that the pool imports before it forks them and enforce the memory limit (rlimit) and the wall time limit (watchdog timer) of every task
+    themselves. A worker is only replaced after a limit violation, a crash of the process or after a maximum number
+    of tasks.
+
+    The workers are forked copies of this process, so the state that changes after the fork (e.g. the start time of
+    the statistics or the cached configurations of the runhistory) is stale in the workers. If a state owner is given
+    (e.g. the PipelineRunner of ta), its get_worker_state(token) is sent with every task and applied in the worker
+    with set_worker_state(state), see PipelineRunner.get_worker_state. A task of which the state owner has a
+    recorded result (get_memoized_result) is finished at once without a worker.
+    """
+
+    def __init__(self, ta, memory_limit=None, num_workers=1, max_tasks_per_worker=100, grace_period=5,
+                 preload_modules=PRELOADED_MODULES, state_owner=None):
+        self.ta = ta
+        self.state_owner = state_owner
+        self.memory_limit = memory_limit
+        self.num_workers = num_workers
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.grace_period = grace_period
+        self.preload_modules = preload_modules
+        self.logger = logging.getLogger("EvaluationWorkerPool")
+
+        signature = inspect.signature(self.ta).parameters
+        self._accepts_seed = len(signature) > 1
+        self._accepts_instance = len(signature) > 2
+
+        # Imported in this process, such that every worker (and replacement) inherits the modules with the fork
+        _import_modules(preload_modules)
+
+        self.context = multiprocessing.get_context("fork")
+        self.task_counter = 0
+        self.finished = {}
+        self.workers = [self._start_worker() for _ in range(num_workers)]
+
+        atexit.register(self.shutdown)
+
+    def run(self, config, instance=None, cutoff=None, seed=12345):
+        """
+        Evaluate a configuration and wait for the result
+
+        Returns
+        -------
+        status, cost, runtime, additional_info (see RandomSearch.run_with_limits)
+
+        """
+        task_id = self.submit(config, instance=instance, cutoff=cutoff, seed=seed)
+        while task_id not in self.finished:
+            self._collect(timeout=None)
+        return self.finished.pop(task_id)
+
+    def submit(self, config, instance=None, cutoff=None, seed=12345):
+        """
+        Start the evaluation of a configuration on an idle worker without waiting for the result
+
+        Returns
+        -------
+        The id of the task, which is used to retrieve the result with get_results
+
+        """
+        if self.state_owner != None:
+            memoized_result = self.state_owner.get_memoized_result(config, instance, cutoff=cutoff)
+            if memoized_result != None:
+                self.task_counter += 1
+                self.finished[self.task_counter] = memoized_result
+                return self.task_counter
+
+        idle_workers = [worker for worker in self.workers if worker.task == None]
+        if idle_workers == []:
+            raise ValueError("There is no idle worker to submit the task to!")
+        worker = idle_workers[0]
+        if worker.nb_tasks >= self.max_tasks_per_worker or not worker.process.is_alive():
+            worker = self._replace_worker(worker)
+
+        kwargs = {}
+        if self._accepts_seed:
+            kwargs['seed'] = seed
+        if self._accepts_instance:
+            kwargs['instance'] = instance
+
+        state = None
+        if self.state_owner != None:
+            state, worker.state_token = self.state_owner.get_worker_state(worker.state_token)
+
+        self.task_counter += 1
+        worker.connection.send((config, kwargs, cutoff, state))
+        worker.task = (self.task_counter, time.time(), cutoff)
+        worker.nb_tasks += 1
+        return self.task_counter
+
+    def get_results(self, timeout=None):
+        """
+        Wait until at least one submitted task is finished or until the timeout expires
+
+        Returns
+        -------
+        List of tuples (task id, (status, cost, runtime, additional_info))
+
+        """
+        if self.finished == {} and self.get_nb_busy_workers() > 0:
+            self._collect(timeout=timeout)
+        results = list(self.finished.items())
+        self.finished = {}
+        return results
+
+    def has_idle_worker(self):
+        return self.get_nb_busy_workers() < len(self.workers)
+
+    def get_nb_busy_workers(self):
+        return len([worker for worker in self.workers if worker.task != None])
+
+    def cancel_all(self):
+        """Kill all busy workers, the results of their tasks are discarded"""
+        for worker in self.workers:
+            if worker.task != None:
+                self._replace_worker(worker)
+
+    def shutdown(self):
+        for worker in self.workers:
+            if worker.task == None and worker.process.is_alive():
+                try:
+                    worker.connection.send(None)
+                except (BrokenPipeError, EOFError):
+                    pass
+            else:
+                worker.process.terminate()
+        for worker in self.workers:
+            worker.process.join(timeout=self.grace_period)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self.workers = []
+
+    #### Internal methods ####
+
+    def _start_worker(self):
+        parent_connection, child_connection = self.context.Pipe()
+        # The workers are not daemonic such that the pipelines can still start processes themselves (e.g. n_jobs)
+        process = self.context.Process(target=_worker_loop,
+                                       args=(self.ta, child_connection, self.memory_limit, self.state_owner))
+        process.start()
+        child_connection.close()
+        return _Worker(process, parent_connection)
+
+    def _replace_worker(self, worker):
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join()
+        worker.connection.close()
+        new_worker = self._start_worker()
+        self.workers[self.workers.index(worker)] = new_worker
+        return new_worker
+
+    def _collect(self, timeout):
+        busy_workers = [worker for worker in self.workers if worker.task != None]
+        if busy_workers == []:
+            return
+
+        # Kill a worker if its watchdog did not manage to stop the task (e.g. stuck in C code)
+        deadlines = [start_time + cutoff + self.grace_period for _, start_time, cutoff in
+                     [worker.task for worker in busy_workers] if cutoff != None]
+        if deadlines != []:
+            time_to_deadline = max(0, min(deadlines) - time.time())
+            timeout = time_to_deadline if timeout == None else min(timeout, time_to_deadline)
+
+        ready_connections = wait([worker.connection for worker in busy_workers], timeout=timeout)
+
+        for worker in busy_workers:
+            task_id, start_time, cutoff = worker.task
+            if worker.connection in ready_connections:
+                try:
+                    status, rval, runtime = worker.connection.recv()
+                    # The worker stops itself after a limit violation
+                    replace = status in [StatusType.TIMEOUT, StatusType.MEMOUT]
+                except EOFError:
+                    # The process died, e.g. killed by the kernel because it used too much memory
+                    worker.process.join()
+                    status = StatusType.MEMOUT if worker.process.exitcode == -signal.SIGKILL else StatusType.CRASHED
+                    rval, runtime, replace = None, time.time() - start_time, True
+            elif cutoff != None and time.time() > start_time + cutoff + self.grace_period:
+                status, rval, runtime, replace = StatusType.TIMEOUT, None, time.time() - start_time, True
+            else:
+                continue
+
+            worker.task = None
+            if replace:
+                self.logger.debug("Replace worker after task %d ended with status %s" % (task_id, status))
+                self._replace_worker(worker)
+            self.finished[task_id] = self._get_result(status, rval, runtime)
+
+    def _get_result(self, status, rval, runtime):
+        if isinstance(rval, tuple):
+            result = rval[0]
+            additional_run_info = rval[1]
+        else:
+            result = rval
+            additional_run_info = {}
+
+        if status == StatusType.SUCCESS and result is not None:
+            cost = result
+        else:
+            if status == StatusType.SUCCESS:
+                status = StatusType.CRASHED
+            cost = 1234567890
+
+        return status, cost, float(runtime), additional_run_info
+
+
+class _Worker(object):
+
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.nb_tasks = 0
+        # Token of the state that the worker got, see EvaluationWorkerPool.state_owner
+        self.state_token = None
+        # Tuple (task id, start time, cutoff) of the task the worker is busy with
+        self.task = None
+
+
+def _raise_timeout(signum, frame):
+    raise WorkerTimeoutException()
+
+
+def _import_modules(modules):
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def _worker_loop(ta, connection, memory_limit, state_owner):
+    if memory_limit:
+        mem_in_b = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (mem_in_b, mem_in_b))
+    signal.signal(signal.SIGALRM, _raise_timeout)
+
+    while True:
+        task = connection.recv()
+        if task == None:
+            break
+        config, kwargs, cutoff, state = task
+        if state != None:
+            state_owner.set_worker_state(state)
+
+        start_time = time.time()
+        rval = None
+        if cutoff != None:
+            signal.setitimer(signal.ITIMER_REAL, cutoff)
+        try:
+            rval = ta(config, **kwargs)
+            status = StatusType.SUCCESS
+        except WorkerTimeoutException:
+            status = StatusType.TIMEOUT
+        except MemoryError:
+            status = StatusType.MEMOUT
+        except Exception:
+            traceback.print_exc()
+            status = StatusType.CRASHED
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        runtime = time.time() - start_time
+
+        # Report the violation and stop, the pool replaces this worker by a fresh one
+        if status in [StatusType.TIMEOUT, StatusType.MEMOUT]:
+            connection.send((status, None, runtime))
+            break
+        connection.send((status, rval, runtime))
+
+    connection.close()
+
+
+class ExecuteTAFuncWithWorkerPool(ExecuteTAFuncDict):
+    """
+    Executes the target algorithm function in an EvaluationWorkerPool instead of a new pynisher process per run
+    """
+
+    def __init__(self, ta, worker_pool, stats=None, runhistory=None, run_obj="quality", memory_limit=None):
+        super(ExecuteTAFuncWithWorkerPool, self).__init__(ta=ta,
+                                                          stats=stats,
+                                                          runhistory=runhistory,
+                                                          run_obj=run_obj,
+                                                          memory_limit=memory_limit)
+        self.worker_pool = worker_pool
+
+    def run(self, config, instance=None, cutoff=None, seed=12345, instance_specific="0"):
+        if cutoff != None:
+            cutoff = int(math.ceil(cutoff))
+        status, cost, runtime, additional_run_info = self.worker_pool.run(config,
+                                                                          instance=instance,
+                                                                          cutoff=cutoff,
+                                                                          seed=seed)
+        if self.run_obj == "runtime":
+            cost = runtime
+        return status, cost, runtime, additional_run_info
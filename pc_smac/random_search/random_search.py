@@ -1,15 +1,19 @@
 
 import inspect
 import logging
+import math
 import pynisher
 
 import random
 import numpy as np
 
-from ConfigSpace.configuration_space import Configuration
+from collections import OrderedDict
 
 from smac.tae.execute_ta_run import StatusType
 
+from pc_smac.pc_smac.pipeline.worker_pool import EvaluationWorkerPool
+from pc_smac.pc_smac.random_search.recombination import ConfigurationRecombiner
+
 class RandomSearch(object):
 
     def __init__(self,
@@ -17,14 +21,32 @@ class RandomSearch(object):
                  pipeline_runner,
                  wallclock_limit,
                  memory_limit,
-                 statistics):
+                 statistics,
+                 worker_pool=None,
+                 prefix_sharing=False,
+                 num_batch_workers=1,
+                 max_shared_prefixes=5):
         self.config_space = config_space
         self.pipeline_runner = pipeline_runner
         self.wallclock_limit = wallclock_limit
         self.memory_limit = memory_limit
         self.statistics = statistics
+        # EvaluationWorkerPool that replaces the pynisher process per run
+        self.worker_pool = worker_pool
+
+        # Batches of configurations that share their pipeline prefix fit the prefix only once, see run_batch_with_limits
+        self.prefix_sharing = prefix_sharing
+        self.num_batch_workers = num_batch_workers
+        self.max_shared_prefixes = max_shared_prefixes
+        self.shared_prefixes = OrderedDict()
 
         self.ta = self.pipeline_runner.run
+        if self.worker_pool == None and prefix_sharing and num_batch_workers > 1:
+            # The workers get the shared prefix with their next task, see PipelineRunner.get_worker_state
+            self.worker_pool = EvaluationWorkerPool(ta=self.ta,
+                                                    memory_limit=memory_limit,
+                                                    num_workers=num_batch_workers,
+                                                    state_owner=self.pipeline_runner)
 
         signature = inspect.signature(self.ta).parameters
         self._accepts_seed = len(signature) > 1
@@ -56,6 +78,127 @@ class RandomSearch(object):
                         instance=None,
                         cutoff=None,
                         seed=12345):
+        if self.worker_pool != None:
+            return self.worker_pool.run(config, instance=instance, cutoff=cutoff, seed=seed)
+        # The worker pool looks the result up itself
+        memoized_result = self.pipeline_runner.get_memoized_result(config, instance, cutoff=cutoff)
+        if memoized_result != None:
+            return memoized_result
+        return self._run_with_pynisher(config, instance=instance, cutoff=cutoff, seed=seed)
+
+    def run_batch_with_limits(self,
+                              configs,
+                              instance=None,
+                              cutoff=None,
+                              seed=12345):
+        """
+        Evaluate configurations of which many share their pipeline prefix (all steps in front of the final estimator):
+        the prefix is fitted once (see PipelineRunner.fit_prefix) and only the final estimators are fitted on the
+        transformed data, by the workers of the worker pool (num_batch_workers workers if the random search builds
+        the pool) or else by a pynisher process per configuration. The cutoff and the memory limit hold for every
+        configuration, the time of fitting the prefix counts for each configuration with the prefix: a run of which
+        the total time exceeds the cutoff is a timeout.
+
+        The fitted prefixes of the last max_shared_prefixes batches are kept, such that a later batch with the same
+        prefix does not fit it again. The prefix is fitted in a pynisher process to enforce the limits, so its
+        transformed training and validation data are pickled back to this process once. The pynisher processes of
+        the configurations inherit it with the fork, without a copy, but every worker of a worker pool gets a pickled
+        copy with its first task of the prefix (see PipelineRunner.get_worker_state). Sharing the prefix therefore
+        only pays off if fitting the prefix takes longer than copying its output, and the kept prefixes hold
+        max_shared_prefixes copies of the transformed data in memory.
+
+        Configurations with a recorded result (see PipelineRunner.get_memoized_result) are not run, and if all
+        configurations of a prefix have one, the prefix is not fitted.
+
+        Returns
+        -------
+        List with status, cost, runtime, additional_info of every configuration (see run_with_limits)
+
+        """
+        groups = OrderedDict()
+        for idx, config in enumerate(configs):
+            groups.setdefault(self.pipeline_runner.get_prefix_key(config), []).append(idx)
+
+        results = [None] * len(configs)
+        for indices in groups.values():
+            group = [configs[idx] for idx in indices]
+            for idx, result in zip(indices, self._run_group_with_limits(group, instance, cutoff, seed)):
+                results[idx] = result
+        return results
+
+    #### Internal methods ####
+
+    def _run_group_with_limits(self, configs, instance, cutoff, seed):
+        # The recorded results are replayed with the cutoff of the whole run, not the one that is left after the prefix
+        group_results = [self.pipeline_runner.get_memoized_result(config, instance, cutoff=cutoff)
+                         for config in configs]
+        pending = [idx for idx, result in enumerate(group_results) if result == None]
+        if pending != []:
+            results = self._run_with_shared_prefix([configs[idx] for idx in pending], instance, cutoff, seed)
+            for idx, result in zip(pending, results):
+                group_results[idx] = result
+        return group_results
+
+    def _run_with_shared_prefix(self, configs, instance, cutoff, seed):
+        prefix = self._get_shared_prefix(configs[0], instance, cutoff)
+        if prefix == None:
+            # Every configuration reports its own failure
+            return [self.run_with_limits(config, instance=instance, cutoff=cutoff, seed=seed) for config in configs]
+
+        # The forked processes of the runs inherit the fitted prefix
+        prefix_cutoff = None if cutoff == None else max(1, int(math.ceil(cutoff - prefix.runtime)))
+        self.pipeline_runner.shared_prefix = prefix
+        try:
+            if self.worker_pool != None:
+                results = self._run_group_in_pool(configs, instance, prefix_cutoff, seed)
+            else:
+                results = [self._run_with_pynisher(config, instance=instance, cutoff=prefix_cutoff, seed=seed)
+                           for config in configs]
+        finally:
+            self.pipeline_runner.shared_prefix = None
+
+        group_results = []
+        for status, cost, runtime, additional_info in results:
+            # A result that was recorded in the meantime already contains the time of the prefix
+            if 'memoized_runtime' not in additional_info:
+                runtime += prefix.runtime
+            if cutoff != None and runtime > cutoff and status == StatusType.SUCCESS:
+                status, cost = StatusType.TIMEOUT, 1234567890
+            group_results.append((status, cost, runtime, additional_info))
+        return group_results
+
+    def _run_group_in_pool(self, configs, instance, cutoff, seed):
+        results = {}
+        pending = list(enumerate(configs))
+        tasks = {}
+        while pending != [] or tasks != {}:
+            while pending != [] and self.worker_pool.has_idle_worker():
+                idx, config = pending.pop(0)
+                tasks[self.worker_pool.submit(config, instance=instance, cutoff=cutoff, seed=seed)] = idx
+            for task_id, result in self.worker_pool.get_results():
+                results[tasks.pop(task_id)] = result
+        return [results[idx] for idx in range(len(configs))]
+
+    def _get_shared_prefix(self, config, instance, cutoff):
+        key = (self.pipeline_runner.get_prefix_key(config), instance)
+        if key in self.shared_prefixes:
+            self.shared_prefixes.move_to_end(key)
+            return self.shared_prefixes[key]
+
+        arguments = {'logger': logging.getLogger("pynisher"),
+                     'wall_time_in_s': cutoff,
+                     'mem_in_mb': self.memory_limit}
+        obj = pynisher.enforce_limits(**arguments)(self.pipeline_runner.fit_prefix)
+        prefix = obj(config, instance)
+        if obj.exit_status != 0 or prefix is None:
+            return None
+
+        self.shared_prefixes[key] = prefix
+        while len(self.shared_prefixes) > self.max_shared_prefixes:
+            self.shared_prefixes.popitem(last=False)
+        return prefix
+
+    def _run_with_pynisher(self, config, instance=None, cutoff=None, seed=12345):
         arguments = {'logger': logging.getLogger("pynisher"),
                      'wall_time_in_s': cutoff,
                      'mem_in_mb': self.memory_limit}
@@ -94,6 +237,201 @@ class RandomSearch(object):
 
         return status, cost, runtime, additional_run_info
 
+
+class ParallelRandomSearch(RandomSearch):
+    """
+    Random search that keeps all workers of an EvaluationWorkerPool busy with random configurations. The incumbent
+    and the statistics are updated in this process as soon as a result arrives. The per-run cutoff is cut to the
+    remaining wallclock budget and the runs that are still busy when the budget is exhausted are cancelled, their
+    results are discarded.
+    """
+
+    def __init__(self,
+                 config_space,
+                 pipeline_runner,
+                 wallclock_limit,
+                 memory_limit,
+                 statistics,
+                 num_workers=2,
+                 max_tasks_per_worker=100,
+                 worker_pool=None):
+        super(ParallelRandomSearch, self).__init__(config_space=config_space,
+                                                   pipeline_runner=pipeline_runner,
+                                                   wallclock_limit=wallclock_limit,
+                                                   memory_limit=memory_limit,
+                                                   statistics=statistics,
+                                                   worker_pool=worker_pool)
+        if self.worker_pool == None:
+            self.worker_pool = EvaluationWorkerPool(ta=self.ta,
+                                                    memory_limit=memory_limit,
+                                                    num_workers=num_workers,
+                                                    max_tasks_per_worker=max_tasks_per_worker,
+                                                    state_owner=self.pipeline_runner)
+
+    def run(self, cutoff):
+
+        start_time = self.statistics.start_timer()
+
+        incumbent = None
+        incumbent_cost = None
+        tasks = {}
+        while not(self.statistics.is_budget_exhausted()):
+            while self.worker_pool.has_idle_worker() and \
+                    not(self.statistics.is_budget_exhausted(num_pending_runs=len(tasks))):
+                config = self.config_space.sample_configuration()
+                task_id = self.worker_pool.submit(config, instance=1, cutoff=self._get_cutoff(cutoff), seed=None)
+                tasks[task_id] = config
+            if tasks == {}:
+                break
+
+            for task_id, (_, cost, _, _) in self.worker_pool.get_results(timeout=self._get_remaining_time()):
+                config = tasks.pop(task_id)
+                self.statistics.add_run_nb()
+
+                if incumbent == None or cost < incumbent_cost:
+                    incumbent = config
+                    incumbent_cost = cost
+                    self.statistics.add_new_incumbent(incumbent.get_dictionary(), {'cost': incumbent_cost})
+
+        if tasks != {}:
+            logging.getLogger("ParallelRandomSearch").debug("Cancel %d runs at the end of the budget" % len(tasks))
+            self.worker_pool.cancel_all()
+
+        return incumbent
+
+    #### Internal methods ####
+
+    def _get_remaining_time(self):
+        if not self.statistics.total_runtime:
+            return None
+        return max(0, self.statistics.total_runtime - self.statistics.get_time_point())
+
+    def _get_cutoff(self, cutoff):
+        remaining_time = self._get_remaining_time()
+        if remaining_time == None:
+            return cutoff
+        # The watchdog of the worker needs a positive cutoff
+        remaining_time = max(1, int(math.ceil(remaining_time)))
+        return remaining_time if cutoff == None else min(cutoff, remaining_time)
+
+
+class SuccessiveHalvingRandomSearch(RandomSearch):
+    """
+    Random search that allocates the budget by successive halving over the cross-validation folds of the pipeline
+    runner: a bracket samples num_configs configurations and evaluates them on min_folds folds, the best 1/eta of them
+    are promoted to the next rung and evaluated on eta times more folds, until the last rung uses all folds. The
+    brackets are repeated until the budget is exhausted. The cost of a configuration is its mean cost over its folds.
+
+    A configuration of which a run fails (crash, timeout or memout) is not evaluated on more folds, is never promoted
+    and never becomes the incumbent, its crash cost would distort the mean costs. If max_folds < eta * min_folds,
+    there is only one rung and the search is a random search on all folds.
+
+    The incumbent is the best configuration among the ones that are evaluated on the most folds, so a first incumbent
+    is there after the first rung. Every rung is recorded in the rung file of the statistics (see Statistics.add_rung).
+    """
+
+    def __init__(self,
+                 config_space,
+                 pipeline_runner,
+                 wallclock_limit,
+                 memory_limit,
+                 statistics,
+                 eta=3,
+                 min_folds=1,
+                 num_configs=None,
+                 worker_pool=None):
+        super(SuccessiveHalvingRandomSearch, self).__init__(config_space=config_space,
+                                                            pipeline_runner=pipeline_runner,
+                                                            wallclock_limit=wallclock_limit,
+                                                            memory_limit=memory_limit,
+                                                            statistics=statistics,
+                                                            worker_pool=worker_pool)
+        self.eta = eta
+        self.max_folds = self.pipeline_runner.num_cross_validation_folds
+        self.min_folds = min(min_folds, self.max_folds)
+        self.num_rungs = int(math.floor(math.log(self.max_folds / float(self.min_folds), eta) + 1e-9)) + 1
+        self.num_configs = num_configs if num_configs != None else eta ** (self.num_rungs - 1)
+        self.incumbent = None
+        self.incumbent_key = None
+        if self.num_rungs == 1:
+            logging.getLogger("SuccessiveHalvingRandomSearch").warning(
+                "There is only one rung with %d folds (eta %d, min_folds %d), every configuration is evaluated on all "
+                "folds as in a random search" % (self.max_folds, eta, self.min_folds))
+
+    def run(self, cutoff):
+
+        start_time = self.statistics.start_timer()
+
+        self.incumbent = None
+        self.incumbent_key = None
+        bracket = 0
+        while not(self.statistics.is_budget_exhausted()):
+            configs = self.config_space.sample_configuration(size=self.num_configs)
+            if self.num_configs == 1:
+                configs = [configs]
+            self._run_bracket(bracket, configs, cutoff)
+            bracket += 1
+
+        return self.incumbent
+
+    def get_num_folds(self, rung):
+        if rung == self.num_rungs - 1:
+            return self.max_folds
+        return min(self.max_folds, self.min_folds * self.eta ** rung)
+
+    #### Internal methods ####
+
+    def _run_bracket(self, bracket, configs, cutoff):
+        costs = [[] for _ in configs]
+        failed = set()
+        candidates = list(range(len(configs)))
+        for rung in range(self.num_rungs):
+            num_folds = self.get_num_folds(rung)
+            for idx in candidates:
+                for fold in range(len(costs[idx]), num_folds):
+                    if self.statistics.is_budget_exhausted():
+                        return
+                    status, cost, _, _ = self.run_with_limits(configs[idx], instance=fold, cutoff=cutoff, seed=None)
+                    self.statistics.add_run_nb()
+                    costs[idx].append(cost)
+                    # A pipeline that raises a ValueError reports the crash cost with a successful status
+                    if status != StatusType.SUCCESS or cost == 1234567890:
+                        failed.add(idx)
+                        break
+                if idx not in failed:
+                    self._update_incumbent(configs[idx], costs[idx])
+
+            # The failed configurations go last and are not promoted
+            candidates = sorted(candidates, key=lambda idx: (idx in failed, np.mean(costs[idx])))
+            num_succeeded = len([idx for idx in candidates if idx not in failed])
+            num_promoted = min(num_succeeded, max(1, int(len(candidates) / self.eta)))
+            promoted = candidates[:num_promoted] if rung < self.num_rungs - 1 else []
+            self.statistics.add_rung({
+                'bracket': bracket,
+                'rung': rung,
+                'num_folds': num_folds,
+                'num_configs': len(candidates),
+                'num_promoted': len(promoted),
+                'num_failed': len(candidates) - num_succeeded,
+                'configs': [{'config': configs[idx].get_dictionary(),
+                             'cost': float(np.mean(costs[idx])),
+                             'failed': idx in failed,
+                             'promoted': idx in promoted} for idx in candidates]
+            })
+            candidates = promoted
+            if candidates == []:
+                return
+
+    def _update_incumbent(self, config, costs):
+        # Configurations that are evaluated on more folds go first, then the lowest mean cost
+        key = (-len(costs), np.mean(costs))
+        if self.incumbent_key == None or key < self.incumbent_key:
+            self.incumbent = config
+            self.incumbent_key = key
+            self.statistics.add_new_incumbent(config.get_dictionary(), {'cost': float(key[1]),
+                                                                        'num_folds': len(costs)})
+
+
 class TreeRandomSearch(RandomSearch):
 
     def __init__(self,
@@ -105,16 +443,23 @@ class TreeRandomSearch(RandomSearch):
                  constant_pipeline_steps,
                  variable_pipeline_steps,
                  splitting_number,
-                 random_splitting_enabled=False):
+                 random_splitting_enabled=False,
+                 worker_pool=None,
+                 prefix_sharing=False,
+                 num_batch_workers=1):
         self.splitting_number = splitting_number
         self.random_splitting_enabled = random_splitting_enabled
         self.constant_pipeline_steps = constant_pipeline_steps
         self.variable_pipeline_steps = variable_pipeline_steps
+        self.recombiner = ConfigurationRecombiner(config_space, constant_pipeline_steps, variable_pipeline_steps)
         super(TreeRandomSearch, self).__init__(config_space=config_space,
                                                pipeline_runner=pipeline_runner,
                                                wallclock_limit=wallclock_limit,
                                                memory_limit=memory_limit,
-                                               statistics=statistics)
+                                               statistics=statistics,
+                                               worker_pool=worker_pool,
+                                               prefix_sharing=prefix_sharing,
+                                               num_batch_workers=num_batch_workers)
 
     def run(self, cutoff):
 
@@ -127,9 +472,12 @@ class TreeRandomSearch(RandomSearch):
 
         while not(self.statistics.is_budget_exhausted()):
             configs = self.sample_batch_of_configurations()
+            if self.prefix_sharing:
+                results = self.run_batch_with_limits(configs, instance=1, cutoff=cutoff, seed=None)
+            else:
+                results = (self.run_with_limits(config, instance=1, cutoff=cutoff, seed=None) for config in configs)
 
-            for config in configs:
-                _, cost, additional_info, _ = self.run_with_limits(config, instance=1, cutoff=cutoff, seed=None)
+            for config, (_, cost, _, _) in zip(configs, results):
                 self.statistics.add_run_nb()
 
                 if cost < incumbent_cost:
@@ -149,60 +497,12 @@ class TreeRandomSearch(RandomSearch):
         else:
             batch_size = self.splitting_number
 
+        # Combine the preprocessing part of the start configuration with the classification part of all the others
         while len(batch_of_configs) < batch_size:
-            next_config = self.config_space.sample_configuration()
-            complemented_vector_values = self._get_vector_values(next_config, self.variable_pipeline_steps)
-            # TODO hack for now to combine preprocessing part of one configuration with classification part of all the others
-            next_config_combined = self._combine_configurations_batch_vector(start_config, [complemented_vector_values])
-            batch_of_configs.extend(next_config_combined)
+            batch_of_configs.extend(self.recombiner.sample_and_combine(start_config,
+                                                                       batch_size - len(batch_of_configs)))
         return batch_of_configs
 
-    def _combine_configurations_batch_vector(self, start_config, complemented_configs_values):
-        constant_vector_values = self._get_vector_values(start_config, self.constant_pipeline_steps)
-        batch = []
-
-        for complemented_config_values in complemented_configs_values:
-            vector = np.ndarray(len(self.config_space._hyperparameters),
-                                dtype=np.float)
-
-            vector[:] = np.NaN
-
-            for key in constant_vector_values:
-                vector[key] = constant_vector_values[key]
-
-            for key in complemented_config_values:
-                vector[key] = complemented_config_values[key]
-
-            try:
-                self.config_space._check_forbidden(vector)
-                config_object = Configuration(configuration_space=self.config_space,
-                                              vector=vector)
-                batch.append(config_object)
-            except ValueError as v:
-                pass
-
-        return batch
-
-    def _get_values(self, config_dict, pipeline_steps):
-        value_dict = {}
-        for step_name in pipeline_steps:
-            for hp_name in config_dict:
-                splt_hp_name = hp_name.split(":")
-                if splt_hp_name[0] == step_name:
-                    value_dict[hp_name] = config_dict[hp_name]
-        return value_dict
-
-    def _get_vector_values(self, config, pipeline_steps):
-        vector = config.get_array()
-        value_dict = {}
-        for hp_name in config.get_dictionary():
-            for step_name in pipeline_steps:
-                splt_hp_name = hp_name.split(":")
-                if splt_hp_name[0] == step_name:
-                    item_idx = self.config_space._hyperparameter_idx[hp_name]
-                    value_dict[item_idx] = vector[item_idx]
-        return value_dict
-
 
 class SigmoidRandomSearch(RandomSearch):
 
@@ -215,16 +515,23 @@ class SigmoidRandomSearch(RandomSearch):
                  constant_pipeline_steps,
                  variable_pipeline_steps,
                  splitting_number,
-                 random_splitting_enabled=False):
+                 random_splitting_enabled=False,
+                 worker_pool=None,
+                 prefix_sharing=False,
+                 num_batch_workers=1):
         self.splitting_number = float(splitting_number)
         self.random_splitting_enabled = random_splitting_enabled
         self.constant_pipeline_steps = constant_pipeline_steps
         self.variable_pipeline_steps = variable_pipeline_steps
+        self.recombiner = ConfigurationRecombiner(config_space, constant_pipeline_steps, variable_pipeline_steps)
         super(SigmoidRandomSearch, self).__init__(config_space=config_space,
                                                pipeline_runner=pipeline_runner,
                                                wallclock_limit=wallclock_limit,
                                                memory_limit=memory_limit,
-                                               statistics=statistics)
+                                               statistics=statistics,
+                                               worker_pool=worker_pool,
+                                               prefix_sharing=prefix_sharing,
+                                               num_batch_workers=num_batch_workers)
 
     def run(self, cutoff):
 
@@ -244,11 +551,14 @@ class SigmoidRandomSearch(RandomSearch):
                 start_config = random.choice(incumbent_lst)
                 challenger_lst = []
                 while challenger_lst == []:
-                    rand_config = self.config_space.sample_configuration()
-                    complemented_vector_values = self._get_vector_values(rand_config, self.variable_pipeline_steps)
-                    challenger_lst = self._combine_configurations_batch_vector(start_config, [complemented_vector_values])
+                    challenger_lst = self.recombiner.sample_and_combine(start_config, 1)
                 challenger = challenger_lst[0]
-                _, cost, runtime, _ = self.run_with_limits(challenger, instance=1, cutoff=cutoff, seed=None)
+                if self.prefix_sharing:
+                    # The prefix of the incumbent is fitted once for all its exploitation steps
+                    _, cost, runtime, _ = self.run_batch_with_limits([challenger], instance=1, cutoff=cutoff,
+                                                                     seed=None)[0]
+                else:
+                    _, cost, runtime, _ = self.run_with_limits(challenger, instance=1, cutoff=cutoff, seed=None)
                 incumbent_timing += runtime
             else:
                 challenger = self.config_space.sample_configuration()
@@ -267,40 +577,3 @@ class SigmoidRandomSearch(RandomSearch):
                 self.statistics.add_new_incumbent(incumbent.get_dictionary(), {'cost': incumbent_cost})
 
         return incumbent
-
-    def _combine_configurations_batch_vector(self, start_config, complemented_configs_values):
-        constant_vector_values = self._get_vector_values(start_config, self.constant_pipeline_steps)
-        batch = []
-
-        for complemented_config_values in complemented_configs_values:
-            vector = np.ndarray(len(self.config_space._hyperparameters),
-                                dtype=np.float)
-
-            vector[:] = np.NaN
-
-            for key in constant_vector_values:
-                vector[key] = constant_vector_values[key]
-
-            for key in complemented_config_values:
-                vector[key] = complemented_config_values[key]
-
-            try:
-                self.config_space._check_forbidden(vector)
-                config_object = Configuration(configuration_space=self.config_space,
-                                              vector=vector)
-                batch.append(config_object)
-            except ValueError as v:
-                pass
-
-        return batch
-
-    def _get_vector_values(self, config, pipeline_steps):
-        vector = config.get_array()
-        value_dict = {}
-        for hp_name in config.get_dictionary():
-            for step_name in pipeline_steps:
-                splt_hp_name = hp_name.split(":")
-                if splt_hp_name[0] == step_name:
-                    item_idx = self.config_space._hyperparameter_idx[hp_name]
-                    value_dict[item_idx] = vector[item_idx]
-        return value_dict
\ No newline at end of file
@@ -0,0 +1,148 @@
+
+import numpy as np
+
+from ConfigSpace.configuration_space import Configuration
+from ConfigSpace.conditions import EqualsCondition, InCondition, AbstractConjunction
+from ConfigSpace.forbidden import ForbiddenEqualsClause, ForbiddenInClause, ForbiddenAndConjunction
+
+
+class ConfigurationRecombiner(object):
+    """
+    Combines the constant pipeline steps of a start configuration with the variable pipeline steps of many other
+    configurations (completions) at once. The columns of the pipeline steps in the configuration vectors are computed
+    only once, the candidates are assembled as one matrix and the forbidden clauses and the conditions are checked as
+    array operations on this matrix. Only the valid candidates are turned into Configuration objects.
+
+    Conditions of which the child and the parent belong to the same group of pipeline steps hold by construction and
+    are not checked. Forbidden clauses and conditions of an unknown type are checked row by row by the
+    configuration space.
+    """
+
+    def __init__(self, config_space, constant_pipeline_steps, variable_pipeline_steps):
+        self.config_space = config_space
+        self.num_hyperparameters = len(config_space.get_hyperparameters())
+        self.constant_columns = self._get_columns(constant_pipeline_steps)
+        self.variable_columns = self._get_columns(variable_pipeline_steps)
+
+        groups = np.full(self.num_hyperparameters, -1, dtype=np.int64)
+        groups[self.constant_columns] = 0
+        groups[self.variable_columns] = 1
+        self.groups = groups
+
+        self.forbiddens, unknown_forbiddens = self._compile_forbiddens()
+        self.conditions, unknown_conditions = self._compile_conditions()
+        self.check_row_by_row = unknown_forbiddens or unknown_conditions
+
+    def combine(self, start_config, completions):
+        """
+
+        Returns
+        -------
+        List of the valid configurations with the constant pipeline steps of the start configuration and the variable
+            pipeline steps of a completion, in the order of the completions
+
+        """
+        if completions == []:
+            return []
+        X = self.combine_vectors(start_config.get_array(), np.array([config.get_array() for config in completions]))
+        valid = ~self.is_forbidden(X) & self.satisfies_conditions(X)
+
+        batch = []
+        for vector in X[valid]:
+            try:
+                if self.check_row_by_row:
+                    self.config_space._check_forbidden(vector)
+                batch.append(Configuration(configuration_space=self.config_space, vector=vector))
+            except ValueError as v:
+                pass
+        return batch
+
+    def sample_and_combine(self, start_config, size):
+        """
+        Sample size completions and combine them with the start configuration, the invalid combinations are dropped
+        """
+        completions = self.config_space.sample_configuration(size=size)
+        # ConfigSpace returns a single configuration for size 1
+        if size == 1:
+            completions = [completions]
+        return self.combine(start_config, completions)
+
+    def combine_vectors(self, start_vector, completion_vectors):
+        X = np.full((completion_vectors.shape[0], self.num_hyperparameters), np.nan, dtype=np.float64)
+        X[:, self.constant_columns] = start_vector[self.constant_columns]
+        X[:, self.variable_columns] = completion_vectors[:, self.variable_columns]
+        return X
+
+    def is_forbidden(self, X):
+        forbidden = np.zeros(X.shape[0], dtype=bool)
+        for clauses in self.forbiddens:
+            matches = np.ones(X.shape[0], dtype=bool)
+            for column, values in clauses:
+                matches &= np.isin(X[:, column], values)
+            forbidden |= matches
+        return forbidden
+
+    def satisfies_conditions(self, X):
+        valid = np.ones(X.shape[0], dtype=bool)
+        for child_column, parent_column, values in self.conditions:
+            active = np.isin(X[:, parent_column], values)
+            valid &= active != np.isnan(X[:, child_column])
+        return valid
+
+    #### Internal methods ####
+
+    def _get_columns(self, pipeline_steps):
+        return np.array(sorted([self.config_space._hyperparameter_idx[hp_name]
+                                for hp_name in self.config_space.get_hyperparameter_names()
+                                if hp_name.split(":")[0] in pipeline_steps]), dtype=np.int64)
+
+    def _get_column(self, hyperparameter):
+        return self.config_space._hyperparameter_idx[hyperparameter.name]
+
+    def _get_vector_values(self, hyperparameter, values):
+        return np.array([hyperparameter._inverse_transform(value) for value in values], dtype=np.float64)
+
+    def _compile_forbiddens(self):
+        # Every forbidden clause as a list of (column, forbidden vector values), the clause matches if all match
+        forbiddens, unknown = [], False
+        for forbidden in self.config_space.get_forbiddens():
+            components = forbidden.components if isinstance(forbidden, ForbiddenAndConjunction) else [forbidden]
+            clauses = []
+            for component in components:
+                if isinstance(component, ForbiddenEqualsClause):
+                    values = [component.value]
+                elif isinstance(component, ForbiddenInClause):
+                    values = list(component.values)
+                else:
+                    unknown = True
+                    clauses = None
+                    break
+                clauses.append((self._get_column(component.hyperparameter),
+                                self._get_vector_values(component.hyperparameter, values)))
+            if clauses != None:
+                forbiddens.append(clauses)
+        return forbiddens, unknown
+
+    def _compile_conditions(self):
+        # The conditions across the constant and the variable pipeline steps as (child column, parent column,
+        #   vector values of the parent that activate the child)
+        conditions, unknown = [], False
+        for condition in self.config_space.get_conditions():
+            child_column = self._get_column(condition.child)
+            if isinstance(condition, AbstractConjunction):
+                if any([self.groups[self._get_column(parent)] != self.groups[child_column]
+                        for parent in condition.get_parents()]):
+                    unknown = True
+                continue
+            parent_column = self._get_column(condition.parent)
+            if self.groups[parent_column] == self.groups[child_column]:
+                continue
+            if isinstance(condition, EqualsCondition):
+                values = [condition.value]
+            elif isinstance(condition, InCondition):
+                values = list(condition.values)
+            else:
+                unknown = True
+                continue
+            conditions.append((child_column, parent_column, self._get_vector_values(condition.parent, values)))
+        return conditions, unknown
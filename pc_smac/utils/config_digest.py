@@ -0,0 +1,30 @@
+
+import hashlib
+import json
+
+import numpy as np
+
+
+def get_config_digest(config_dict):
+    """
+    Stable digest of a (partial) configuration dictionary. Unlike hash(frozenset(config_dict.items())), which is
+    salted per python process, the digest is the same in every process and can be persisted.
+
+    Parameters
+    ----------
+    config_dict:    dictionary hyperparameter name -> value
+
+    Returns
+    -------
+    Hexadecimal sha1 digest of the canonical json representation of the dictionary
+
+    """
+    items = sorted((name, _get_canonical_value(value)) for name, value in config_dict.items())
+    return hashlib.sha1(json.dumps(items, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _get_canonical_value(value):
+    # Numpy scalars are converted to the corresponding python types such that e.g. np.int64(5) and 5 get the same digest
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
@@ -0,0 +1,131 @@
+
+import os
+import json
+import fcntl
+import hashlib
+
+import numpy as np
+import scipy.sparse
+
+from smac.tae.execute_func import ExecuteTAFuncDict
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.utils.config_digest import get_config_digest
+
+
+def get_data_fingerprint(X, y, data_info, num_folds, downsampling=None):
+    """
+    Digest of everything a run result depends on next to the configuration and the fold: the training data, the
+    task and metric, the number of cross-validation folds and the downsampling.
+    """
+    sha1 = hashlib.sha1()
+    if scipy.sparse.issparse(X):
+        X = X.tocsr()
+        for component in [X.data, X.indices, X.indptr]:
+            sha1.update(np.ascontiguousarray(component).tobytes())
+    else:
+        sha1.update(np.ascontiguousarray(X).tobytes())
+    sha1.update(np.ascontiguousarray(y).tobytes())
+    sha1.update(json.dumps([list(X.shape), list(np.shape(y)), int(data_info['task']), int(data_info['metric']),
+                            int(data_info.get('label_num', 0)), num_folds, downsampling]).encode("utf-8"))
+    return sha1.hexdigest()
+
+
+class ResultStore(object):
+    """
+    Persistent store of the results of the pipeline runs, keyed by the digest of the configuration (see
+    get_config_digest), the fold and the fingerprint of the data (see get_data_fingerprint). The runs are
+    deterministic, so a configuration that is evaluated again on the same fold of the same data gets the recorded
+    result instead of being run again, also in a later optimization.
+
+    The results are appended as json lines to results_<fingerprint>.jsonl in the directory, under an exclusive lock.
+    The runs are executed in forked processes, which append their results, but the lookups are done in the process
+    that dispatches the runs (see PipelineRunner.get_memoized_result): update reads the results that were appended
+    since its last read, so the offset only advances in this process and the file is read once.
+    """
+
+    def __init__(self, directory, fingerprint):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.fingerprint = fingerprint
+        self.file = os.path.join(directory, "results_" + fingerprint + ".jsonl")
+        self.results = {}
+        self.offset = 0
+
+    def get(self, config_dict, instance):
+        """
+        Looks the result up in the results that were read so far, see update
+
+        Returns
+        -------
+        The recorded result (dictionary with the status value, the cost, the runtime, the additional info and the run
+            information of the statistics) or None if the configuration was not evaluated on the fold yet
+
+        """
+        return self.results.get((get_config_digest(config_dict), int(instance)))
+
+    def update(self):
+        """Reads the results that were appended to the file since the last update"""
+        if not os.path.exists(self.file):
+            return
+        with open(self.file, "rb") as fp:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            try:
+                fp.seek(self.offset)
+                content = fp.read()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+        # Only complete lines, an incomplete last result is read at the next update
+        end = content.rfind(b"\n") + 1
+        self.offset += end
+        for line in content[:end].decode("utf-8").splitlines():
+            if line.strip() == "":
+                continue
+            result = json.loads(line)
+            if result['fingerprint'] == self.fingerprint:
+                self.results[(result['digest'], result['instance'])] = result
+
+    def add(self, config_dict, instance, cost, runtime, additional_info, run_information, status=StatusType.SUCCESS):
+        result = {'digest': get_config_digest(config_dict),
+                  'instance': int(instance),
+                  'fingerprint': self.fingerprint,
+                  'status': status.value,
+                  'cost': cost,
+                  'runtime': runtime,
+                  'additional_info': additional_info,
+                  'run_information': run_information}
+        line = json.dumps(result, sort_keys=True) + "\n"
+        with open(self.file, "a") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(line)
+                fp.flush()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+        self.results[(result['digest'], result['instance'])] = result
+
+
+class ExecuteTAFuncWithResultStore(ExecuteTAFuncDict):
+    """
+    Executes the target algorithm function in a new pynisher process per run, unless the pipeline runner has a
+    recorded result of the run (see PipelineRunner.get_memoized_result), which is looked up before the fork
+    """
+
+    def __init__(self, ta, pipeline_runner, stats=None, runhistory=None, run_obj="quality", memory_limit=None):
+        super(ExecuteTAFuncWithResultStore, self).__init__(ta=ta,
+                                                           stats=stats,
+                                                           runhistory=runhistory,
+                                                           run_obj=run_obj,
+                                                           memory_limit=memory_limit)
+        self.pipeline_runner = pipeline_runner
+
+    def run(self, config, instance=None, cutoff=None, seed=12345, instance_specific="0"):
+        memoized_result = self.pipeline_runner.get_memoized_result(config, instance, cutoff=cutoff)
+        if memoized_result == None:
+            return super(ExecuteTAFuncWithResultStore, self).run(config, instance=instance, cutoff=cutoff, seed=seed,
+                                                                 instance_specific=instance_specific)
+        status, cost, runtime, additional_run_info = memoized_result
+        if self.run_obj == "runtime":
+            cost = runtime
+        return status, cost, runtime, additional_run_info
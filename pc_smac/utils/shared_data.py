@@ -0,0 +1,70 @@
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.sparse
+
+
+class SharedDataStore(object):
+    """
+    Stores numpy arrays and scipy sparse matrices once in memory-mapped files. Processes that are
+    forked afterwards (e.g. by pynisher) attach to copy-on-write views of these files instead of copying
+    the pages of the original arrays. A process that writes to a view (e.g. in-place imputation) only
+    copies the pages it writes to, the files and the views of the other processes are not changed.
+    """
+
+    def __init__(self, directory=None):
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = tempfile.mkdtemp(dir=directory, prefix="shared_data_")
+        self.arrays = {}
+
+    def put(self, name, array):
+        """
+
+        Parameters
+        ----------
+        name:   name of the array inside the store
+        array:  numpy array or scipy sparse matrix
+
+        Returns
+        -------
+        A copy-on-write, memory-mapped view of the array
+
+        """
+        if scipy.sparse.issparse(array):
+            csr = array.tocsr()
+            for component in ['data', 'indices', 'indptr']:
+                self._write_array(name + "." + component, getattr(csr, component))
+            np.save(self._get_path(name + ".shape"), np.asarray(csr.shape))
+        else:
+            self._write_array(name, np.asarray(array))
+        self.arrays[name] = self._load(name)
+        return self.arrays[name]
+
+    def get(self, name):
+        if name not in self.arrays:
+            self.arrays[name] = self._load(name)
+        return self.arrays[name]
+
+    def clean(self):
+        self.arrays = {}
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    #### Internal methods ####
+
+    def _write_array(self, name, array):
+        np.save(self._get_path(name), np.ascontiguousarray(array))
+
+    def _load(self, name):
+        if os.path.exists(self._get_path(name + ".shape")):
+            shape = tuple(np.load(self._get_path(name + ".shape")))
+            data, indices, indptr = [np.load(self._get_path(name + "." + component), mmap_mode='c')
+                                     for component in ['data', 'indices', 'indptr']]
+            return scipy.sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+        return np.load(self._get_path(name), mmap_mode='c')
+
+    def _get_path(self, name):
+        return os.path.join(self.directory, name + ".npy")
@@ -2,6 +2,7 @@
 import os
 import time
 import json
+import fcntl
 
 from ConfigSpace.configuration_space import ConfigurationSpace, Configuration
 from ConfigSpace.hyperparameters import FloatHyperparameter, IntegerHyperparameter
@@ -28,10 +29,16 @@ class Statistics(object):
             self.run_file = self.output_dir + "statistics_" + str(self.stamp) + "_runs.json"
             self.inc_file = self.output_dir + "statistics_" + str(self.stamp) + "_incumbents.json"
             self.inc_log_file = self.output_dir + "statistics_logging_" + str(self.stamp) + "_incumbents.json"
+            self.meta_features_file = self.output_dir + "statistics_" + str(self.stamp) + "_meta_features.json"
+            self.overhead_file = self.output_dir + "statistics_" + str(self.stamp) + "_overhead.json"
+            self.rung_file = self.output_dir + "statistics_" + str(self.stamp) + "_rungs.json"
         else:
             self.run_file = self.output_dir + "/statistics_" + str(self.stamp) + "_runs.json"
             self.inc_file = self.output_dir + "/statistics_" + str(self.stamp) + "_incumbents.json"
             self.inc_log_file = self.output_dir + "/statistics_logging_" + str(self.stamp) + "_incumbents.json"
+            self.meta_features_file = self.output_dir + "/statistics_" + str(self.stamp) + "_meta_features.json"
+            self.overhead_file = self.output_dir + "/statistics_" + str(self.stamp) + "_overhead.json"
+            self.rung_file = self.output_dir + "/statistics_" + str(self.stamp) + "_rungs.json"
 
         #self.info_file = self.output_dir + "statistics_info_" + str(self.stamp) + ".json"
 
@@ -86,6 +93,27 @@ class Statistics(object):
         else:
             return self._read_json_file(self.inc_log_file)
 
+    def add_overhead(self, information: dict):
+        # One record per iteration of the SMBO loop, see OverheadRecorder
+        time_point = self.get_time_point()
+        record = information.copy()
+        record['wallclock_time'] = time_point
+        self._save_json([record], self.overhead_file)
+        return time_point
+
+    def add_rung(self, information: dict):
+        # One record per rung of the successive halving random search
+        time_point = self.get_time_point()
+        record = information.copy()
+        record['wallclock_time'] = time_point
+        self._save_json([record], self.rung_file)
+        return time_point
+
+    def save_meta_features(self, meta_features):
+        # Used to find the runs on similar datasets when warm starting a new optimization
+        with open(self.meta_features_file, "w") as fp:
+            json.dump(meta_features, fp, indent=4, sort_keys=True)
+
     def save(self):
         # Create and clean files
         self._clean_files([self.run_file, self.inc_file])
@@ -96,17 +124,19 @@ class Statistics(object):
         #info_strng = self._transform_dict_to_string(self.stat_information)
         #self._save_info_file(info_strng, info_file)
 
-    def is_budget_exhausted(self):
+    def is_budget_exhausted(self, num_pending_runs=0):
+        # The pending runs (e.g. busy in a worker pool) count as finished runs
+        nb_runs = self.nb_runs + num_pending_runs
         if self.total_runtime and self.run_limit:
-            return (time.time() - self.start_time > self.total_runtime) or (self.nb_runs > self.run_limit)
+            return (time.time() - self.start_time > self.total_runtime) or (nb_runs > self.run_limit)
         elif self.total_runtime:
             return time.time() - self.start_time > self.total_runtime
         elif self.run_limit:
-            return self.nb_runs > self.run_limit
+            return nb_runs > self.run_limit
         return False
 
     def clean_files(self):
-        self._clean_files([self.run_file, self.inc_file])
+        self._clean_files([self.run_file, self.inc_file, self.overhead_file, self.rung_file])
 
 
     #### INTERNAL METHODS ####
@@ -174,10 +204,15 @@ class Statistics(object):
         if not os.path.exists(destination_file):
             self._open_file(destination_file)
 
+        # One write under an exclusive lock, the runs can be added by concurrent worker processes
+        content = "".join([json.dumps(row, indent=4, sort_keys=True) + "\n" for row in lst])
         with open(destination_file, "a") as fp:
-            for row in lst:
-                json.dump(row, fp, indent=4, sort_keys=True)
-                fp.write("\n")
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(content)
+                fp.flush()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
 
     def _save_info_file(self, strng, destination_file):
         if not os.path.exists(destination_file):
@@ -5,7 +5,14 @@ from pc_smac.pc_smac.pc_driver import Driver
 
 
 def run_smac(acq_func, double_intensification, wallclock_limit, runcount_limit, memory_limit, cutoff, data_path, stamp, output_dir, cache_directory,
-             downsampling, intensification_fold_size, pipeline_space_string, random_spliting_number, random_spliting_enabled):
+             downsampling, intensification_fold_size, pipeline_space_string, random_spliting_number, random_spliting_enabled,
+             shared_data_directory=None, persistent_workers=0, max_tasks_per_worker=100,
+             trace_allocations=0, test_workers=1, full_model_retrain_every=None,
+             batch_size=1, asynchronous=0, vectorized_marginalization=0, checkpoint_every=None, resume=0,
+             warm_start=0, warm_start_transfer=0, initial_design_prefixes=0, initial_design_classifiers_per_prefix=3,
+             initial_design_budget_fraction=0.1, cache_aware_ordering=0,
+             racing=0, racing_alpha=0.05, log_overhead=0, result_store_directory=None, materialize_folds=0,
+             columnar_runhistory=1):
     d = Driver(data_path=data_path, output_dir=output_dir, pipeline_space_string=pipeline_space_string)
     double_intensification_bool = True if double_intensification == 1 else False
     random_spliting_enabled_bool = True if random_spliting_enabled == 1 else False
@@ -20,7 +27,30 @@ def run_smac(acq_func, double_intensification, wallclock_limit, runcount_limit,
                  downsampling=downsampling,
                  intensification_fold_size=intensification_fold_size,
                  random_splitting_number=random_spliting_number,
-                 random_splitting_enabled=random_spliting_enabled_bool)
+                 random_splitting_enabled=random_spliting_enabled_bool,
+                 shared_data_directory=shared_data_directory,
+                 persistent_workers=True if persistent_workers == 1 else False,
+                 max_tasks_per_worker=max_tasks_per_worker,
+                 trace_allocations=True if trace_allocations == 1 else False,
+                 test_workers=test_workers,
+                 full_model_retrain_every=full_model_retrain_every,
+                 batch_size=batch_size,
+                 asynchronous=True if asynchronous == 1 else False,
+                 vectorized_marginalization=True if vectorized_marginalization == 1 else False,
+                 checkpoint_every=checkpoint_every,
+                 resume=True if resume == 1 else False,
+                 warm_start=warm_start,
+                 warm_start_transfer=True if warm_start_transfer == 1 else False,
+                 initial_design_prefixes=initial_design_prefixes,
+                 initial_design_classifiers_per_prefix=initial_design_classifiers_per_prefix,
+                 initial_design_budget_fraction=initial_design_budget_fraction,
+                 cache_aware_ordering=True if cache_aware_ordering == 1 else False,
+                 racing=True if racing == 1 else False,
+                 racing_alpha=racing_alpha,
+                 log_overhead=True if log_overhead == 1 else False,
+                 result_store_directory=result_store_directory,
+                 materialize_folds=True if materialize_folds == 1 else False,
+                 columnar_runhistory=True if columnar_runhistory == 1 else False)
 
 
 def parse_arguments():
@@ -40,6 +70,29 @@ def parse_arguments():
     parser.add_argument("-ps", "--pipeline_space", type=str, default=None, help="Scenario to execute")
     parser.add_argument("-sn", "--splitting_number", type=int, default=5, help="Splitting number for MRS")
     parser.add_argument("-rs", "--random_splitting", type=int, default=0, help="Int to indicate if random splitting is enable in MRS")
+    parser.add_argument("-sd", "--shared_data_dir", type=str, default=None, help="Directory for memory-mapped training data shared with the workers")
+    parser.add_argument("-pw", "--persistent_workers", type=int, default=0, help="Int to indicate if a pool of persistent workers evaluates the pipelines")
+    parser.add_argument("-mt", "--max_tasks_per_worker", type=int, default=100, help="Number of evaluations after which a persistent worker is recycled")
+    parser.add_argument("-ta", "--trace_allocations", type=int, default=0, help="Int to indicate if the allocated bytes and the input and output data of every pipeline step are traced")
+    parser.add_argument("-tw", "--test_workers", type=int, default=1, help="Number of processes that test the incumbents")
+    parser.add_argument("-fr", "--full_model_retrain_every", type=int, default=None, help="Number of iterations after which the model is fully retrained, it is updated cheaply in between")
+    parser.add_argument("-bs", "--batch_size", type=int, default=1, help="Number of challengers that are evaluated concurrently at every iteration")
+    parser.add_argument("-as", "--asynchronous", type=int, default=0, help="Int to indicate if the asynchronous optimization loop keeps batch_size workers busy")
+    parser.add_argument("-vm", "--vectorized_marginalization", type=int, default=0, help="Int to indicate if the marginalized acquisition functions score the candidates in batches")
+    parser.add_argument("-ck", "--checkpoint_every", type=int, default=None, help="Number of seconds between two checkpoints of the optimization state")
+    parser.add_argument("-re", "--resume", type=int, default=0, help="Int to indicate if the optimization with the same stamp is resumed from its checkpoint")
+    parser.add_argument("-ws", "--warm_start", type=int, default=0, help="Number of previous optimizations on the most similar datasets that seed the initial design")
+    parser.add_argument("-wt", "--warm_start_transfer", type=int, default=0, help="Int to indicate if the runs of these previous optimizations are added to the data of the model")
+    parser.add_argument("-ip", "--initial_design_prefixes", type=int, default=0, help="Number of diverse preprocessing prefixes of the prefix-sharing initial design")
+    parser.add_argument("-ic", "--initial_design_classifiers_per_prefix", type=int, default=3, help="Number of classifiers per prefix of the prefix-sharing initial design")
+    parser.add_argument("-ib", "--initial_design_budget_fraction", type=float, default=0.1, help="Fraction of the wallclock limit that the prefix-sharing initial design may use")
+    parser.add_argument("-co", "--cache_aware_ordering", type=int, default=0, help="Int to indicate if near-tied challengers are reordered to group the ones that share a cached prefix")
+    parser.add_argument("-rc", "--racing", type=int, default=0, help="Int to indicate if challengers are rejected after every fold as soon as they cannot beat the incumbent")
+    parser.add_argument("-ra", "--racing_alpha", type=float, default=0.05, help="Significance level of the paired test that rejects a challenger during racing")
+    parser.add_argument("-lo", "--log_overhead", type=int, default=0, help="Int to indicate if the overhead of the optimizer is written to the statistics output at every iteration")
+    parser.add_argument("-md", "--result_store_dir", type=str, default=None, help="Directory of the persistent store of run results, runs that were done before on the same data are not repeated")
+    parser.add_argument("-mf", "--materialize_folds", type=int, default=0, help="Int to indicate if the data of every fold is stored in the shared data directory too")
+    parser.add_argument("-cr", "--columnar_runhistory", type=int, default=1, help="Int to indicate if the runs are also stored in arrays such that only the new runs are converted to data of the model")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -58,6 +111,29 @@ if __name__ == "__main__":
              args.intensification_fold_size,
              args.pipeline_space,
              args.splitting_number,
-             args.random_splitting)
+             args.random_splitting,
+             args.shared_data_dir,
+             args.persistent_workers,
+             args.max_tasks_per_worker,
+             args.trace_allocations,
+             args.test_workers,
+             args.full_model_retrain_every,
+             args.batch_size,
+             args.asynchronous,
+             args.vectorized_marginalization,
+             args.checkpoint_every,
+             args.resume,
+             args.warm_start,
+             args.warm_start_transfer,
+             args.initial_design_prefixes,
+             args.initial_design_classifiers_per_prefix,
+             args.initial_design_budget_fraction,
+             args.cache_aware_ordering,
+             args.racing,
+             args.racing_alpha,
+             args.log_overhead,
+             args.result_store_dir,
+             args.materialize_folds,
+             args.columnar_runhistory)
 
 
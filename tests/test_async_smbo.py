@@ -0,0 +1,207 @@
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true
+from sklearn.utils.testing import assert_array_almost_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace, Configuration
+from ConfigSpace.hyperparameters import CategoricalHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.runhistory.runhistory import RunHistory, InstSeedKey
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_smbo.batch_evaluation import BatchEvaluator
+from pc_smac.pc_smac.pc_smbo.pc_smbo import PCSMBOAsync
+
+
+class Struct(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class DummyWorkerPool(object):
+
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self.submitted = []
+
+    def has_idle_worker(self):
+        return len(self.submitted) < self.num_workers
+
+    def submit(self, config, instance=None, cutoff=None, seed=None):
+        self.submitted.append((config, instance, seed))
+        return len(self.submitted)
+
+    def get_results(self):
+        return []
+
+    def cancel_all(self):
+        pass
+
+
+class DummyStats(object):
+
+    def __init__(self):
+        self.inc_changed = 0
+        self.ta_runs = 0
+        self.ta_time_used = 0.
+
+    def start_timing(self):
+        pass
+
+    def is_budget_exhausted(self):
+        return False
+
+
+class DummyRunHistory2EPM(object):
+    """One row per run with the array of the configuration and the cost"""
+
+    def transform(self, runhistory):
+        X, Y = [], []
+        for key, value in runhistory.data.items():
+            X.append(runhistory.ids_config[key.config_id].get_array())
+            Y.append([value.cost])
+        return np.array(X).reshape((len(X), 1)), np.array(Y).reshape((len(Y), 1))
+
+
+class DummySelectConfiguration(object):
+
+    def __init__(self, challengers):
+        self.challengers = challengers
+        self.num_calls = 0
+
+    def run(self, X, Y, **kwargs):
+        self.num_calls += 1
+        return list(self.challengers)
+
+
+def build_configurations():
+    config_space = ConfigurationSpace(seed=1)
+    config_space.add_hyperparameter(CategoricalHyperparameter("x", ["a", "b", "c", "d"]))
+    configs = dict((value, Configuration(config_space, values={"x": value})) for value in ["a", "b", "c", "d"])
+    return config_space, configs
+
+
+def build_smbo(config_space, runhistory, incumbent=None, num_workers=2, challengers=(), max_idle_refreshes=10):
+    traj_entries = []
+    intensifier = Struct(instances=list(range(3)), maxR=3, deterministic=True,
+                         traj_logger=Struct(add_entry=lambda **kwargs: traj_entries.append(kwargs)))
+    worker_pool = DummyWorkerPool(num_workers)
+    stats = DummyStats()
+    # The fantasies are converted by the converter that the incremental converter wraps
+    runhistory2epm = DummyRunHistory2EPM()
+    smbo = PCSMBOAsync(scenario=Struct(cs=config_space, shared_model=False, abort_on_first_run_crash=False),
+                       stats=stats,
+                       initial_design=Struct(run=lambda: incumbent),
+                       runhistory=runhistory,
+                       runhistory2epm=Struct(runhistory2epm=runhistory2epm, transform=runhistory2epm.transform),
+                       intensifier=intensifier,
+                       aggregate_func=average_cost,
+                       num_run=1,
+                       model=None,
+                       rng=np.random.RandomState(1),
+                       select_configuration=DummySelectConfiguration(challengers),
+                       batch_evaluator=BatchEvaluator(worker_pool, runhistory, stats),
+                       max_idle_refreshes=max_idle_refreshes)
+    smbo.incumbent = incumbent
+    smbo.traj_entries = traj_entries
+    return smbo
+
+
+def add_result(smbo, config, instance, cost):
+    smbo.batch_evaluator.add_run(config, instance, 0, (StatusType.SUCCESS, cost, 1., {}))
+    smbo._process_result(config)
+
+
+def test_add_fantasies():
+    config_space, configs = build_configurations()
+    runhistory = RunHistory(average_cost)
+    runhistory.add(configs["a"], 0.2, 1, StatusType.SUCCESS, instance_id=0, seed=0)
+    runhistory.add(configs["b"], 0.4, 1, StatusType.SUCCESS, instance_id=0, seed=0)
+    smbo = build_smbo(config_space, runhistory, incumbent=configs["a"])
+
+    X, Y = DummyRunHistory2EPM().transform(runhistory)
+    # Without pending runs the data is unchanged
+    X_fantasies, Y_fantasies = smbo._add_fantasies(X, Y)
+    assert_equal(X_fantasies.shape, (2, 1))
+
+    # Every pending run is a row with the mean of the observed costs (constant liar)
+    smbo.pending = {1: (configs["c"], InstSeedKey(0, 0)), 2: (configs["d"], InstSeedKey(1, 0))}
+    X_fantasies, Y_fantasies = smbo._add_fantasies(X, Y)
+    assert_equal(X_fantasies.shape, (4, 1))
+    assert_array_almost_equal(X_fantasies[2:], [configs["c"].get_array(), configs["d"].get_array()])
+    assert_array_almost_equal(Y_fantasies.ravel(), [0.2, 0.4, 0.3, 0.3])
+    # The fantasies are not added to the runhistory
+    assert_equal(len(runhistory.data), 2)
+
+
+def test_process_results_out_of_order():
+    config_space, configs = build_configurations()
+    incumbent, first, second = configs["a"], configs["b"], configs["c"]
+    runhistory = RunHistory(average_cost)
+    for instance in [0, 1]:
+        runhistory.add(incumbent, 0.5, 1, StatusType.SUCCESS, instance_id=instance, seed=0)
+    smbo = build_smbo(config_space, runhistory, incumbent=incumbent)
+
+    # Both challengers run on the first instance, the second one finishes first
+    smbo.pending = {1: (first, InstSeedKey(0, 0)), 2: (second, InstSeedKey(0, 0))}
+    smbo.pending.pop(2)
+    add_result(smbo, second, 0, 0.4)
+    assert_equal(smbo.next_runs, [(second, InstSeedKey(1, 0))])
+
+    smbo.pending.pop(1)
+    add_result(smbo, first, 0, 0.6)
+    assert_equal(smbo.next_runs, [(second, InstSeedKey(1, 0))])
+
+    # The race of the second challenger goes on, the first one is rejected
+    assert_equal(smbo._get_next_run([]), (second, InstSeedKey(1, 0)))
+    smbo.pending = {3: (second, InstSeedKey(1, 0))}
+    # The challenger is not the incumbent as long as one of its runs is pending
+    assert_true(smbo.incumbent == incumbent)
+
+    smbo.pending.pop(3)
+    add_result(smbo, second, 1, 0.45)
+    assert_true(smbo.incumbent == second)
+    assert_equal(smbo.stats.inc_changed, 1)
+    assert_equal(len(smbo.traj_entries), 1)
+    assert_true(smbo.traj_entries[0]['incumbent'] == second)
+    assert_array_almost_equal(smbo.traj_entries[0]['train_perf'], 0.425)
+
+    # A late result of the former incumbent does not change the incumbent back
+    add_result(smbo, incumbent, 2, 0.1)
+    assert_true(smbo.incumbent == second)
+    assert_equal(smbo.stats.inc_changed, 1)
+
+
+def test_first_result_becomes_incumbent():
+    config_space, configs = build_configurations()
+    runhistory = RunHistory(average_cost)
+    smbo = build_smbo(config_space, runhistory, incumbent=None)
+
+    smbo.pending = {1: (configs["a"], InstSeedKey(0, 0)), 2: (configs["b"], InstSeedKey(0, 0))}
+    smbo.pending.pop(2)
+    add_result(smbo, configs["b"], 0, 0.3)
+    assert_true(smbo.incumbent == configs["b"])
+
+    smbo.pending.pop(1)
+    add_result(smbo, configs["a"], 0, 0.2)
+    assert_true(smbo.incumbent == configs["a"])
+    assert_equal(smbo.stats.inc_changed, 2)
+
+
+def test_stop_when_no_run_can_be_started():
+    config_space, configs = build_configurations()
+    runhistory = RunHistory(average_cost)
+    # Every configuration is evaluated on every instance already
+    for config in configs.values():
+        for instance in range(3):
+            runhistory.add(config, 0.5, 1, StatusType.SUCCESS, instance_id=instance, seed=0)
+    smbo = build_smbo(config_space, runhistory, incumbent=configs["a"], challengers=list(configs.values()),
+                      max_idle_refreshes=5)
+
+    incumbent = smbo.run()
+    assert_true(incumbent == configs["a"])
+    assert_equal(smbo.worker_pool.submitted, [])
+    assert_equal(smbo.select_configuration.num_calls, 5)
@@ -0,0 +1,99 @@
+
+import numpy as np
+
+from sklearn.utils.testing import assert_array_almost_equal, assert_equal, assert_true
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.conditions import EqualsCondition
+from ConfigSpace.hyperparameters import CategoricalHyperparameter, UniformFloatHyperparameter
+
+from pc_smac.pc_smac.pc_runhistory.caching_discount import CachingDiscountEngine
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import CachedConfigurationLedger
+from pc_smac.pc_smac.utils.config_digest import get_config_digest
+
+
+CACHED_PIPELINE_STEPS = [["imputation"], ["imputation", "rescaling"]]
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    strategy = CategoricalHyperparameter("imputation:strategy", ["mean", "median", "most_frequent"])
+    rescaling = CategoricalHyperparameter("rescaling:__choice__", ["none", "normalize"])
+    # The rescaling hyperparameter is inactive for half of the configurations
+    norm = CategoricalHyperparameter("rescaling:normalize:norm", ["l1", "l2"])
+    x = UniformFloatHyperparameter("classifier:x", 0, 1)
+    config_space.add_hyperparameters([strategy, rescaling, norm, x])
+    config_space.add_condition(EqualsCondition(norm, rescaling, "normalize"))
+    return config_space
+
+
+def get_prefix(config, pipeline_steps):
+    return {hp_name: value for hp_name, value in config.get_dictionary().items()
+            if hp_name.split(":")[0] in pipeline_steps}
+
+
+def compute_discounts(configs, ledger):
+    # One digest per configuration and group of cached pipeline steps, as the discounts were computed before
+    discounts = []
+    for config in configs:
+        discount = 0
+        for pipeline_steps in CACHED_PIPELINE_STEPS:
+            digest = get_config_digest(get_prefix(config, pipeline_steps))
+            if digest in ledger:
+                discount += ledger[digest]
+        discounts.append(discount)
+    return np.array(discounts)
+
+
+def test_compute_discounts():
+    config_space = build_config_space()
+    rng = np.random.RandomState(1)
+    engine = CachingDiscountEngine(config_space, CACHED_PIPELINE_STEPS)
+    ledger = CachedConfigurationLedger()
+    configs = config_space.sample_configuration(size=50)
+    X = np.array([config.get_array() for config in configs])
+
+    assert_array_almost_equal(engine.compute_discounts(X, ledger), np.zeros(50))
+    # The ledger grows between the calls, the engine only converts the new entries
+    for cached in [configs[:3], configs[10:20]]:
+        for config in cached:
+            for pipeline_steps in CACHED_PIPELINE_STEPS:
+                ledger.add(get_prefix(config, pipeline_steps), rng.rand())
+        discounts = engine.compute_discounts(X, ledger)
+        assert_array_almost_equal(discounts, compute_discounts(configs, ledger))
+    assert_true(np.all(discounts[10:20] > 0))
+
+    # A single vector gives the same discount as the matrix
+    assert_array_almost_equal(engine.compute_discounts(X[12], ledger), discounts[12:13])
+
+
+def test_get_prefix_keys():
+    config_space = build_config_space()
+    engine = CachingDiscountEngine(config_space, CACHED_PIPELINE_STEPS)
+    ledger = CachedConfigurationLedger()
+    configs = config_space.sample_configuration(size=20)
+    X = np.array([config.get_array() for config in configs])
+    for config in configs[:5]:
+        ledger.add(get_prefix(config, CACHED_PIPELINE_STEPS[1]), 1.)
+
+    # The ledger is read without computing discounts first, the prefixes that are not cached have no digest
+    for _ in range(2):
+        groups = engine.get_prefix_keys(X, ledger)
+        assert_equal(len(groups), len(CACHED_PIPELINE_STEPS))
+        digests = [get_config_digest(get_prefix(config, CACHED_PIPELINE_STEPS[1])) for config in configs]
+        assert_equal([digest for _, digest in groups[1]],
+                     [digest if digest in ledger else None for digest in digests])
+        assert_true(all(digest == None for _, digest in groups[0]))
+        # Equal prefixes have equal keys
+        for (key, _), config in zip(groups[1], configs):
+            for (other_key, _), other_config in zip(groups[1], configs):
+                same_prefix = get_prefix(config, CACHED_PIPELINE_STEPS[1]) == \
+                              get_prefix(other_config, CACHED_PIPELINE_STEPS[1])
+                assert_equal(key == other_key, same_prefix)
+        for config in configs[5:10]:
+            ledger.add(get_prefix(config, CACHED_PIPELINE_STEPS[1]), 1.)
+
+
+if __name__ == "__main__":
+    test_compute_discounts()
+    test_get_prefix_keys()
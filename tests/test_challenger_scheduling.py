@@ -0,0 +1,42 @@
+
+from sklearn.utils.testing import assert_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import CategoricalHyperparameter, UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_runhistory.caching_discount import CachingDiscountEngine
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
+from pc_smac.pc_smac.pc_smbo.challenger_scheduling import ChallengerScheduler
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    config_space.add_hyperparameters([CategoricalHyperparameter("imputation:strategy", ["mean", "median"]),
+                                      UniformFloatHyperparameter("classifier:x", 0, 1)])
+    return config_space
+
+
+def test_random_configurations_keep_their_positions():
+    config_space = build_config_space()
+    runhistory = PCRunHistory(average_cost)
+    runhistory.add(config_space.sample_configuration(), 0.5, 3, StatusType.SUCCESS, instance_id=1, seed=0,
+                   additional_info={'t_rc': [({'imputation:strategy': 'median'}, 2.)]})
+    scheduler = ChallengerScheduler(CachingDiscountEngine(config_space, [["imputation"]]), band_size=4)
+
+    challengers = config_space.sample_configuration(size=12)
+    for challenger in challengers[1::2]:
+        challenger.origin = "Random Search"
+    scheduled = scheduler.schedule(challengers, runhistory)
+
+    assert_equal(scheduled[1::2], challengers[1::2])
+    assert_equal(sorted(scheduled[::2], key=challengers.index), challengers[::2])
+    # Within the first band of the ranked challengers, the ones of which the prefix is cached go first
+    strategies = [challenger['imputation:strategy'] for challenger in scheduled[::2][:4]]
+    assert_equal(strategies, sorted(strategies, key=lambda strategy: strategy != "median"))
+
+
+if __name__ == "__main__":
+    test_random_configurations_keep_their_positions()
@@ -0,0 +1,127 @@
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true, assert_false
+from sklearn.utils.testing import assert_array_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.scenario.scenario import Scenario
+from smac.stats.stats import Stats
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
+from pc_smac.pc_smac.pc_smbo.checkpoint import Checkpointer
+from pc_smac.pc_smac.pipeline.pipeline_builder import PipelineBuilder
+from pc_smac.pc_smac.pipeline_space.pipeline_space import PipelineSpace
+
+
+class SMBOState(object):
+    """The parts of an smbo object that are saved in a checkpoint"""
+
+    def __init__(self, config_space, output_dir):
+        scenario = Scenario({'cs': config_space,
+                             'run_obj': "quality",
+                             'runcount_limit': 10,
+                             'deterministic': "true"})
+        self.stats = Stats(scenario, output_dir=output_dir + "/smac/", stamp="test")
+        self.stats.start_timing()
+        self.runhistory = PCRunHistory(average_cost)
+        self.rng = np.random.RandomState(1)
+        self.incumbent = None
+
+
+def build_config_space():
+    config_space = ConfigurationSpace()
+    config_space.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+    return config_space
+
+
+def test_save_and_restore():
+    output_dir = tempfile.mkdtemp(prefix="testcheckpoint_")
+    try:
+        config_space = build_config_space()
+        smbo = SMBOState(config_space, output_dir)
+        config = config_space.sample_configuration()
+        smbo.runhistory.add(config, 0.3, 2, StatusType.SUCCESS, instance_id=1, seed=0,
+                            additional_info={'t_rc': [({'imputation:strategy': 'mean'}, 1.5)]})
+        smbo.incumbent = config
+        smbo.stats.ta_runs = 1
+        smbo.rng.rand(3)
+
+        checkpoint_directory = os.path.join(output_dir, "checkpoint")
+        checkpointer = Checkpointer(checkpoint_directory, config_space, checkpoint_every=0)
+        checkpointer.save(smbo, 5)
+
+        restored = SMBOState(config_space, output_dir)
+        assert_true(checkpointer.has_checkpoint())
+        assert_equal(checkpointer.restore(restored), 5)
+        assert_equal(restored.incumbent, config)
+        assert_equal(restored.stats.ta_runs, 1)
+        assert_equal(list(restored.runhistory.data.values()), list(smbo.runhistory.data.values()))
+        assert_equal(dict(restored.runhistory.get_cached_configurations()),
+                     dict(smbo.runhistory.get_cached_configurations()))
+        assert_array_equal(restored.rng.rand(3), smbo.rng.rand(3))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_restore_after_crash_while_saving():
+    output_dir = tempfile.mkdtemp(prefix="testcheckpoint_")
+    try:
+        config_space = build_config_space()
+        smbo = SMBOState(config_space, output_dir)
+        checkpoint_directory = os.path.join(output_dir, "checkpoint")
+        checkpointer = Checkpointer(checkpoint_directory, config_space, checkpoint_every=0)
+        checkpointer.save(smbo, 3)
+
+        # The process died after the previous checkpoint was moved aside
+        os.rename(checkpoint_directory, checkpoint_directory + "_old")
+        os.makedirs(checkpoint_directory + "_tmp")
+        assert_true(checkpointer.has_checkpoint())
+        assert_equal(checkpointer.restore(SMBOState(config_space, output_dir)), 3)
+
+        checkpointer.save(smbo, 4)
+        assert_equal(checkpointer.load_state()['iteration'], 4)
+        assert_false(os.path.exists(checkpoint_directory + "_old"))
+
+        checkpointer.remove()
+        assert_false(checkpointer.has_checkpoint())
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_cache_reuse():
+    output_dir = tempfile.mkdtemp(prefix="testcheckpoint_")
+    try:
+        cache_directory = os.path.join(output_dir, "cache")
+        os.makedirs(cache_directory)
+        pipeline_builder = PipelineBuilder(PipelineSpace(), caching=True, cache_directory=cache_directory)
+
+        config_space = build_config_space()
+        checkpoint_directory = os.path.join(output_dir, "checkpoint")
+        checkpointer = Checkpointer(checkpoint_directory, config_space, cache_directory=cache_directory,
+                                    cachedir=pipeline_builder.cachedir)
+        checkpointer.save(SMBOState(config_space, output_dir), 1)
+
+        # The resumed optimization uses the cache of the checkpoint instead of a new one
+        state = Checkpointer(checkpoint_directory, config_space).load_state()
+        resumed_pipeline_builder = PipelineBuilder(PipelineSpace(), caching=True,
+                                                   cache_directory=state['cache_directory'],
+                                                   cachedir=state['cachedir'])
+        assert_equal(resumed_pipeline_builder.cachedir, pipeline_builder.cachedir)
+        assert_equal(os.listdir(cache_directory), [os.path.basename(pipeline_builder.cachedir)])
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_save_and_restore()
+    test_restore_after_crash_while_saving()
+    test_cache_reuse()
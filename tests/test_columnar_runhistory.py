@@ -0,0 +1,139 @@
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal
+from sklearn.utils.testing import assert_array_equal, assert_array_almost_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.conditions import EqualsCondition
+from ConfigSpace.hyperparameters import CategoricalHyperparameter, UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.runhistory.runhistory2epm import RunHistory2EPM4Cost, RunHistory2EPM4LogCost, RunHistory2EPM4EIPS
+from smac.scenario.scenario import Scenario
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_runhistory.columnar_runhistory import ColumnarPCRunHistory, IncrementalRunHistory2EPM
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    choice = CategoricalHyperparameter("choice", ["a", "b"])
+    x = UniformFloatHyperparameter("x", 0, 1)
+    y = UniformFloatHyperparameter("y", 0, 1)
+    config_space.add_hyperparameters([choice, x, y])
+    # y is inactive for half of the configurations
+    config_space.add_condition(EqualsCondition(y, choice, "b"))
+    return config_space
+
+
+def build_converters(config_space):
+    scenario = Scenario({'cs': config_space,
+                         'run_obj': "quality",
+                         'cutoff_time': 10,
+                         'deterministic': "true"})
+    num_params = len(config_space.get_hyperparameters())
+    return [RunHistory2EPM4Cost(scenario, num_params, success_states=[StatusType.SUCCESS]),
+            RunHistory2EPM4LogCost(scenario, num_params, success_states=[StatusType.SUCCESS]),
+            RunHistory2EPM4EIPS(scenario, num_params, success_states=[StatusType.SUCCESS])]
+
+
+def add_runs(runhistory, configs, rng):
+    statuses = [StatusType.SUCCESS, StatusType.SUCCESS, StatusType.TIMEOUT, StatusType.CRASHED]
+    for config in configs:
+        status = statuses[rng.randint(len(statuses))]
+        time = 10 if status == StatusType.TIMEOUT else rng.rand() * 5
+        runhistory.add(config, rng.rand(), time, status, instance_id=1, seed=0)
+
+
+def test_incremental_transform():
+    config_space = build_config_space()
+    rng = np.random.RandomState(1)
+    for converter in build_converters(config_space):
+        runhistory = ColumnarPCRunHistory(average_cost, initial_capacity=4)
+        incremental = IncrementalRunHistory2EPM(converter, full_transform_every=None)
+
+        for _ in range(5):
+            add_runs(runhistory, config_space.sample_configuration(size=7), rng)
+            X, Y = incremental.transform(runhistory)
+            X_full, Y_full = converter.transform(runhistory)
+            assert_array_equal(X, X_full)
+            assert_array_almost_equal(Y, Y_full)
+
+
+def test_overwritten_runs():
+    config_space = build_config_space()
+    converter = build_converters(config_space)[0]
+    runhistory = ColumnarPCRunHistory(average_cost)
+    incremental = IncrementalRunHistory2EPM(converter, full_transform_every=None)
+    configs = config_space.sample_configuration(size=5)
+    for config in configs:
+        runhistory.add(config, 0.5, 1, StatusType.SUCCESS, instance_id=1, seed=0)
+    incremental.transform(runhistory)
+
+    runhistory.add(configs[2], 0.1, 1, StatusType.SUCCESS, instance_id=1, seed=0)
+    assert_equal(runhistory.num_overwrites, 1)
+    X, Y = incremental.transform(runhistory)
+    X_full, Y_full = converter.transform(runhistory)
+    assert_array_equal(X, X_full)
+    assert_array_equal(Y, Y_full)
+
+
+def test_row_keys():
+    config_space = build_config_space()
+    converter = build_converters(config_space)[0]
+    runhistory = ColumnarPCRunHistory(average_cost)
+    incremental = IncrementalRunHistory2EPM(converter, full_transform_every=None)
+    configs = config_space.sample_configuration(size=4)
+    runhistory.add(configs[0], 0.5, 1, StatusType.SUCCESS, instance_id=1, seed=0)
+    runhistory.add(configs[1], 0.7, 10, StatusType.TIMEOUT, instance_id=1, seed=0)
+    incremental.transform(runhistory)
+
+    runhistory.add(configs[2], 0.3, 1, StatusType.SUCCESS, instance_id=1, seed=0)
+    runhistory.add(configs[3], 0.9, 1, StatusType.CRASHED, instance_id=1, seed=0)
+    X, Y = incremental.transform(runhistory)
+    # The row of the new successful run goes before the timeout block, the crashed run has no row
+    row_keys = incremental.get_row_keys()
+    assert_equal(len(row_keys), X.shape[0])
+    assert_equal([runhistory.ids_config[key.config_id] for key in row_keys], [configs[0], configs[2], configs[1]])
+    assert_array_almost_equal(Y.ravel(), [0.5, 0.3, 0.7])
+
+    # The rows of a runhistory that is not columnar are not known
+    plain_runhistory = PCRunHistory(average_cost)
+    plain_runhistory.add(configs[0], 0.5, 1, StatusType.SUCCESS, instance_id=1, seed=0)
+    incremental.transform(plain_runhistory)
+    assert_equal(incremental.get_row_keys(), None)
+
+
+def test_load_json():
+    directory = tempfile.mkdtemp(prefix="testrunhistory_")
+    try:
+        config_space = build_config_space()
+        converter = build_converters(config_space)[0]
+        runhistory = ColumnarPCRunHistory(average_cost)
+        add_runs(runhistory, config_space.sample_configuration(size=10), np.random.RandomState(2))
+        runhistory.save_json(os.path.join(directory, "runhistory.json"))
+
+        restored = ColumnarPCRunHistory(average_cost)
+        restored.load_json(os.path.join(directory, "runhistory.json"), config_space)
+        assert_equal(restored.num_rows, len(restored.data))
+        assert_array_equal(restored.get_arrays()['costs'], runhistory.get_arrays()['costs'])
+
+        X, Y = IncrementalRunHistory2EPM(converter).transform(restored)
+        X_full, Y_full = converter.transform(runhistory)
+        assert_array_equal(X, X_full)
+        assert_array_equal(Y, Y_full)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_incremental_transform()
+    test_overwritten_runs()
+    test_row_keys()
+    test_load_json()
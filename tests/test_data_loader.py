@@ -0,0 +1,96 @@
+
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_array_equal, assert_raises
+
+from pc_smac.pc_smac.data_loader.data_loader import data_dense
+
+
+def old_data_dense(filename, feat_type):
+    # The line by line parser that data_dense replaced
+    r_comment = re.compile(r'^%')
+    r_empty = re.compile(r'^\s+$')
+    descr = [(str(i), np.float32) for i in range(len(feat_type))]
+
+    def generator(row_iter, delim=','):
+        raw = next(row_iter)
+        while r_empty.match(raw) or r_comment.match(raw):
+            raw = next(row_iter)
+        elems = list(range(len(feat_type)))
+        row = raw.split(delim)
+        yield tuple([row[i] for i in elems])
+        for raw in row_iter:
+            while r_comment.match(raw) or r_empty.match(raw):
+                raw = next(row_iter)
+            row = raw.split(delim)
+            yield tuple([row[i] for i in elems])
+
+    with open(filename) as fh:
+        data = np.fromiter(generator(fh, delim=' '), descr)
+        return data.view(np.float32).reshape((len(data), -1))
+
+
+def write_data_file(directory, lines):
+    filename = os.path.join(directory, "data.data")
+    with open(filename, "w") as fp:
+        fp.write("".join(lines))
+    return filename
+
+
+def assert_same_as_old_parser(filename, feat_type):
+    expected = old_data_dense(filename, feat_type)
+    # Blocks of a few bytes, such that lines, comments and empty lines are spread over many blocks
+    for block_size_in_mb in [64, 0.00002]:
+        for num_threads in [1, 3]:
+            data = data_dense(filename, feat_type, block_size_in_mb=block_size_in_mb, num_threads=num_threads)
+            assert_equal(data.dtype, np.float32)
+            assert_array_equal(data, expected)
+
+
+def test_data_dense():
+    directory = tempfile.mkdtemp(prefix="testdataloader_")
+    try:
+        rng = np.random.RandomState(1)
+        feat_type = ["Numerical"] * 3
+        rows = [" ".join(["%.6g" % value for value in rng.randn(3)]) for _ in range(50)]
+
+        # Plain rows
+        assert_same_as_old_parser(write_data_file(directory, [row + "\n" for row in rows]), feat_type)
+
+        # Comment lines and empty lines
+        lines = ["% comment\n"] + [row + "\n" for row in rows[:20]] + ["% 1 2 3\n", "\n", "  \n"] + \
+                [row + "\n" for row in rows[20:]]
+        assert_same_as_old_parser(write_data_file(directory, lines), feat_type)
+
+        # Trailing separators
+        assert_same_as_old_parser(write_data_file(directory, [row + " \n" for row in rows]), feat_type)
+
+        # Lines with more fields than features, only the first fields are used
+        lines = [row + " 7 8\n" if idx % 3 == 0 else row + "\n" for idx, row in enumerate(rows)]
+        assert_same_as_old_parser(write_data_file(directory, lines), feat_type)
+        assert_same_as_old_parser(write_data_file(directory, [row + " 7\n" for row in rows]), feat_type)
+
+        # A line with an extra field and one with a missing field have the right total number of values
+        lines = [row + "\n" for row in rows]
+        lines[10] = rows[10] + " 7\n"
+        lines[11] = " ".join(rows[11].split()[:2]) + "\n"
+        filename = write_data_file(directory, lines)
+        for block_size_in_mb in [64, 0.00002]:
+            assert_raises(ValueError, data_dense, filename, feat_type, block_size_in_mb=block_size_in_mb)
+        # As the old parser, which fails on the line with the missing field
+        assert_raises(IndexError, old_data_dense, filename, feat_type)
+
+        # No newline at the end of the file
+        filename = write_data_file(directory, "\n".join(rows))
+        assert_equal(data_dense(filename, feat_type, block_size_in_mb=0.00002).shape, (50, 3))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_data_dense()
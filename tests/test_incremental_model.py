@@ -0,0 +1,140 @@
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true
+from sklearn.utils.testing import assert_array_almost_equal
+
+from pc_smac.pc_smac.pc_smbo.incremental_model import IncrementalModel
+
+
+class DummyForest(object):
+    """Predicts the mean and the variance of the costs it is trained on, plus the first feature"""
+
+    def __init__(self, num_trees):
+        self.num_trees = num_trees
+        self.num_data = None
+        self.X = None
+        self.mean = None
+        self.var = None
+
+    def train(self, X, Y):
+        self.num_data = X.shape[0]
+        self.X = X
+        self.mean = np.mean(Y)
+        self.var = np.var(Y) + 0.01
+        return self
+
+    def predict(self, X):
+        return self.mean + X[:, :1], np.full((X.shape[0], 1), self.var)
+
+    def predict_marginalized_over_instances(self, X):
+        return self.predict(X)
+
+
+class DummyRunHistory2EPM(object):
+    """Knows the keys of the rows of the data it made last"""
+
+    def __init__(self):
+        self.row_keys = None
+
+    def get_row_keys(self):
+        return self.row_keys
+
+
+def build_incremental_model(full_retrain_every=3, retrain_growth_fraction=10.):
+    forests = []
+
+    def build_forest(num_trees):
+        forests.append(DummyForest(num_trees))
+        return forests[-1]
+
+    model = IncrementalModel(model=build_forest(10), model_factory=build_forest, num_trees=10, num_update_trees=2,
+                             full_retrain_every=full_retrain_every, retrain_growth_fraction=retrain_growth_fraction,
+                             runhistory2epm=DummyRunHistory2EPM())
+    return model, forests
+
+
+def get_data(num_data, model=None):
+    rng = np.random.RandomState(1)
+    X = rng.rand(num_data, 2)
+    # The costs of the later runs are higher
+    Y = np.arange(num_data, dtype=np.float64).reshape((num_data, 1))
+    if model is not None:
+        # One run per row, in the order of the runs
+        model.runhistory2epm.row_keys = list(range(num_data))
+    return X, Y
+
+
+def test_full_retrain_cadence():
+    model, forests = build_incremental_model(full_retrain_every=3)
+    training_types = []
+    for num_data in range(10, 17):
+        model.train(*get_data(num_data, model))
+        training_types.append(model.last_training_type)
+    assert_equal(training_types, ['full', 'update', 'update', 'full', 'update', 'update', 'full'])
+    assert_equal([training_type for training_type, _ in model.training_times], training_types)
+
+    # The update forests only get the rows since the last full training
+    assert_equal(forests[0].num_data, 16)
+    assert_equal([forest.num_data for forest in forests[1:]], [1, 2, 1, 2])
+    assert_true(all(forest.num_trees == 2 for forest in forests[1:]))
+
+    # The data grew by more than the fraction since the last full training
+    model, forests = build_incremental_model(full_retrain_every=10, retrain_growth_fraction=0.2)
+    training_types = []
+    for num_data in [10, 11, 12, 13]:
+        model.train(*get_data(num_data, model))
+        training_types.append(model.last_training_type)
+    assert_equal(training_types, ['full', 'update', 'update', 'full'])
+
+
+def test_mixed_predictions():
+    model, forests = build_incremental_model(full_retrain_every=5)
+    model.train(*get_data(10, model))
+    X_test = np.random.RandomState(2).rand(5, 2)
+    full_mean, full_var = forests[0].predict(X_test)
+    assert_array_almost_equal(model.predict(X_test)[0], full_mean)
+
+    # Without new rows there is nothing to update
+    model.train(*get_data(10, model))
+    assert_true(model.update_model is None)
+    assert_array_almost_equal(model.predict(X_test)[0], full_mean)
+
+    model.train(*get_data(12, model))
+    update_mean, update_var = forests[-1].predict(X_test)
+    mean, var = model.predict(X_test)
+    assert_array_almost_equal(model.update_weight, 2. / 12)
+    assert_true(np.all(np.minimum(full_mean, update_mean) <= mean))
+    assert_true(np.all(mean <= np.maximum(full_mean, update_mean)))
+    assert_array_almost_equal(mean, (10. / 12) * full_mean + (2. / 12) * update_mean)
+    # The variance of the mixture covers the disagreement of both forests
+    assert_true(np.all(var >= np.minimum(full_var, update_var)))
+    assert_array_almost_equal(model.predict_marginalized_over_instances(X_test)[0], mean)
+
+
+def test_new_rows_inside_the_data():
+    model, forests = build_incremental_model(full_retrain_every=5)
+    rng = np.random.RandomState(1)
+    X_success, X_timeout, X_transfer = rng.rand(12, 2), rng.rand(2, 2), rng.rand(3, 2)
+    transfer_keys = [('transfer', row) for row in range(3)]
+
+    # The successful runs, followed by the timeouts and the transfer rows of a warm start
+    X = np.vstack((X_success[:10], X_timeout, X_transfer))
+    model.runhistory2epm.row_keys = list(range(10)) + ['timeout_0', 'timeout_1'] + transfer_keys
+    model.train(X, np.zeros((X.shape[0], 1)))
+    assert_equal(model.last_training_type, 'full')
+
+    # Two new successful runs go before the timeouts, a pending run is a fantasy after all rows
+    X_fantasy = rng.rand(1, 2)
+    X = np.vstack((X_success, X_timeout, X_transfer, X_fantasy))
+    model.runhistory2epm.row_keys = list(range(12)) + ['timeout_0', 'timeout_1'] + transfer_keys
+    model.train(X, np.zeros((X.shape[0], 1)))
+    assert_equal(model.last_training_type, 'update')
+    assert_array_almost_equal(forests[-1].X, np.vstack((X_success[10:], X_fantasy)))
+    assert_array_almost_equal(model.update_weight, 3. / X.shape[0])
+
+    # Without the keys of the rows the model is fully retrained
+    model.runhistory2epm.row_keys = None
+    model.train(X, np.zeros((X.shape[0], 1)))
+    assert_equal(model.last_training_type, 'full')
+    assert_true(model.update_model is None)
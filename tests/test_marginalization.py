@@ -0,0 +1,128 @@
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true
+from sklearn.utils.testing import assert_array_almost_equal, assert_array_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace, Configuration
+from ConfigSpace.conditions import EqualsCondition
+from ConfigSpace.hyperparameters import CategoricalHyperparameter, UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
+from pc_smac.pc_smac.pc_smbo.marginalization import VectorizedMarginalization, \
+    SelectConfigurationsWithVectorizedMarginalization
+from pc_smac.pc_smac.pc_smbo.overhead import OverheadRecorder
+
+
+class Struct(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class DummyAcquisitionFunction(object):
+    """A fixed non-linear function of the configuration vectors, one value per row"""
+
+    def __init__(self, num_hyperparameters):
+        self.weights = np.linspace(-1, 1, num_hyperparameters)
+        self.eta = None
+
+    def update(self, model, eta):
+        self.eta = eta
+
+    def __call__(self, X):
+        assert_true(not np.any(np.isnan(X)))
+        return np.sin(3 * X.dot(self.weights)).reshape((-1, 1))
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    preprocessor = CategoricalHyperparameter("preprocessor:__choice__", ["none", "pca"])
+    keep = UniformFloatHyperparameter("preprocessor:pca:keep", 0.5, 1)
+    classifier = CategoricalHyperparameter("classifier:__choice__", ["sgd", "tree"])
+    alpha = UniformFloatHyperparameter("classifier:sgd:alpha", 0.001, 1)
+    depth = UniformFloatHyperparameter("classifier:tree:depth", 1, 10)
+    config_space.add_hyperparameters([preprocessor, keep, classifier, alpha, depth])
+    config_space.add_condition(EqualsCondition(keep, preprocessor, "pca"))
+    config_space.add_condition(EqualsCondition(alpha, classifier, "sgd"))
+    config_space.add_condition(EqualsCondition(depth, classifier, "tree"))
+    return config_space
+
+
+def marginalize_per_candidate(acquisition_func, config_space, marginalization, prefix_configs, samples):
+    # Every prefix is completed with every sample as a configuration and scored on its own
+    means, best_samples = [], []
+    for config in prefix_configs:
+        values = []
+        for sample in samples:
+            config_dict = dict((name, value) for name, value in config.get_dictionary().items()
+                               if not name.startswith("classifier"))
+            config_dict.update(dict((name, value) for name, value in sample.get_dictionary().items()
+                                    if name.startswith("classifier")))
+            vector = Configuration(config_space, values=config_dict).get_array()
+            values.append(acquisition_func(marginalization.impute(vector.reshape((1, -1))))[0, 0])
+        means.append(np.mean(values))
+        best_samples.append(np.argmax(values))
+    return np.array(means), np.array(best_samples)
+
+
+def test_batched_equals_per_candidate_marginalization():
+    config_space = build_config_space()
+    acquisition_func = DummyAcquisitionFunction(len(config_space.get_hyperparameters()))
+    marginalization = VectorizedMarginalization(acquisition_func, config_space, ["classifier"], num_samples=7)
+
+    samples = config_space.sample_configuration(size=7)
+    marginalization.samples = np.array([sample.get_array() for sample in samples])[:, marginalization.variable_columns]
+    prefix_configs = config_space.sample_configuration(size=12)
+
+    values, best_samples = marginalization(np.array([config.get_array() for config in prefix_configs]))
+    expected_values, expected_best_samples = marginalize_per_candidate(acquisition_func, config_space,
+                                                                       marginalization, prefix_configs, samples)
+    assert_array_almost_equal(values, expected_values)
+    assert_array_equal(best_samples, expected_best_samples)
+
+    # A single candidate vector is a batch of one
+    value, best_sample = marginalization(prefix_configs[0].get_array())
+    assert_array_almost_equal(value, expected_values[:1])
+    assert_equal(best_sample[0], expected_best_samples[0])
+
+
+def test_select_without_incumbent():
+    config_space = build_config_space()
+    runhistory = PCRunHistory(average_cost)
+    configs = config_space.sample_configuration(size=2)
+    runhistory.add(configs[0], 0.4, 1, StatusType.SUCCESS, instance_id=0, seed=0)
+    runhistory.add(configs[1], 0.3, 1, StatusType.SUCCESS, instance_id=0, seed=0)
+
+    acquisition_func = DummyAcquisitionFunction(len(config_space.get_hyperparameters()))
+    select_configuration = SelectConfigurationsWithVectorizedMarginalization(
+        scenario=Struct(cs=config_space),
+        runhistory=runhistory,
+        model=Struct(train=lambda X, Y: None),
+        acquisition_func=acquisition_func,
+        rng=np.random.RandomState(1),
+        variable_pipeline_steps=["classifier"],
+        num_configs_for_marginalization=5,
+        overhead_recorder=OverheadRecorder(statistics=None))
+
+    challengers = select_configuration.run(np.zeros((2, 5)), np.array([[0.4], [0.3]]), incumbent=None,
+                                           num_configurations_by_random_search_sorted=10,
+                                           num_configurations_by_local_search=2)
+    # The best observed cost replaces the cost of the incumbent
+    assert_equal(acquisition_func.eta, 0.3)
+    assert_true(len(challengers) > 0)
+    assert_equal(challengers[1::2], [config for config in challengers[1::2] if config.origin == "Random Search"])
+
+    # Every part of the acquisition optimization is recorded once
+    recorder = select_configuration.overhead_recorder
+    assert_equal(recorder.counts['num_random_search_candidates'], 10)
+    assert_equal(recorder.counts['num_local_searches'], 2)
+    assert_true(recorder.counts['num_marginalized_candidates'] >= 10)
+    assert_true(recorder.timings['acquisition_local_search'] > 0)
+
+    select_configuration.run(np.zeros((2, 5)), np.array([[0.4], [0.3]]), incumbent=configs[0],
+                             num_configurations_by_random_search_sorted=10, num_configurations_by_local_search=2)
+    assert_equal(acquisition_func.eta, 0.4)
@@ -0,0 +1,94 @@
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true, assert_false, assert_not_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory, CachedConfigurationLedger
+from pc_smac.pc_smac.utils.config_digest import get_config_digest
+
+
+PREPROCESSOR = {'imputation:strategy': 'mean', 'rescaling:__choice__': 'standardize'}
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    config_space.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+    return config_space
+
+
+def test_config_digest():
+    config = {'classifier:__choice__': 'sgd', 'classifier:sgd:alpha': 0.01, 'classifier:sgd:n_iter': 5}
+    digest = get_config_digest(config)
+    assert_equal(digest, get_config_digest(dict(reversed(list(config.items())))))
+    assert_equal(digest, get_config_digest({'classifier:__choice__': 'sgd', 'classifier:sgd:alpha': 0.01,
+                                            'classifier:sgd:n_iter': np.int64(5)}))
+    assert_not_equal(digest, get_config_digest({'classifier:__choice__': 'sgd', 'classifier:sgd:alpha': 0.02,
+                                                'classifier:sgd:n_iter': 5}))
+
+
+def test_ledger():
+    ledger = CachedConfigurationLedger()
+    assert_true(ledger.add(PREPROCESSOR, 2.5))
+    assert_false(ledger.add(dict(reversed(list(PREPROCESSOR.items()))), 3.))
+    assert_equal(ledger.get_runtime(PREPROCESSOR), 2.5)
+    assert_equal(ledger.get_hits(PREPROCESSOR), 1)
+    # The ledger is keyed by digests only
+    assert_false(hash(frozenset(PREPROCESSOR.items())) in ledger)
+
+    restored = CachedConfigurationLedger.from_json_dict(ledger.to_json_dict())
+    assert_equal(dict(restored), dict(ledger))
+    assert_equal(restored.hits, ledger.hits)
+
+    # A ledger that was stored with the process dependent keys is converted to digests
+    old_json_dict = {str(hash(frozenset(PREPROCESSOR.items()))): {'config': PREPROCESSOR, 'runtime': 2.5, 'hits': 1}}
+    converted = CachedConfigurationLedger.from_json_dict(old_json_dict)
+    assert_equal(dict(converted), dict(ledger))
+    assert_equal(converted.hits, ledger.hits)
+    assert_equal(converted.get_runtime(PREPROCESSOR), 2.5)
+
+
+def test_ledger_merge():
+    directory = tempfile.mkdtemp(prefix="testrunhistory_")
+    try:
+        config_space = build_config_space()
+        # The peer hits the cached preprocessor with three of its four runs
+        peer = PCRunHistory(average_cost)
+        for config in config_space.sample_configuration(size=4):
+            peer.add(config, 0.5, 3, StatusType.SUCCESS, instance_id=1, seed=0,
+                     additional_info={'t_rc': [(PREPROCESSOR, 2.)]})
+        assert_equal(peer.get_cached_configurations().get_hits(PREPROCESSOR), 3)
+        peer_file = os.path.join(directory, "runhistory_peer.json")
+        peer.save_json(peer_file)
+
+        runhistory = PCRunHistory(average_cost)
+        runhistory.add(config_space.sample_configuration(), 0.4, 3, StatusType.SUCCESS, instance_id=1, seed=0,
+                       additional_info={'t_rc': [(PREPROCESSOR, 2.)]})
+        runhistory.update_from_json(peer_file, config_space)
+        runhistory.update_from_json(peer_file, config_space)
+
+        ledger = runhistory.get_cached_configurations()
+        assert_equal(len(runhistory.data), 5)
+        assert_equal(ledger.get_hits(PREPROCESSOR), 3)
+        assert_equal(ledger.get_runtime(PREPROCESSOR), 2.)
+
+        # The runs of the peer keep the runtime they were recorded with
+        assert_equal(sorted([run.time for run in runhistory.data.values()]),
+                     sorted([3] + [run.time for run in peer.data.values()]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_config_digest()
+    test_ledger()
+    test_ledger_merge()
@@ -0,0 +1,70 @@
+
+import os
+import shutil
+import tempfile
+
+from sklearn.utils.testing import assert_equal, assert_true
+
+from pc_smac.pc_smac.config_space.config_space_builder import ConfigSpaceBuilder
+from pc_smac.pc_smac.data_loader.data_loader import DataLoader
+from pc_smac.pc_smac.pipeline.pipeline_runner import PipelineTester
+from pc_smac.pc_smac.pipeline_space.pipeline_space import PipelineSpace
+from pc_smac.pc_smac.pipeline_space.pipeline_step import OneHotEncodingStep, ImputationStep, RescalingStep, \
+    BalancingStep, PreprocessingStep, ClassificationStep
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "46_bac")
+
+
+def build_pipeline_tester(cache_directory=None, cachedir=None):
+    data_loader = DataLoader(DATA_PATH)
+    pipeline_space = PipelineSpace()
+    pipeline_space.add_pipeline_steps([OneHotEncodingStep(), ImputationStep(), RescalingStep(), BalancingStep(),
+                                       PreprocessingStep(), ClassificationStep()])
+    config_space = ConfigSpaceBuilder(pipeline_space).build_config_space(seed=1,
+                                                                         dataset_properties=data_loader.info)
+    pipeline_tester = PipelineTester(data_loader.get_data(), data_loader.info, pipeline_space, downsampling=200,
+                                     cache_directory=cache_directory, cachedir=cachedir)
+    return pipeline_tester, config_space
+
+
+def test_groups():
+    pipeline_tester, config_space = build_pipeline_tester()
+    configs = {str(i): config for i, config in enumerate(config_space.sample_configuration(size=20))}
+    prefix_keys = {key: pipeline_tester._get_prefix_keys(config.get_dictionary()) for key, config in configs.items()}
+
+    # With one process, the configurations that share the prefix up to the first cached step are tested together
+    groups = pipeline_tester._get_groups(configs, num_workers=1)
+    for group in groups:
+        assert_equal(len(set(prefix_keys[key][0] for key in group)), 1)
+        assert_equal(group, sorted(group, key=lambda key: prefix_keys[key]))
+    assert_equal(sorted(key for group in groups for key in group), sorted(configs.keys()))
+
+    # Every process gets a group if there are enough different prefixes
+    num_prefixes = len(set(keys[-1] for keys in prefix_keys.values()))
+    groups = pipeline_tester._get_groups(configs, num_workers=num_prefixes)
+    assert_equal(len(groups), num_prefixes)
+
+
+def test_get_errors():
+    cache_directory = tempfile.mkdtemp(prefix="testtester_")
+    try:
+        pipeline_tester, config_space = build_pipeline_tester(cache_directory=cache_directory)
+        configs = config_space.sample_configuration(size=4)
+        configs = configs + configs[:2]
+        errors = pipeline_tester.get_errors(configs, num_workers=1)
+        assert_equal(len(errors), 6)
+        assert_equal(errors[4:], errors[:2])
+        assert_equal(pipeline_tester.get_errors(configs, num_workers=2), errors)
+
+        # The tester that fits in the cache of another one leaves it in place
+        shared_tester, _ = build_pipeline_tester(cachedir=pipeline_tester.pipeline_builder.cachedir)
+        assert_equal(shared_tester.get_errors(configs[:2]), errors[:2])
+        shared_tester.clean_cache()
+        assert_true(os.path.exists(pipeline_tester.pipeline_builder.cachedir))
+    finally:
+        shutil.rmtree(cache_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_groups()
+    test_get_errors()
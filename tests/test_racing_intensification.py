@@ -0,0 +1,116 @@
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true, assert_false
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.runhistory.runhistory import RunHistory
+from smac.tae.execute_ta_run import StatusType, CappedRunException
+
+from pc_smac.pc_smac.pc_smbo.racing_intensification import RacingIntensifier
+
+
+def build_racing_intensifier():
+    return RacingIntensifier(tae_runner=None, stats=None, traj_logger=None, rng=np.random.RandomState(1),
+                             instances=list(range(6)), deterministic=True, alpha=0.05, min_folds_for_test=3)
+
+
+def build_runhistory(incumbent_costs, challenger_costs):
+    config_space = ConfigurationSpace(seed=1)
+    config_space.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+    incumbent, challenger = config_space.sample_configuration(size=2)
+    runhistory = RunHistory(average_cost)
+    for config, costs in [(incumbent, incumbent_costs), (challenger, challenger_costs)]:
+        for instance, cost in enumerate(costs):
+            runhistory.add(config, cost, 1, StatusType.SUCCESS, instance_id=instance, seed=0)
+    return incumbent, challenger, runhistory
+
+
+class Struct(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class DummyTAERunner(object):
+    """Adds a run with the cost of the instance to the runhistory, the run on capped_instance is capped"""
+
+    def __init__(self, runhistory, costs, capped_instance=None):
+        self.runhistory = runhistory
+        self.costs = costs
+        self.capped_instance = capped_instance
+
+    def start(self, config, instance, seed, cutoff, instance_specific="0"):
+        if instance == self.capped_instance:
+            self.runhistory.add(config, self.costs[instance], cutoff, StatusType.CAPPED, instance_id=instance,
+                                seed=seed)
+            raise CappedRunException("")
+        self.runhistory.add(config, self.costs[instance], 1, StatusType.SUCCESS, instance_id=instance, seed=seed)
+
+
+def race(challenger_costs, capped_instance=None):
+    incumbent, challenger, runhistory = build_runhistory([0.2] * 6, [])
+    intensifier = build_racing_intensifier()
+    intensifier.tae_runner = DummyTAERunner(runhistory, challenger_costs, capped_instance)
+    intensifier.stats = Struct(inc_changed=0)
+    intensifier.traj_logger = Struct(add_entry=lambda **kwargs: None)
+    intensifier._num_run = 0
+    intensifier._chall_indx = 0
+    new_incumbent = intensifier._race(challenger, incumbent, runhistory, average_cost)
+    return new_incumbent == challenger, len(runhistory.get_runs_for_config(challenger)), intensifier.num_folds_saved
+
+
+def is_rejected(incumbent_costs, challenger_costs):
+    incumbent, challenger, runhistory = build_runhistory(incumbent_costs, challenger_costs)
+    return build_racing_intensifier().is_rejected(challenger, incumbent, runhistory)
+
+
+def test_is_rejected():
+    # No common folds yet
+    assert_false(is_rejected([0.1] * 6, []))
+
+    # The challenger cannot reach the mean cost of the incumbent anymore, even with a cost of 0 on the other folds
+    assert_true(is_rejected([0.1] * 6, [0.5, 0.5]))
+    assert_true(is_rejected([0.2] * 6, [0.25] * 6))
+    assert_false(is_rejected([0.1] * 6, [0.1, 0.12]))
+
+    # The challenger is significantly worse on enough folds
+    assert_true(is_rejected([0.2] * 6, [0.25, 0.26, 0.24, 0.25]))
+    assert_false(is_rejected([0.2] * 6, [0.25, 0.26]))
+    # The differences are the same on every fold
+    assert_true(is_rejected([0.2] * 6, [0.25, 0.25, 0.25]))
+    assert_false(is_rejected([0.2] * 6, [0.2, 0.2, 0.2]))
+
+    # The challenger is not significantly worse
+    assert_false(is_rejected([0.2] * 6, [0.3, 0.1, 0.25, 0.15]))
+
+    # A single crashed fold rejects the challenger by the bound, however good its other folds are
+    assert_true(is_rejected([0.2] * 6, [1234567890]))
+    assert_true(is_rejected([0.2] * 6, [0.01] * 5 + [1234567890]))
+
+
+def test_folds_saved():
+    # The challenger is better on all folds
+    is_incumbent, num_runs, num_folds_saved = race([0.1] * 6)
+    assert_true(is_incumbent)
+    assert_equal((num_runs, num_folds_saved), (6, 0))
+
+    # The race ends at the crashed fold, the folds after it are saved
+    crash_costs = [0.1] * 6
+    crash_costs[3] = 1234567890
+    is_incumbent, num_runs, num_folds_saved = race(crash_costs)
+    assert_false(is_incumbent)
+    assert_equal(num_folds_saved, 6 - num_runs)
+
+    # The capped fold was run, so only the folds after it are saved
+    is_incumbent, num_runs, num_folds_saved = race([0.1] * 6, capped_instance=3)
+    assert_false(is_incumbent)
+    assert_equal(num_folds_saved, 6 - num_runs)
+
+
+if __name__ == "__main__":
+    test_is_rejected()
+    test_folds_saved()
@@ -0,0 +1,207 @@
+import os
+import shutil
+import tempfile
+
+from sklearn.utils.testing import assert_equal, assert_true
+from sklearn.utils.testing import assert_array_almost_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.config_space.config_space_builder import ConfigSpaceBuilder
+from pc_smac.pc_smac.data_loader.data_loader import DataLoader
+from pc_smac.pc_smac.pipeline.pipeline_runner import PipelineRunner
+from pc_smac.pc_smac.pipeline_space.pipeline_space import PipelineSpace
+from pc_smac.pc_smac.pipeline_space.pipeline_step import OneHotEncodingStep, ImputationStep, RescalingStep, \
+    BalancingStep, PreprocessingStep, ClassificationStep
+from pc_smac.pc_smac.random_search.random_search import TreeRandomSearch, SuccessiveHalvingRandomSearch
+from pc_smac.pc_smac.utils.statistics import Statistics
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "46_bac")
+
+CONSTANT_PIPELINE_STEPS = ["one_hot_encoder", "imputation", "rescaling", "balancing", "feature_preprocessor"]
+VARIABLE_PIPELINE_STEPS = ["classifier"]
+
+
+def build_tree_random_search(output_dir):
+    data_loader = DataLoader(DATA_PATH)
+    pipeline_space = PipelineSpace()
+    pipeline_space.add_pipeline_steps([OneHotEncodingStep(), ImputationStep(), RescalingStep(), BalancingStep(),
+                                       PreprocessingStep(), ClassificationStep()])
+    config_space = ConfigSpaceBuilder(pipeline_space).build_config_space(seed=1,
+                                                                         dataset_properties=data_loader.info)
+    statistics = Statistics("test", output_dir, information={})
+    pipeline_runner = PipelineRunner(data_loader.get_data(), data_loader.info, pipeline_space, None, statistics,
+                                     downsampling=200)
+    random_search = TreeRandomSearch(config_space=config_space,
+                                     pipeline_runner=pipeline_runner,
+                                     wallclock_limit=None,
+                                     memory_limit=None,
+                                     statistics=statistics,
+                                     constant_pipeline_steps=CONSTANT_PIPELINE_STEPS,
+                                     variable_pipeline_steps=VARIABLE_PIPELINE_STEPS,
+                                     splitting_number=4,
+                                     prefix_sharing=True)
+    statistics.start_timer()
+    return random_search
+
+
+def test_batch_of_configurations():
+    output_dir = tempfile.mkdtemp(prefix="testrandomsearch_")
+    try:
+        random_search = build_tree_random_search(output_dir)
+        pipeline_runner = random_search.pipeline_runner
+        for _ in range(5):
+            configs = random_search.sample_batch_of_configurations()
+            assert_equal(len(configs), 4)
+            # All configurations of the batch share the prefix of the start configuration
+            assert_equal(len(set(pipeline_runner.get_prefix_key(config) for config in configs)), 1)
+            for config in configs:
+                random_search.config_space.check_configuration(config)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_batch_fits_prefix_once():
+    output_dir = tempfile.mkdtemp(prefix="testrandomsearch_")
+    try:
+        random_search = build_tree_random_search(output_dir)
+        configs = random_search.sample_batch_of_configurations()
+        batch_results = random_search.run_batch_with_limits(configs, instance=1, cutoff=60, seed=None)
+
+        assert_equal(len(random_search.shared_prefixes), 1)
+        key, prefix = list(random_search.shared_prefixes.items())[0]
+        assert_equal(key, (random_search.pipeline_runner.get_prefix_key(configs[0]), 1))
+        assert_true(random_search.pipeline_runner.shared_prefix is None)
+
+        # The configurations get the same costs as when they are evaluated one by one
+        single_results = [random_search.run_with_limits(config, instance=1, cutoff=60, seed=None)
+                          for config in configs]
+        assert_equal([status for status, _, _, _ in batch_results], [status for status, _, _, _ in single_results])
+        assert_array_almost_equal([cost for _, cost, _, _ in batch_results],
+                                  [cost for _, cost, _, _ in single_results])
+        # The time of the prefix counts for every configuration
+        assert_true(all(runtime >= prefix.runtime for _, _, runtime, _ in batch_results))
+
+        # A later batch with the same prefix does not fit it again
+        random_search.run_batch_with_limits(configs[:2], instance=1, cutoff=60, seed=None)
+        assert_true(random_search.shared_prefixes[key] is prefix)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+class DummyPipelineRunner(object):
+
+    def __init__(self, num_cross_validation_folds):
+        self.num_cross_validation_folds = num_cross_validation_folds
+
+    def run(self, config, instance, seed):
+        pass
+
+
+class DummyWorkerPool(object):
+    """The cost of a configuration is x on every fold, configurations with x > crash_threshold crash"""
+
+    def __init__(self, crash_threshold=1.):
+        self.crash_threshold = crash_threshold
+        self.runs = []
+
+    def run(self, config, instance=None, cutoff=None, seed=12345):
+        self.runs.append((config, instance))
+        if config["x"] > self.crash_threshold:
+            return StatusType.CRASHED, 1234567890, 1., {}
+        return StatusType.SUCCESS, config["x"], 1., {}
+
+
+class DummyStatistics(object):
+
+    def __init__(self, run_limit):
+        self.run_limit = run_limit
+        self.nb_runs = 0
+        self.rungs = []
+        self.incumbents = []
+
+    def start_timer(self):
+        return 0
+
+    def is_budget_exhausted(self):
+        return self.nb_runs >= self.run_limit
+
+    def add_run_nb(self):
+        self.nb_runs += 1
+
+    def add_rung(self, information):
+        self.rungs.append(information)
+
+    def add_new_incumbent(self, incumbent, information, config_origin="Unknown"):
+        self.incumbents.append((incumbent, information))
+
+
+def build_successive_halving(num_folds, run_limit, crash_threshold=1., eta=3):
+    config_space = ConfigurationSpace(seed=1)
+    config_space.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+    statistics = DummyStatistics(run_limit)
+    random_search = SuccessiveHalvingRandomSearch(config_space=config_space,
+                                                  pipeline_runner=DummyPipelineRunner(num_folds),
+                                                  wallclock_limit=None,
+                                                  memory_limit=None,
+                                                  statistics=statistics,
+                                                  eta=eta,
+                                                  worker_pool=DummyWorkerPool(crash_threshold))
+    return random_search, statistics
+
+
+def test_successive_halving_rungs():
+    # One bracket: 9 configurations on 1 fold, 3 on 3 folds and 1 on 9 folds
+    random_search, statistics = build_successive_halving(num_folds=9, run_limit=9 + 3 * 2 + 6)
+    assert_equal(random_search.num_rungs, 3)
+    assert_equal(random_search.num_configs, 9)
+    incumbent = random_search.run(cutoff=None)
+
+    assert_equal([rung['num_configs'] for rung in statistics.rungs], [9, 3, 1])
+    assert_equal([rung['num_folds'] for rung in statistics.rungs], [1, 3, 9])
+    assert_equal([rung['num_promoted'] for rung in statistics.rungs], [3, 1, 0])
+
+    # The best configurations of a rung are promoted
+    first_rung = statistics.rungs[0]['configs']
+    costs = sorted(config['cost'] for config in first_rung)
+    assert_equal(sorted(config['cost'] for config in first_rung if config['promoted']), costs[:3])
+    assert_array_almost_equal([config['cost'] for config in statistics.rungs[1]['configs']], costs[:3])
+
+    # The incumbent is the configuration on all folds
+    assert_equal(incumbent["x"], costs[0])
+    assert_array_almost_equal(statistics.incumbents[-1][1]['cost'], costs[0])
+    assert_equal(statistics.incumbents[-1][1]['num_folds'], 9)
+    assert_equal(len(random_search.worker_pool.runs), 9 + 3 * 2 + 6)
+
+
+def test_successive_halving_failed_runs():
+    # The configurations with x > 0.3 crash on their first fold
+    random_search, statistics = build_successive_halving(num_folds=9, run_limit=100, crash_threshold=0.3)
+    random_search._run_bracket(0, [random_search.config_space.sample_configuration() for _ in range(9)], None)
+
+    first_rung = statistics.rungs[0]
+    num_failed = len([config for config in first_rung['configs'] if config['config']['x'] > 0.3])
+    assert_equal(first_rung['num_failed'], num_failed)
+    assert_true(all(not config['promoted'] for config in first_rung['configs'] if config['failed']))
+    assert_equal(first_rung['num_promoted'], min(3, 9 - num_failed))
+    assert_true(all(incumbent['x'] <= 0.3 for incumbent, _ in statistics.incumbents))
+
+
+def test_successive_halving_single_rung():
+    # With fewer folds than eta, every configuration is evaluated on all folds
+    random_search, statistics = build_successive_halving(num_folds=2, run_limit=4)
+    assert_equal(random_search.num_rungs, 1)
+    assert_equal(random_search.num_configs, 1)
+    random_search.run(cutoff=None)
+    assert_equal([rung['num_folds'] for rung in statistics.rungs], [2, 2])
+
+
+if __name__ == "__main__":
+    test_batch_of_configurations()
+    test_batch_fits_prefix_once()
+    test_successive_halving_rungs()
+    test_successive_halving_failed_runs()
+    test_successive_halving_single_rung()
@@ -0,0 +1,67 @@
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true
+
+from ConfigSpace.configuration_space import ConfigurationSpace, Configuration
+from ConfigSpace.conditions import EqualsCondition, InCondition
+from ConfigSpace.forbidden import ForbiddenEqualsClause, ForbiddenAndConjunction
+from ConfigSpace.hyperparameters import CategoricalHyperparameter, UniformFloatHyperparameter
+
+from pc_smac.pc_smac.random_search.recombination import ConfigurationRecombiner
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    preprocessor = CategoricalHyperparameter("preprocessor:__choice__", ["none", "pca"])
+    keep = UniformFloatHyperparameter("preprocessor:pca:keep", 0.5, 1)
+    classifier = CategoricalHyperparameter("classifier:__choice__", ["sgd", "tree"])
+    alpha = UniformFloatHyperparameter("classifier:sgd:alpha", 0.001, 1)
+    # Conditions and a forbidden clause across the constant and the variable pipeline steps
+    scale = UniformFloatHyperparameter("classifier:scale", 0, 1)
+    shrink = CategoricalHyperparameter("classifier:shrink", ["yes", "no"])
+    config_space.add_hyperparameters([preprocessor, keep, classifier, alpha, scale, shrink])
+    config_space.add_condition(EqualsCondition(keep, preprocessor, "pca"))
+    config_space.add_condition(EqualsCondition(alpha, classifier, "sgd"))
+    config_space.add_condition(EqualsCondition(scale, preprocessor, "none"))
+    config_space.add_condition(InCondition(shrink, preprocessor, ["pca"]))
+    config_space.add_forbidden_clause(ForbiddenAndConjunction(ForbiddenEqualsClause(preprocessor, "pca"),
+                                                              ForbiddenEqualsClause(classifier, "tree")))
+    return config_space
+
+
+def is_valid(config_space, vector):
+    try:
+        config = Configuration(configuration_space=config_space, vector=vector)
+        config.is_valid_configuration()
+        config_space._check_forbidden(vector)
+    except ValueError:
+        return False
+    return True
+
+
+def test_combine():
+    config_space = build_config_space()
+    recombiner = ConfigurationRecombiner(config_space, ["preprocessor"], ["classifier"])
+    completions = config_space.sample_configuration(size=40)
+    completion_vectors = np.array([config.get_array() for config in completions])
+
+    num_valid = 0
+    for start_config in config_space.sample_configuration(size=6):
+        X = recombiner.combine_vectors(start_config.get_array(), completion_vectors)
+        expected = np.array([is_valid(config_space, vector) for vector in X])
+        valid = ~recombiner.is_forbidden(X) & recombiner.satisfies_conditions(X)
+        assert_equal(list(valid), list(expected))
+
+        combined = recombiner.combine(start_config, completions)
+        assert_equal(len(combined), np.sum(expected))
+        for config in combined:
+            assert_true(is_valid(config_space, config.get_array()))
+            assert_equal(config["preprocessor:__choice__"], start_config["preprocessor:__choice__"])
+        num_valid += len(combined)
+    # Some but not all combinations are valid
+    assert_true(0 < num_valid < 6 * 40)
+
+
+if __name__ == "__main__":
+    test_combine()
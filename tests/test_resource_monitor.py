@@ -0,0 +1,84 @@
+
+import time
+import tracemalloc
+
+import numpy as np
+import scipy.sparse
+
+from sklearn.utils.testing import assert_equal, assert_true, assert_false, assert_greater
+
+from pc_smac.pc_smac.pipeline.resource_monitor import StepResourceMonitor, RSSSampler
+
+
+def test_peak_of_freed_temporary_array():
+    X = np.zeros((10, 3))
+    sampler = RSSSampler(sampling_interval=0.005)
+    monitor = StepResourceMonitor(sampler=sampler)
+    monitor.start(X)
+
+    # The step allocates 200MB, keeps it a while and frees it before it ends
+    temporary = np.ones((25 * 1024 * 1024,), dtype=np.float64)
+    time.sleep(0.2)
+    del temporary
+    resources = monitor.stop(X)
+
+    assert_greater(resources['peak_rss_delta_mb'], resources['rss_delta_mb'] + 100)
+    assert_greater(resources['peak_rss_mb'], resources['rss_mb'] + 100)
+    assert_false(sampler.is_sampling())
+
+
+def test_one_sampler_for_all_steps():
+    X = np.zeros((10, 3))
+    sampler = RSSSampler(sampling_interval=0.005)
+    threads = []
+    for _ in range(3):
+        monitor = StepResourceMonitor(sampler=sampler)
+        monitor.start(X)
+        assert_true(sampler.is_sampling())
+        threads.append(sampler._thread)
+        resources = monitor.stop(X)
+        assert_false(sampler.is_sampling())
+        # The peak of a step is not the peak of an earlier step
+        assert_true(resources['peak_rss_delta_mb'] >= 0)
+    assert_equal(len(set(threads)), 1)
+
+    # The monitors share the sampler of the process by default
+    assert_true(StepResourceMonitor().sampler is StepResourceMonitor().sampler)
+
+
+def test_tracing_is_stopped():
+    X = np.zeros((10, 3))
+    monitor = StepResourceMonitor(trace_allocations=True)
+    monitor.start(X)
+    assert_true(tracemalloc.is_tracing())
+    temporary = np.ones((1024 * 1024,), dtype=np.float64)
+    del temporary
+    resources = monitor.stop()
+    assert_greater(resources['peak_allocated_mb'], 7)
+    assert_false(tracemalloc.is_tracing())
+
+    # Tracing that was started before the step is left on
+    tracemalloc.start()
+    try:
+        monitor.start(X)
+        monitor.stop()
+        assert_true(tracemalloc.is_tracing())
+    finally:
+        tracemalloc.stop()
+
+
+def test_describe_data():
+    X = np.array([[0., 1.], [2., 0.], [0., 0.]])
+    monitor = StepResourceMonitor(describe_data=True)
+    monitor.start(X)
+    resources = monitor.stop(scipy.sparse.csr_matrix(X))
+
+    assert_equal(resources['input'], {'shape': [3, 2], 'dtype': 'float64', 'nnz': 2})
+    assert_equal(resources['output'], {'shape': [3, 2], 'dtype': 'float64', 'nnz': 2})
+    assert_true('peak_allocated_mb' not in resources)
+
+    # The data is not described by default
+    monitor = StepResourceMonitor()
+    monitor.start(X)
+    resources = monitor.stop(X)
+    assert_true('input' not in resources and 'output' not in resources)
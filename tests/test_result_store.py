@@ -0,0 +1,121 @@
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true, assert_not_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pipeline.pipeline_runner import PipelineRunner
+from pc_smac.pc_smac.pipeline_space.pipeline_space import PipelineSpace
+from pc_smac.pc_smac.utils.result_store import ResultStore, get_data_fingerprint
+
+
+class DummyStatistics(object):
+
+    def __init__(self):
+        self.runs = []
+
+    def add_run(self, config, information, config_origin="Unknown"):
+        self.runs.append(information)
+
+
+def test_lookup():
+    directory = tempfile.mkdtemp(prefix="testresults_")
+    try:
+        writer = ResultStore(directory, "fingerprint")
+        reader = ResultStore(directory, "fingerprint")
+        config = {'classifier:__choice__': 'sgd', 'classifier:sgd:alpha': 0.01}
+        writer.add(config, 1, 0.25, 3.5, {'t_rc': []}, {'cost': 0.25})
+
+        assert_equal(reader.get(config, 1), None)
+        reader.update()
+        result = reader.get(dict(reversed(list(config.items()))), 1)
+        assert_equal(result['cost'], 0.25)
+        assert_equal(result['runtime'], 3.5)
+        assert_equal(reader.get(config, 2), None)
+
+        # The results of another data set are in another file
+        other = ResultStore(directory, "other")
+        other.update()
+        assert_equal(other.get(config, 1), None)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_offset():
+    directory = tempfile.mkdtemp(prefix="testresults_")
+    try:
+        writer = ResultStore(directory, "fingerprint")
+        reader = ResultStore(directory, "fingerprint")
+        writer.add({'x': 1}, 0, 0.5, 1., {}, {})
+        reader.update()
+        assert_equal(reader.offset, os.path.getsize(reader.file))
+
+        # Only the new results are read, an incomplete last line is read at the next update
+        writer.add({'x': 2}, 0, 0.4, 1., {}, {})
+        size = os.path.getsize(reader.file)
+        with open(reader.file, "a") as fp:
+            fp.write('{"cost": 0.3')
+        reader.results = {}
+        reader.update()
+        assert_equal(reader.offset, size)
+        assert_equal(reader.get({'x': 1}, 0), None)
+        assert_equal(reader.get({'x': 2}, 0)['cost'], 0.4)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_data_fingerprint():
+    X = np.arange(20, dtype=np.float64).reshape((10, 2))
+    y = np.arange(10) % 2
+    data_info = {'task': 1, 'metric': 5, 'label_num': 2}
+    fingerprint = get_data_fingerprint(X, y, data_info, 5)
+    assert_equal(fingerprint, get_data_fingerprint(X.copy(), y.copy(), data_info, 5))
+    assert_not_equal(fingerprint, get_data_fingerprint(X, y, data_info, 10))
+    assert_not_equal(fingerprint, get_data_fingerprint(X[:5], y[:5], data_info, 5))
+    assert_true(len(fingerprint) == 40)
+
+
+def test_replay_status():
+    directory = tempfile.mkdtemp(prefix="testresults_")
+    try:
+        data = {'X_train': np.arange(40, dtype=np.float64).reshape((20, 2)), 'y_train': np.arange(20) % 2}
+        data_info = {'task': 1, 'metric': 5, 'label_num': 2}
+        statistics = DummyStatistics()
+        pipeline_runner = PipelineRunner(data, data_info, PipelineSpace(), None, statistics,
+                                         result_store_directory=directory)
+        config_space = ConfigurationSpace(seed=1)
+        config_space.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+        success, crash = config_space.sample_configuration(size=2)
+        assert_equal(pipeline_runner.get_memoized_result(success, 0), None)
+
+        pipeline_runner._memoize_result(success, 0, 0.25, 3.5, {}, {'cost': 0.25})
+        pipeline_runner._memoize_result(crash, 0, 1234567890, 1., {}, {'cost': 1234567890})
+
+        status, cost, runtime, additional_info = pipeline_runner.get_memoized_result(success, 0, cutoff=10)
+        assert_equal((status, cost, runtime), (StatusType.SUCCESS, 0.25, 3.5))
+        assert_equal(additional_info['memoized_runtime'], 3.5)
+        status, cost, _, _ = pipeline_runner.get_memoized_result(crash, 0, cutoff=10)
+        assert_equal((status, cost), (StatusType.CRASHED, 1234567890))
+
+        # The recorded run took longer than the cutoff of this run
+        status, cost, runtime, _ = pipeline_runner.get_memoized_result(success, 0, cutoff=3)
+        assert_equal((status, cost, runtime), (StatusType.TIMEOUT, 1234567890, 3.5))
+        assert_equal(statistics.runs[-1]['status'], 'TIMEOUT')
+        assert_true(all(run['memoized'] for run in statistics.runs))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_lookup()
+    test_offset()
+    test_data_fingerprint()
+    test_replay_status()
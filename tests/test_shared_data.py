@@ -0,0 +1,65 @@
+
+import shutil
+import tempfile
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true
+from sklearn.utils.testing import assert_array_equal
+
+from pc_smac.pc_smac.utils.shared_data import SharedDataStore
+from pc_smac.pc_smac.pipeline.pipeline import OwnPipeline
+from pc_smac.pc_smac.pipeline_space.data_preprocessing_nodes.imputation import Imputation
+
+from sklearn.svm import SVC
+from sklearn.datasets import load_iris
+
+
+def test_copy_on_write_views():
+    directory = tempfile.mkdtemp(prefix="testshared_")
+    try:
+        store = SharedDataStore(directory=directory)
+        X = np.arange(12, dtype=np.float64).reshape((4, 3))
+        X_shared = store.put("X", X)
+        assert_true(X_shared.flags.writeable)
+
+        # Writing to the view does not change the file
+        X_shared[0, 0] = -1
+        store.arrays = {}
+        assert_array_equal(store.get("X"), X)
+        store.clean()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_pipeline_fit_on_shared_fold():
+    # The imputation imputes in place (copy=False), which fails on read-only views
+    directory = tempfile.mkdtemp(prefix="testshared_")
+    try:
+        iris = load_iris()
+        X = iris.data.copy()
+        X[::7, 1] = np.nan
+        y = iris.target
+        train_split, test_split = np.arange(0, 150, 2), np.arange(1, 150, 2)
+
+        store = SharedDataStore(directory=directory)
+        X_train = store.put("X_train_0", X[train_split])
+        X_valid = store.put("X_valid_0", X[test_split])
+        y_train = store.put("y_train_0", y[train_split])
+
+        pipeline = OwnPipeline([('imputation', Imputation(strategy='mean')), ('svc', SVC(random_state=0))])
+        pipeline.fit(X_train, y_train)
+        y_pred = pipeline.predict(X_valid)
+        assert_equal(y_pred.shape, (75,))
+
+        # The other processes still see the missing values
+        store.arrays = {}
+        assert_equal(np.sum(np.isnan(store.get("X_train_0"))), np.sum(np.isnan(X[train_split])))
+        store.clean()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_copy_on_write_views()
+    test_pipeline_fit_on_shared_fold()
@@ -0,0 +1,100 @@
+
+import json
+import shutil
+import tempfile
+
+from sklearn.utils.testing import assert_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
+from pc_smac.pc_smac.pc_runhistory.shared_runhistory import SharedRunHistory
+
+
+PREPROCESSOR = {'imputation:strategy': 'mean', 'rescaling:__choice__': 'standardize'}
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    config_space.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+    return config_space
+
+
+def read_records(shared):
+    with open(shared.file) as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_round_trip():
+    directory = tempfile.mkdtemp(prefix="testsharedrunhistory_")
+    try:
+        config_space = build_config_space()
+        configs = config_space.sample_configuration(size=3)
+        runhistory_1, shared_1 = PCRunHistory(average_cost), SharedRunHistory(directory, 1, config_space)
+        runhistory_2, shared_2 = PCRunHistory(average_cost), SharedRunHistory(directory, 2, config_space)
+
+        for config in configs[:2]:
+            runhistory_1.add(config, 0.5, 3, StatusType.SUCCESS, instance_id=1, seed=0,
+                             additional_info={'t_rc': [(PREPROCESSOR, 2.)]})
+        # Without a shared runhistory the changes are not logged
+        assert_equal(runhistory_1.changed_run_keys, None)
+        assert_equal(runhistory_1.get_cached_configurations().changed_digests, None)
+        shared_1.write(runhistory_1)
+        assert_equal(len(read_records(shared_1)), 3)
+        # The logs are emptied by the write
+        assert_equal(runhistory_1.changed_run_keys, [])
+        assert_equal(runhistory_1.get_cached_configurations().changed_digests, [])
+        # Nothing changed since the previous write
+        shared_1.write(runhistory_1)
+        assert_equal(len(read_records(shared_1)), 3)
+
+        runhistory_2.add(configs[2], 0.4, 3, StatusType.SUCCESS, instance_id=1, seed=0)
+        shared_2.read(runhistory_2)
+        assert_equal(len(runhistory_2.data), 3)
+        assert_equal(runhistory_2.get_cached_configurations().get_hits(PREPROCESSOR), 1)
+        assert_equal(runhistory_2.get_cached_configurations().get_runtime(PREPROCESSOR), 2.)
+
+        # The runs and cached configurations of the peer are not written back
+        shared_2.write(runhistory_2)
+        records = read_records(shared_2)
+        assert_equal([record['type'] for record in records], ['run'])
+        assert_equal(records[0]['config'], configs[2].get_dictionary())
+
+        shared_1.read(runhistory_1)
+        assert_equal(len(runhistory_1.data), 3)
+        assert_equal(runhistory_1.get_cached_configurations().get_hits(PREPROCESSOR), 1)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_overwritten_run_is_shared_again():
+    directory = tempfile.mkdtemp(prefix="testsharedrunhistory_")
+    try:
+        config_space = build_config_space()
+        config = config_space.sample_configuration()
+        runhistory_1, shared_1 = PCRunHistory(average_cost), SharedRunHistory(directory, 1, config_space)
+        runhistory_2, shared_2 = PCRunHistory(average_cost), SharedRunHistory(directory, 2, config_space)
+
+        runhistory_1.add(config, 1234567890, 1, StatusType.CAPPED, instance_id=1, seed=0)
+        shared_1.write(runhistory_1)
+        shared_2.read(runhistory_2)
+
+        runhistory_1.add(config, 0.3, 3, StatusType.SUCCESS, instance_id=1, seed=0)
+        shared_1.write(runhistory_1)
+        assert_equal([record['status'] for record in read_records(shared_1)],
+                     [StatusType.CAPPED.value, StatusType.SUCCESS.value])
+
+        shared_2.read(runhistory_2)
+        assert_equal(len(runhistory_2.data), 1)
+        assert_equal(list(runhistory_2.data.values())[0].cost, 0.3)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_overwritten_run_is_shared_again()
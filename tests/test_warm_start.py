@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from sklearn.utils.testing import assert_equal, assert_true
+from sklearn.utils.testing import assert_array_almost_equal
+
+from ConfigSpace.configuration_space import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+from smac.optimizer.objective import average_cost
+from smac.runhistory.runhistory import RunHistory
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.pc_smbo.warm_start import WarmStarter, WarmStartRunHistory2EPM, compute_meta_features
+from pc_smac.pc_smac.utils.statistics import Statistics
+
+
+class DummyRunHistory2EPM(object):
+    """One row per run with the array of the configuration and the cost"""
+
+    def __init__(self):
+        self.num_transforms = 0
+
+    def transform(self, runhistory):
+        self.num_transforms += 1
+        X, Y = [], []
+        for key, value in runhistory.data.items():
+            X.append(runhistory.ids_config[key.config_id].get_array())
+            Y.append([value.cost])
+        return np.array(X).reshape((len(X), 1)), np.array(Y).reshape((len(Y), 1))
+
+
+class KeyedRunHistory2EPM(object):
+    """Wraps a converter, as IncrementalRunHistory2EPM, and knows the run keys of its rows"""
+
+    def __init__(self, runhistory2epm):
+        self.runhistory2epm = runhistory2epm
+        self.row_keys = None
+
+    def transform(self, runhistory):
+        self.row_keys = list(runhistory.data.keys())
+        return self.runhistory2epm.transform(runhistory)
+
+    def get_row_keys(self):
+        return self.row_keys
+
+
+def build_config_space():
+    config_space = ConfigurationSpace(seed=1)
+    config_space.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+    return config_space
+
+
+def get_info(train_num, task=1):
+    return {'train_num': train_num, 'feat_num': 10, 'label_num': 2, 'is_sparse': 0, 'has_categorical': 0,
+            'has_missing': 0, 'task': task, 'metric': 5}
+
+
+def save_previous_runs(output_dir, stamp, info, costs):
+    statistics = Statistics(stamp, output_dir, information={})
+    statistics.start_timer()
+    statistics.save_meta_features(compute_meta_features(info))
+    for x, cost in costs:
+        statistics.add_run({'x': x}, {'instance': 1, 'cost': cost, 'runtime': 2.})
+    return statistics
+
+
+def test_nearest_neighbour():
+    output_dir = tempfile.mkdtemp(prefix="testwarmstart_")
+    try:
+        config_space = build_config_space()
+        save_previous_runs(output_dir, "near", get_info(1100), [(0.1, 0.5), (0.2, 0.2), (0.3, 1234567890)])
+        save_previous_runs(output_dir, "far", get_info(100000), [(0.4, 0.1)])
+        save_previous_runs(output_dir, "other_task", get_info(1000, task=2), [(0.5, 0.1)])
+        current = save_previous_runs(output_dir, "current", get_info(1000), [(0.6, 0.1)])
+
+        warm_starter = WarmStarter([output_dir], config_space, num_neighbours=1, num_configs_per_neighbour=5,
+                                   exclude_files=[current.meta_features_file])
+        meta_features = compute_meta_features(get_info(1000))
+        neighbours = warm_starter.find_neighbours(meta_features)
+        assert_equal([runs_file for _, runs_file in neighbours], [os.path.join(output_dir, "statistics_near_runs.json")])
+
+        # The best configurations first, crashed runs are left out
+        configs = warm_starter.get_initial_configurations(meta_features)
+        assert_equal([config["x"] for config in configs], [0.2, 0.1])
+        assert_true(all(config.origin == "Warm start" for config in configs))
+
+        warm_starter.num_neighbours = 3
+        distances = [distance for distance, _ in warm_starter.find_neighbours(meta_features)]
+        assert_equal(len(distances), 2)
+        assert_true(distances[0] < distances[1])
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_read_truncated_runs():
+    output_dir = tempfile.mkdtemp(prefix="testwarmstart_")
+    try:
+        statistics = save_previous_runs(output_dir, "interrupted", get_info(1000), [(0.1, 0.5), (0.2, 0.2)])
+        with open(statistics.run_file, "a") as fp:
+            fp.write('{\n    "config": {\n        "x": 0.3\n    },\n    "cost": 0.')
+
+        runs = WarmStarter([output_dir], build_config_space())._read_runs(statistics.run_file)
+        assert_equal([run['config']['x'] for run in runs], [0.1, 0.2])
+        assert_equal([run['cost'] for run in runs], [0.5, 0.2])
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_transfer_rows_in_epm_data():
+    output_dir = tempfile.mkdtemp(prefix="testwarmstart_")
+    try:
+        config_space = build_config_space()
+        save_previous_runs(output_dir, "near", get_info(1000), [(0.1, 0.5), (0.2, 0.2), (0.3, 1234567890)])
+        warm_starter = WarmStarter([output_dir], config_space)
+        transfer_runhistory = warm_starter.get_transfer_runhistory(compute_meta_features(get_info(1000)),
+                                                                   average_cost)
+        assert_equal(len(transfer_runhistory.data), 3)
+
+        runhistory2epm = DummyRunHistory2EPM()
+        warm_start_runhistory2epm = WarmStartRunHistory2EPM(runhistory2epm, transfer_runhistory)
+        runhistory = RunHistory(average_cost)
+        config = config_space.sample_configuration()
+        runhistory.add(config, 0.4, 1, StatusType.SUCCESS, instance_id=1, seed=0)
+
+        # The transfer runs follow the own runs, one row per run, like the own runs
+        X, Y = warm_start_runhistory2epm.transform(runhistory)
+        assert_equal(X.shape, (4, 1))
+        assert_array_almost_equal(X[:, 0], [config["x"], 0.1, 0.2, 0.3])
+        assert_array_almost_equal(Y[:, 0], [0.4, 0.5, 0.2, 1234567890])
+
+        # The transfer runhistory is converted once, the own runs at every call
+        runhistory.add(config_space.sample_configuration(), 0.3, 1, StatusType.SUCCESS, instance_id=1, seed=0)
+        X, Y = warm_start_runhistory2epm.transform(runhistory)
+        assert_equal(X.shape, (5, 1))
+        assert_array_almost_equal(Y[2:, 0], [0.5, 0.2, 1234567890])
+        assert_equal(runhistory2epm.num_transforms, 3)
+
+        # The keys of the transfer rows follow the keys of the own rows, if the wrapped converter knows them
+        assert_equal(warm_start_runhistory2epm.get_row_keys(), None)
+        keyed_runhistory2epm = WarmStartRunHistory2EPM(KeyedRunHistory2EPM(DummyRunHistory2EPM()), transfer_runhistory)
+        X, Y = keyed_runhistory2epm.transform(runhistory)
+        assert_equal(keyed_runhistory2epm.get_row_keys(),
+                     list(runhistory.data.keys()) + [('transfer', row) for row in range(3)])
+        assert_equal(len(keyed_runhistory2epm.get_row_keys()), X.shape[0])
+
+        # Without transfer runs the data is the own data
+        empty_runhistory2epm = WarmStartRunHistory2EPM(DummyRunHistory2EPM(), RunHistory(average_cost))
+        X, Y = empty_runhistory2epm.transform(runhistory)
+        assert_equal(X.shape, (2, 1))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
@@ -0,0 +1,145 @@
+
+import os
+import sys
+import shutil
+import tempfile
+
+from sklearn.utils.testing import assert_equal, assert_true
+
+from smac.optimizer.objective import average_cost
+from smac.runhistory.runhistory import RunKey
+from smac.scenario.scenario import Scenario
+from smac.stats.stats import Stats
+from smac.tae.execute_ta_run import StatusType
+
+from pc_smac.pc_smac.config_space.config_space_builder import ConfigSpaceBuilder
+from pc_smac.pc_smac.data_loader.data_loader import DataLoader
+from pc_smac.pc_smac.pc_runhistory.pc_runhistory import PCRunHistory
+from pc_smac.pc_smac.pc_smbo.batch_evaluation import BatchEvaluator
+from pc_smac.pc_smac.pipeline.pipeline_runner import PipelineRunner
+from pc_smac.pc_smac.pipeline.worker_pool import EvaluationWorkerPool
+from pc_smac.pc_smac.pipeline_space.pipeline_space import PipelineSpace
+from pc_smac.pc_smac.random_search.random_search import ParallelRandomSearch
+from pc_smac.pc_smac.pipeline_space.pipeline_step import OneHotEncodingStep, ImputationStep, RescalingStep, \
+    BalancingStep, PreprocessingStep, ClassificationStep
+from pc_smac.pc_smac.utils.statistics import Statistics
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "46_bac")
+
+
+def build_pipeline_runner(output_dir, runhistory=None):
+    data_loader = DataLoader(DATA_PATH)
+    data = data_loader.get_data()
+
+    pipeline_space = PipelineSpace()
+    pipeline_space.add_pipeline_steps([OneHotEncodingStep(), ImputationStep(), RescalingStep(), BalancingStep(),
+                                       PreprocessingStep(), ClassificationStep()])
+    config_space = ConfigSpaceBuilder(pipeline_space).build_config_space(seed=1,
+                                                                         dataset_properties=data_loader.info)
+
+    statistics = Statistics("test", output_dir, information={}, total_runtime=60, run_limit=10)
+    pipeline_runner = PipelineRunner(data=data,
+                                     data_info=data_loader.info,
+                                     pipeline_space=pipeline_space,
+                                     runhistory=runhistory,
+                                     statistics=statistics,
+                                     downsampling=200,
+                                     num_cross_validation_folds=2)
+    return pipeline_runner, config_space, statistics
+
+
+def test_pool_run_after_timer_start():
+    # The workers are forked before the timer of the statistics is started
+    output_dir = tempfile.mkdtemp(prefix="testpool_")
+    try:
+        pipeline_runner, config_space, statistics = build_pipeline_runner(output_dir)
+        pool = EvaluationWorkerPool(ta=pipeline_runner.run, num_workers=1, state_owner=pipeline_runner)
+        try:
+            statistics.start_timer()
+            status, cost, runtime, additional_info = pool.run(config_space.get_default_configuration(),
+                                                              instance=0, cutoff=60)
+            assert_equal(status, StatusType.SUCCESS)
+            assert_true(cost < 1)
+
+            # The run is logged by the worker
+            with open(statistics.run_file) as fp:
+                assert_true('"cost"' in fp.read())
+        finally:
+            pool.shutdown()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_modules_preloaded_before_fork():
+    sys.modules.pop("xml.dom.minidom", None)
+    pool = EvaluationWorkerPool(ta=lambda config: 0.5, num_workers=1, preload_modules=["xml.dom.minidom"])
+    try:
+        # The workers inherit the module from this process
+        assert_true("xml.dom.minidom" in sys.modules)
+        status, cost, runtime, additional_info = pool.run(None)
+        assert_equal(status, StatusType.SUCCESS)
+    finally:
+        pool.shutdown()
+
+
+def test_parallel_random_search():
+    output_dir = tempfile.mkdtemp(prefix="testpool_")
+    try:
+        pipeline_runner, config_space, statistics = build_pipeline_runner(output_dir)
+        statistics.run_limit = 3
+        random_search = ParallelRandomSearch(config_space=config_space,
+                                             pipeline_runner=pipeline_runner,
+                                             wallclock_limit=60,
+                                             memory_limit=None,
+                                             statistics=statistics,
+                                             num_workers=2)
+        try:
+            incumbent = random_search.run(cutoff=30)
+        finally:
+            random_search.worker_pool.shutdown()
+
+        assert_true(incumbent != None)
+        # The same run budget as a sequential random search, see Statistics.is_budget_exhausted
+        assert_equal(statistics.nb_runs, statistics.run_limit + 1)
+        with open(statistics.run_file) as fp:
+            assert_true('"cost"' in fp.read())
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_batch_evaluation_in_pool():
+    output_dir = tempfile.mkdtemp(prefix="testpool_")
+    try:
+        runhistory = PCRunHistory(average_cost)
+        pipeline_runner, config_space, statistics = build_pipeline_runner(output_dir, runhistory=runhistory)
+        scenario = Scenario({'cs': config_space,
+                             'run_obj': "quality",
+                             'runcount_limit': 10,
+                             'wallclock_limit': 60,
+                             'cutoff_time': 60,
+                             'deterministic': "true",
+                             'instances': [[1]]})
+        stats = Stats(scenario, output_dir=output_dir + "/smac/", stamp="test")
+        pool = EvaluationWorkerPool(ta=pipeline_runner.run, num_workers=2, state_owner=pipeline_runner)
+        try:
+            statistics.start_timer()
+            stats.start_timing()
+            batch_evaluator = BatchEvaluator(worker_pool=pool, runhistory=runhistory, stats=stats, cutoff=60)
+            configs = [config_space.get_default_configuration()] + \
+                      [config for config in config_space.sample_configuration(size=3)
+                       if config != config_space.get_default_configuration()][:1]
+            batch_evaluator.evaluate_runs([(config, (1, 12345)) for config in configs])
+        finally:
+            pool.shutdown()
+
+        assert_equal(stats.ta_runs, len(configs))
+        default_run = runhistory.data[RunKey(runhistory.config_ids[configs[0]], 1, 12345)]
+        assert_equal(default_run.status, StatusType.SUCCESS)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_pool_run_after_timer_start()
+    test_parallel_random_search()
+    test_batch_evaluation_in_pool()